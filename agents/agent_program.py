@@ -6,14 +6,14 @@ from typing import List, Dict
 from pathlib import Path
 from state import GraphState, ReferentielData
 from config import CORPUS_DIR, SUPPORTED_SUBJECTS
-from utils.vectorstore import VectorStoreManager
+from utils.vectorstore import get_vectorstore
 
 
 class AgentProgram:
     """Agent d'extraction et structuration du référentiel officiel"""
     
     def __init__(self):
-        self.vector_store = VectorStoreManager()
+        self.vector_store = get_vectorstore()
         self.gabarits = self._load_templates()
     
     def _load_templates(self) -> Dict:
@@ -53,13 +53,15 @@ class AgentProgram:
         if matiere not in SUPPORTED_SUBJECTS:
             return self._objectifs_generiques(theme, niveau)
         
-        # Rechercher dans le corpus
+        # Rechercher dans les documents officiels du corpus: index inversé BM25 d'abord
+        # (mots-clés du programme), recherche dense FAISS seulement si le rappel lexical est faible
         query = f"Objectifs pédagogiques {theme} niveau {niveau}"
-        results = self.vector_store.search_similar(
+        results = self.vector_store.search_hybrid(
             query=query,
             matiere=matiere,
             niveau=niveau,
-            top_k=3
+            top_k=3,
+            filters={'type': 'officiel'}
         )
         
         objectifs = []
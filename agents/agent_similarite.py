@@ -4,14 +4,14 @@ Optimiseur de ressources via recherche vectorielle
 """
 from state import GraphState, SimilariteResult
 from config import SIMILARITY_THRESHOLD, SUPPORTED_SUBJECTS
-from utils.vectorstore import VectorStoreManager
+from utils.vectorstore import get_vectorstore
 
 
 class AgentSimilarite:
     """Agent de recherche de fiches similaires pour optimisation"""
     
     def __init__(self):
-        self.vector_store = VectorStoreManager()
+        self.vector_store = get_vectorstore()
         self.threshold = SIMILARITY_THRESHOLD
     
     def _construire_query(self, state: GraphState) -> str:
@@ -49,12 +49,13 @@ class AgentSimilarite:
         # Construire la requête
         query = self._construire_query(state)
         
-        # Rechercher dans le vector store
+        # Rechercher uniquement parmi les fiches validées (filtre appliqué dans FAISS)
         results = self.vector_store.search_similar(
             query=query,
             matiere=matiere,
             niveau=state.contexte.cycle,
-            top_k=3
+            top_k=3,
+            filters={'type': 'fiche_validee'}
         )
         
         # Analyser les résultats
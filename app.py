@@ -18,6 +18,7 @@ except ImportError as e:
     import orchestrator
     create_orchestrator = orchestrator.create_orchestrator
 from config import EDUCATION_LEVELS, SUPPORTED_SUBJECTS, OUTPUT_DIR
+from utils.vectorstore import warmup_vectorstore
 
 
 # Configuration de la page
@@ -78,6 +79,12 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+@st.cache_resource(show_spinner=" Chargement du vector store...")
+def init_vectorstore():
+    """Précharge une seule fois par processus le vector store partagé par les agents"""
+    return warmup_vectorstore()
+
+
 def init_session_state():
     """Initialise l'état de la session"""
     if 'fiche_generee' not in st.session_state:
@@ -93,6 +100,7 @@ def get_classes_by_cycle(cycle):
 
 def main():
     """Fonction principale de l'application"""
+    init_vectorstore()
     init_session_state()
     
     # En-tête
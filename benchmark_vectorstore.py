@@ -0,0 +1,1459 @@
+"""
+Benchmarks du VectorStore
+Usage: python benchmark_vectorstore.py <benchmark> [--requests N] [--size N]
+"""
+import sys
+import time
+import argparse
+import multiprocessing
+from pathlib import Path
+
+# Ajouter le répertoire au path
+sys.path.append(str(Path(__file__).parent))
+
+
+def _peak_rss_mb() -> float:
+    """Pic de mémoire résidente du processus courant (Mo)"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss est en octets sous macOS, en Ko sous Linux
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        try:
+            import psutil
+            return psutil.Process().memory_info().rss / (1024 * 1024)
+        except ImportError:
+            return 0.0
+
+
+def _run_isolated(func, *args):
+    """Exécute func dans un processus neuf pour isoler temps et mémoire"""
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(1) as pool:
+        return pool.apply(func, args)
+
+
+def _print_table(title: str, rows):
+    """Affiche un tableau de résultats"""
+    print("\n" + "=" * 60)
+    print(title)
+    print("=" * 60)
+    for label, value in rows:
+        print(f"  {label:<40} {value}")
+
+
+# ---------------------------------------------------------------------------
+# user-001 : instance partagée vs une instance par agent
+# ---------------------------------------------------------------------------
+
+def _shared_instance_worker(mode: str, nb_requests: int):
+    """Simule nb_requests générations (nodes program + similarité)"""
+    from utils.vectorstore import VectorStoreManager, get_vectorstore
+
+    query = "Objectifs pédagogiques Les fonctions affines niveau 3ème"
+    timings = []
+    for _ in range(nb_requests):
+        start = time.perf_counter()
+        for _node in ("program", "similarite"):
+            vs = VectorStoreManager() if mode == "avant" else get_vectorstore()
+            vs.search_similar(query, matiere="Mathématiques", top_k=3)
+        timings.append(time.perf_counter() - start)
+    return timings, _peak_rss_mb()
+
+
+def bench_shared_instance(args):
+    """Temps par requête et RSS: une instance par agent vs instance partagée"""
+    rows = []
+    for mode in ("avant", "apres"):
+        timings, rss = _run_isolated(_shared_instance_worker, mode, args.requests)
+        first, rest = timings[0], timings[1:] or timings
+        rows.append((f"[{mode}] 1re requête (s)", f"{first:.3f}"))
+        rows.append((f"[{mode}] requêtes suivantes, moyenne (s)", f"{sum(rest) / len(rest):.3f}"))
+        rows.append((f"[{mode}] pic RSS (Mo)", f"{rss:.1f}"))
+    _print_table("Instance partagée du VectorStoreManager", rows)
+
+
+# ---------------------------------------------------------------------------
+# user-003 : cache JSON vs cache binaire mappé en mémoire
+# ---------------------------------------------------------------------------
+
+def _embedding_cache_build(mode: str, size: int, misses: int, workdir: str):
+    """Ingère `misses` vecteurs un par un, puis écrit un cache complet de `size` vecteurs"""
+    import json
+    import hashlib
+    import numpy as np
+    from utils.embedding_cache import EmbeddingCache
+
+    dimension = 384
+    rng = np.random.default_rng(0)
+    hashes = [hashlib.md5(str(i).encode()).hexdigest() for i in range(size)]
+    vectors = rng.standard_normal((size, dimension)).astype('float32')
+    base_path = Path(workdir) / mode / "embeddings_cache"
+    base_path.parent.mkdir(parents=True)
+
+    # Ingestion incrémentale (comportement de chaque cache à chaque embedding manquant)
+    start = time.perf_counter()
+    if mode == "json":
+        cache = {}
+        for text_hash, vector in zip(hashes[:misses], vectors[:misses]):
+            cache[text_hash] = vector.tolist()
+            with open(base_path.with_suffix(".json"), 'w', encoding='utf-8') as f:
+                json.dump(cache, f, ensure_ascii=False, indent=2)
+    else:
+        cache = EmbeddingCache(base_path, dimension)
+        for text_hash, vector in zip(hashes[:misses], vectors[:misses]):
+            cache.put(text_hash, vector)
+        cache.flush()
+    ingest_time = time.perf_counter() - start
+
+    # Cache complet sur le disque
+    if mode == "json":
+        with open(base_path.with_suffix(".json"), 'w', encoding='utf-8') as f:
+            json.dump({h: v.tolist() for h, v in zip(hashes, vectors)}, f, ensure_ascii=False, indent=2)
+    else:
+        cache.put_many(hashes, vectors)
+        cache.close()
+    disk_bytes = sum(p.stat().st_size for p in base_path.parent.iterdir())
+    return ingest_time, disk_bytes, hashes[::max(1, size // 10000)]
+
+
+def _embedding_cache_load(mode: str, workdir: str, sample_hashes):
+    """Démarrage puis lectures en régime établi, dans un processus neuf"""
+    import json
+    import numpy as np
+    from utils.embedding_cache import EmbeddingCache
+
+    base_path = Path(workdir) / mode / "embeddings_cache"
+    rss_before = _peak_rss_mb()
+
+    start = time.perf_counter()
+    if mode == "json":
+        with open(base_path.with_suffix(".json"), 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        lookup = lambda h: np.array(cache[h], dtype='float32')
+    else:
+        cache = EmbeddingCache(base_path, 384)
+        lookup = cache.get
+    load_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for text_hash in sample_hashes:
+        lookup(text_hash)
+    lookup_time = time.perf_counter() - start
+
+    return load_time, lookup_time, _peak_rss_mb() - rss_before
+
+
+def bench_embedding_cache(args):
+    """Ingestion, démarrage, lectures et RSS: cache JSON vs cache binaire"""
+    import tempfile
+
+    # Le cache JSON réécrit tout le fichier à chaque ajout (O(N²)): on limite N
+    misses = min(args.size, 200)
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for mode in ("json", "binaire"):
+            ingest, disk, sample = _run_isolated(_embedding_cache_build, mode, args.size, misses, workdir)
+            load, lookup, rss = _run_isolated(_embedding_cache_load, mode, workdir, sample)
+            rows.append((f"[{mode}] ingestion de {misses} vecteurs (s)", f"{ingest:.3f}"))
+            rows.append((f"[{mode}] démarrage, {args.size} vecteurs (s)", f"{load:.3f}"))
+            rows.append((f"[{mode}] {len(sample)} lectures (s)", f"{lookup:.3f}"))
+            rows.append((f"[{mode}] taille disque (Mo)", f"{disk / 1e6:.1f}"))
+            rows.append((f"[{mode}] RSS du cache chargé (Mo)", f"{rss:.1f}"))
+    _print_table("Cache des embeddings", rows)
+
+
+# ---------------------------------------------------------------------------
+# user-004 : encodage texte par texte vs encodage par lots
+# ---------------------------------------------------------------------------
+
+def _synthetic_chunks(size: int):
+    """Génère des chunks de texte synthétiques (avec ~10% de doublons)"""
+    import random
+
+    rng = random.Random(0)
+    words = ("fonction affine équation programme objectif compétence élève algorithme "
+             "variable tableau boucle dérivée limite géométrie vecteur probabilité").split()
+    unique = max(1, size - size // 10)
+    texts = [" ".join(rng.choice(words) for _ in range(120)) + f" {i}" for i in range(unique)]
+    return texts + [rng.choice(texts) for _ in range(size - unique)]
+
+
+def bench_batch_encoding(args):
+    """Débit d'encodage d'un corpus: un appel au modèle par chunk vs lots dédupliqués"""
+    import tempfile
+    import numpy as np
+    from utils.embedding_cache import EmbeddingCache
+    from utils.vectorstore import get_vectorstore
+
+    size = min(args.size, 2000)
+    texts = _synthetic_chunks(size)
+    vs = get_vectorstore()
+    vs.warmup()
+
+    # Avant: un encode et une normalisation par texte
+    start = time.perf_counter()
+    for text in texts:
+        embedding = vs.embedding_model.encode(text)
+        embedding = embedding / np.linalg.norm(embedding)
+    loop_time = time.perf_counter() - start
+
+    # Après: _get_embeddings_batch sur un cache vide
+    with tempfile.TemporaryDirectory() as workdir:
+        vs.cache = EmbeddingCache(Path(workdir) / "embeddings_cache", vs.dimension)
+        start = time.perf_counter()
+        vs._get_embeddings_batch(texts)
+        batch_time = time.perf_counter() - start
+        vs.cache.close()
+
+    _print_table(f"Encodage de {size} chunks (batch_size={vs.batch_size})", [
+        ("[avant] boucle (chunks/s)", f"{size / loop_time:.1f}"),
+        ("[apres] lots (chunks/s)", f"{size / batch_time:.1f}"),
+        ("Accélération", f"x{loop_time / batch_time:.1f}"),
+    ])
+
+
+# ---------------------------------------------------------------------------
+# user-006 : rappel@k et latence des index approchés vs index flat
+# ---------------------------------------------------------------------------
+
+def _synthetic_embeddings(size: int, dimension: int = 384, seed: int = 0):
+    """Embeddings normalisés regroupés en thèmes (proche d'un corpus réel)"""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, size // 200), dimension)).astype('float32')
+    vectors = centers[rng.integers(0, len(centers), size)]
+    vectors = vectors + 0.6 * rng.standard_normal((size, dimension)).astype('float32')
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def _recall_at_k(truth, found) -> float:
+    """Part des vrais k plus proches voisins retrouvés"""
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+    return hits / truth.size
+
+
+def _time_search(index, queries, k, params=None):
+    """Latence moyenne par requête (ms) et résultats"""
+    start = time.perf_counter()
+    indices = [index.search(q.reshape(1, -1), k, params=params)[1][0] for q in queries]
+    return (time.perf_counter() - start) * 1000 / len(queries), indices
+
+
+def bench_ann_indexes(args):
+    """Rappel@k vs latence de chaque type d'index, par rapport à l'index flat"""
+    import numpy as np
+    from config import VECTORSTORE_INDEX
+    from utils import index_factory
+
+    k = 10
+    vectors = _synthetic_embeddings(args.size)
+    queries = _synthetic_embeddings(200, seed=1)
+
+    labels = np.arange(len(vectors), dtype='int64')
+    flat = index_factory.build_index(vectors.shape[1], {**VECTORSTORE_INDEX, 'type': 'flat'})
+    flat.add_with_ids(vectors, labels)
+    flat_ms, truth = _time_search(flat, queries, k)
+    truth = np.array(truth)
+
+    rows = []
+    for index_type in index_factory.INDEX_TYPES:
+        config = {**VECTORSTORE_INDEX, 'type': index_type}
+        start = time.perf_counter()
+        index = index_factory.build_index(vectors.shape[1], config, vectors)
+        index.add_with_ids(vectors, labels)
+        build_s = time.perf_counter() - start
+
+        sweep = {"ivf_flat": "nprobe", "ivf_pq": "nprobe", "hnsw": "ef_search"}.get(index_type)
+        values = [config[sweep] // 2, config[sweep], config[sweep] * 4] if sweep else [None]
+        for value in values:
+            if sweep:
+                config[sweep] = value
+                index_factory.apply_search_params(index, config)
+            ms, found = _time_search(index, queries, k)
+            label = f"{index_factory.index_kind(index)}" + (f" {sweep}={value}" if sweep else "")
+            rows.append((label, f"recall@{k}={_recall_at_k(truth, found):.3f}  "
+                                f"{ms:.3f} ms/req  (x{flat_ms / ms:.1f})  build {build_s:.1f}s"))
+
+    _print_table(f"Index approchés sur {args.size} vecteurs (référence flat: {flat_ms:.3f} ms/req)", rows)
+
+
+# ---------------------------------------------------------------------------
+# user-009 : boucle de search_similar vs search_similar_many
+# ---------------------------------------------------------------------------
+
+def _batch_search_worker(size: int, nb_queries: int, workdir: str):
+    """Débit de recherche dans un vector store temporaire (processus neuf)"""
+    import config
+    config.VECTORSTORE_DIR = Path(workdir)
+    from utils.vectorstore import VectorStoreManager
+
+    vs = VectorStoreManager()
+    texts = _synthetic_chunks(size)
+    vs.add_documents(texts, [{'matiere': 'Informatique', 'niveau': 'Secondaire'} for _ in texts])
+    # Deux jeux de requêtes distinctes: aucune réponse depuis le cache d'embeddings
+    loop_queries = [f"objectifs et compétences du thème {i}" for i in range(nb_queries)]
+    batch_queries = [f"notions et savoir-faire du chapitre {i}" for i in range(nb_queries)]
+    vs.warmup()
+
+    start = time.perf_counter()
+    for query in loop_queries:
+        vs.search_similar(query, matiere="Informatique", top_k=5)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vs.search_similar_many(batch_queries, matiere="Informatique", top_k=5)
+    batch_time = time.perf_counter() - start
+
+    vs.close()
+    return loop_time, batch_time
+
+
+def bench_batch_search(args):
+    """Débit de 1000 requêtes: boucle de search_similar vs search_similar_many"""
+    import tempfile
+
+    size = min(args.size, 5000)
+    nb_queries = 1000
+    with tempfile.TemporaryDirectory() as workdir:
+        loop_time, batch_time = _run_isolated(_batch_search_worker, size, nb_queries, workdir)
+
+    _print_table(f"{nb_queries} recherches sur {size} chunks", [
+        ("[avant] boucle search_similar (req/s)", f"{nb_queries / loop_time:.1f}"),
+        ("[apres] search_similar_many (req/s)", f"{nb_queries / batch_time:.1f}"),
+        ("Accélération", f"x{loop_time / batch_time:.1f}"),
+    ])
+
+
+# ---------------------------------------------------------------------------
+# user-011 : mémoire économisée et rappel perdu des index compressés
+# ---------------------------------------------------------------------------
+
+def bench_compression(args):
+    """Taille mémoire et rappel@k des index compressés et du cache float16, par rapport au flat float32"""
+    import tempfile
+    import numpy as np
+    import faiss
+    from config import VECTORSTORE_INDEX
+    from utils import index_factory
+    from utils.embedding_cache import EmbeddingCache
+
+    k = 10
+    vectors = _synthetic_embeddings(args.size)
+    queries = _synthetic_embeddings(200, seed=1)
+    labels = np.arange(len(vectors), dtype='int64')
+
+    rows = []
+    truth = None
+    flat_bytes = None
+    for index_type in ("flat", "sq_fp16", "sq8", "pq", "ivf_pq"):
+        config = {**VECTORSTORE_INDEX, 'type': index_type}
+        index = index_factory.build_index(vectors.shape[1], config, vectors)
+        index.add_with_ids(vectors, labels)
+        nbytes = len(faiss.serialize_index(index))
+        ms, found = _time_search(index, queries, k)
+        if truth is None:
+            truth, flat_bytes = np.array(found), nbytes
+        rows.append((index_factory.index_kind(index),
+                     f"{nbytes / 1e6:8.1f} Mo (x{flat_bytes / nbytes:.1f})  "
+                     f"recall@{k}={_recall_at_k(truth, found):.3f}  {ms:.3f} ms/req"))
+
+    # Cache des embeddings: float32 vs float16
+    with tempfile.TemporaryDirectory() as workdir:
+        hashes = [f"{i:032x}" for i in range(len(vectors))]
+        stored = {}
+        for dtype in ("float32", "float16"):
+            (Path(workdir) / dtype).mkdir()
+            cache = EmbeddingCache(Path(workdir) / dtype / "embeddings_cache", vectors.shape[1], dtype=dtype)
+            cache.put_many(hashes, vectors)
+            cache.flush()
+            stored[dtype] = np.stack([cache.get(h) for h in hashes[:1000]]).astype('float32')
+            rows.append((f"cache {dtype}", f"{cache.nbytes / 1e6:8.1f} Mo"))
+            cache.close()
+        cosine = (stored["float16"] * stored["float32"]).sum(axis=1)
+        rows.append(("cache float16: cosinus min vs float32", f"{cosine.min():.6f}"))
+
+    _print_table(f"Index compressés sur {args.size} vecteurs", rows)
+
+
+# ---------------------------------------------------------------------------
+# user-012 : parsing séquentiel vs pool de processus
+# ---------------------------------------------------------------------------
+
+def _write_synthetic_pdf(path: Path, pages, lines_per_page: int = 40):
+    """Écrit un PDF texte minimal (une police standard, une page par élément de `pages`)"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"]
+    page_refs = []
+    for text in pages:
+        words = text.split()
+        step = max(1, len(words) // lines_per_page)
+        lines = [" ".join(words[i:i + step]) for i in range(0, len(words), step)]
+        stream = "BT /F1 10 Tf 40 800 Td 12 TL " + " ".join(f"({line}) '" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        page_refs.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(page_refs)}] /Count {len(page_refs)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("cp1252")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(bytes(out))
+
+
+def bench_parallel_parsing(args):
+    """Temps de parsing + découpage d'un corpus de PDF synthétiques selon le nombre de processus"""
+    import os
+    import tempfile
+    from utils.ingestion import parse_corpus_files
+
+    nb_files = min(args.size, 300)
+    texts = [text.replace("(", "").replace(")", "") for text in _synthetic_chunks(nb_files * 8)]
+    with tempfile.TemporaryDirectory() as workdir:
+        paths = []
+        for i in range(nb_files):
+            path = Path(workdir) / f"programme_{i:04d}.pdf"
+            _write_synthetic_pdf(path, texts[i * 8:(i + 1) * 8])
+            paths.append(path)
+
+        rows = []
+        reference = None
+        cores = os.cpu_count() or 1
+        for workers in sorted({1, 2, 4, cores}):
+            start = time.perf_counter()
+            chunks = [result for _, result in parse_corpus_files(paths, "Informatique", "Secondaire", workers)]
+            elapsed = time.perf_counter() - start
+            if reference is None:
+                reference, expected = elapsed, chunks
+            # Mêmes chunks, dans le même ordre, quel que soit le nombre de processus
+            assert chunks == expected
+            rows.append((f"{workers} processus", f"{elapsed:.2f} s  (x{reference / elapsed:.1f})"))
+
+    _print_table(f"Parsing de {nb_files} PDF de 8 pages ({cores} cœurs)", rows)
+
+
+# ---------------------------------------------------------------------------
+# user-013 : pic mémoire de l'ingestion en flux selon la taille du corpus
+# ---------------------------------------------------------------------------
+
+def _streaming_ingest_worker(nb_files: int, batch_size: int, workdir: str):
+    """Ingère un corpus TXT synthétique dans un processus neuf; retourne durée et pic RSS"""
+    import config
+    config.CORPUS_DIR = Path(workdir) / "Corpus"
+    config.VECTORSTORE_DIR = Path(workdir) / "vectorstore"
+    config.VECTORSTORE_DIR.mkdir()
+    from utils.vectorstore import VectorStoreManager
+
+    matiere_dir = config.CORPUS_DIR / "Informatique"
+    matiere_dir.mkdir(parents=True)
+    texts = _synthetic_chunks(nb_files * 20)
+    for i in range(nb_files):
+        (matiere_dir / f"cours_{i:05d}.txt").write_text("\n\n".join(texts[i * 20:(i + 1) * 20]), encoding="utf-8")
+
+    vs = VectorStoreManager(parse_workers=1, ingest_batch_size=batch_size)
+    vs.warmup()
+    rss_before = _peak_rss_mb()
+    start = time.perf_counter()
+    nb_chunks = vs.load_corpus("Informatique", "Secondaire")
+    elapsed = time.perf_counter() - start
+    index_mb = vs.index.ntotal * vs.dimension * 4 / 1e6
+    vs.close()
+    return nb_chunks, elapsed, _peak_rss_mb() - rss_before, index_mb
+
+
+def bench_streaming_ingest(args):
+    """Pic RSS de load_corpus pour des corpus de tailles croissantes (lots de taille fixe)"""
+    import tempfile
+    from config import INGEST_BATCH_SIZE
+
+    rows = []
+    for nb_files in (50, 200, 800):
+        with tempfile.TemporaryDirectory() as workdir:
+            nb_chunks, elapsed, rss, index_mb = _run_isolated(
+                _streaming_ingest_worker, nb_files, INGEST_BATCH_SIZE, workdir
+            )
+        rows.append((f"{nb_files} fichiers, {nb_chunks} chunks",
+                     f"{elapsed:.1f} s  pic RSS +{rss:.1f} Mo (dont index flat {index_mb:.1f} Mo)"))
+
+    _print_table(f"Ingestion en flux (lots de {INGEST_BATCH_SIZE} chunks)", rows)
+
+
+# ---------------------------------------------------------------------------
+# user-014 : chargement d'un instantané mappé en mémoire vs lu en RAM
+# ---------------------------------------------------------------------------
+
+def _memory_rollup_mb():
+    """
+    Mémoire résidente (Mo) du processus: (totale, anonyme) — Linux uniquement
+
+    Les pages anonymes sont propres au processus; les pages d'un fichier
+    mappé restent dans le cache de pages, partagé par tous les processus.
+    """
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            fields = {line.split(":")[0]: int(line.split()[1]) for line in f if line.split()[-1] == "kB"}
+    except OSError:
+        return 0.0, 0.0
+    return fields.get("Rss", 0) / 1024, fields.get("Anonymous", 0) / 1024
+
+
+def _snapshot_load_worker(directory: str, mmap: bool):
+    """Charge la dernière génération et la parcourt par des recherches"""
+    import numpy as np
+    from utils.snapshots import SnapshotStore
+
+    rss_before, private_before = _memory_rollup_mb()
+    start = time.perf_counter()
+    index, _ = SnapshotStore(Path(directory)).load(mmap=mmap)
+    load_time = time.perf_counter() - start
+    index.search(_synthetic_embeddings(10, seed=1), 5)
+    rss, private = _memory_rollup_mb()
+    return load_time, rss - rss_before, private - private_before
+
+
+def bench_snapshot_mmap(args):
+    """Temps de chargement et mémoire non partagée par processus: instantané mappé vs lu en RAM"""
+    import tempfile
+    import numpy as np
+    from config import VECTORSTORE_INDEX
+    from utils import index_factory
+    from utils.snapshots import SnapshotStore
+
+    vectors = _synthetic_embeddings(args.size)
+    index = index_factory.build_index(vectors.shape[1], VECTORSTORE_INDEX)
+    index.add_with_ids(vectors, np.arange(len(vectors), dtype='int64'))
+
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        start = time.perf_counter()
+        entry = SnapshotStore(Path(workdir)).publish(index, {'index_type': 'flat'})
+        rows.append(("publication (écriture + fsync + SHA-256)",
+                     f"{time.perf_counter() - start:.2f} s  ({entry['size'] / 1e6:.0f} Mo)"))
+        for mmap in (False, True):
+            load, rss, private = _run_isolated(_snapshot_load_worker, workdir, mmap)
+            label = "mmap" if mmap else "RAM"
+            rows.append((f"[{label}] chargement (s)", f"{load:.2f}"))
+            rows.append((f"[{label}] RSS / dont anonyme (Mo)", f"+{rss:.0f} / +{private:.0f}"))
+
+    _print_table(f"Instantané de {args.size} vecteurs (mémoire anonyme = non partagée entre processus)", rows)
+
+
+# ---------------------------------------------------------------------------
+# user-015 : débit et latence des backends d'embedding
+# ---------------------------------------------------------------------------
+
+def bench_embedding_backends(args):
+    """Phrases/s, latence p50/p95 d'une requête et écart cosinus à la référence, par backend"""
+    import numpy as np
+    from config import EMBEDDING_MODEL, VECTORSTORE_DIR, EMBEDDING_BATCH_SIZE
+    from utils.embedding_backends import EMBEDDING_BACKENDS, load_embedding_model, cosine_agreement
+
+    texts = _synthetic_chunks(min(args.size, 1000))
+    queries = [" ".join(text.split()[:12]) for text in texts[:max(args.requests, 100)]]
+    reference = load_embedding_model("torch", EMBEDDING_MODEL, VECTORSTORE_DIR / "models")
+
+    rows = []
+    for backend in EMBEDDING_BACKENDS:
+        try:
+            model = load_embedding_model(backend, EMBEDDING_MODEL, VECTORSTORE_DIR / "models")
+        except ImportError as e:
+            rows.append((f"[{backend}]", f"indisponible ({e})"))
+            continue
+        model.encode("warmup")
+
+        start = time.perf_counter()
+        model.encode(texts, batch_size=EMBEDDING_BATCH_SIZE, show_progress_bar=False)
+        throughput = len(texts) / (time.perf_counter() - start)
+
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            model.encode(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+        p50, p95 = np.percentile(latencies, [50, 95])
+        agreement = cosine_agreement(model, reference, texts[:200])
+
+        rows.append((f"[{backend}] débit (phrases/s)", f"{throughput:.1f}"))
+        rows.append((f"[{backend}] latence requête p50 / p95 (ms)", f"{p50:.1f} / {p95:.1f}"))
+        rows.append((f"[{backend}] cosinus min / moyen vs torch", f"{agreement.min():.4f} / {agreement.mean():.4f}"))
+        del model
+
+    _print_table(f"Backends d'embedding ({len(texts)} chunks, {len(queries)} requêtes)", rows)
+
+
+# ---------------------------------------------------------------------------
+# user-016 : recherche BM25, dense et hybride par type de requête
+# ---------------------------------------------------------------------------
+
+# (thème, extrait du programme officiel, reformulation sans les mots du programme)
+PROGRAMME_THEMES = [
+    ("fonctions affines", "Objectif: reconnaître une fonction affine f(x) = ax + b et interpréter son coefficient directeur",
+     "droite dont la pente et l'ordonnée à l'origine sont connues"),
+    ("équations du second degré", "Objectif: résoudre une équation du second degré à l'aide du discriminant",
+     "trouver les racines d'un trinôme"),
+    ("probabilités conditionnelles", "Compétence: calculer une probabilité conditionnelle avec un arbre pondéré",
+     "chance qu'un événement arrive sachant qu'un autre s'est produit"),
+    ("suites arithmétiques", "Objectif: reconnaître une suite arithmétique et calculer la somme de ses termes",
+     "nombres qui augmentent toujours de la même quantité"),
+    ("boucles et itérations", "Compétence: écrire un algorithme utilisant une boucle bornée ou non bornée",
+     "répéter des instructions plusieurs fois dans un programme"),
+    ("bases de données relationnelles", "Objectif: interroger une base de données relationnelle avec des requêtes SQL",
+     "extraire des informations de tables liées entre elles"),
+    ("réseaux informatiques", "Compétence: décrire le routage des paquets dans un réseau informatique",
+     "comment les messages voyagent d'une machine à l'autre sur internet"),
+    ("vecteurs du plan", "Objectif: calculer les coordonnées d'un vecteur et tester la colinéarité de deux vecteurs",
+     "flèches dans un repère et parallélisme"),
+    ("statistiques descriptives", "Compétence: calculer la moyenne, la médiane et l'écart type d'une série statistique",
+     "résumer une liste de mesures par quelques indicateurs"),
+    ("récursivité", "Objectif: écrire une fonction récursive et identifier son cas de base",
+     "une fonction qui s'appelle elle-même"),
+]
+
+HYBRID_QUERY_TYPES = {
+    "mots-clés": lambda theme, excerpt, paraphrase: theme,
+    "programme (agent)": lambda theme, excerpt, paraphrase: f"Objectifs pédagogiques {theme} niveau Secondaire",
+    "paraphrase": lambda theme, excerpt, paraphrase: paraphrase,
+}
+
+
+def _hybrid_search_worker(size: int, top_k: int, workdir: str):
+    """Latence et taux de réussite de chaque mode de recherche, par type de requête"""
+    import io
+    from contextlib import redirect_stdout
+    import numpy as np
+    import config
+    config.VECTORSTORE_DIR = Path(workdir)
+    from utils.embedding_cache import EmbeddingCache
+    from utils.vectorstore import VectorStoreManager
+
+    vs = VectorStoreManager()
+    vs.query_cache.maxsize = 0
+    filler = _synthetic_chunks(size)
+    texts = filler + [f"Programme officiel - {theme}\n{excerpt}" for theme, excerpt, _ in PROGRAMME_THEMES]
+    metadatas = [{'matiere': 'Mathématiques', 'niveau': 'Secondaire', 'type': 'cours'} for _ in filler]
+    metadatas += [{'matiere': 'Mathématiques', 'niveau': 'Secondaire', 'type': 'officiel', 'theme': theme}
+                  for theme, _, _ in PROGRAMME_THEMES]
+    vs.add_documents(texts, metadatas)
+    vs.warmup()
+
+    modes = {
+        "dense": lambda query: vs.search_similar(query, top_k=top_k, similarity_threshold=-1.0),
+        "bm25": lambda query: vs.search_lexical(query, top_k=top_k),
+        "hybride": lambda query: vs.search_hybrid(query, top_k=top_k, similarity_threshold=-1.0),
+    }
+    rows = []
+    for query_type, make_query in HYBRID_QUERY_TYPES.items():
+        for mode, search in modes.items():
+            # Cache d'embeddings vide: chaque mode encode ses requêtes
+            vs.cache.close()
+            vs.cache = EmbeddingCache(Path(workdir) / f"cache_{query_type}_{mode}".replace(" ", "_"), vs.dimension)
+            served_by_bm25 = vs.hybrid_stats['lexical']
+            latencies, hits = [], 0
+            for theme, excerpt, paraphrase in PROGRAMME_THEMES:
+                with redirect_stdout(io.StringIO()):
+                    start = time.perf_counter()
+                    results = search(make_query(theme, excerpt, paraphrase))
+                    latencies.append((time.perf_counter() - start) * 1000)
+                hits += any(metadata.get('theme') == theme for _, _, metadata in results)
+            served_by_bm25 = vs.hybrid_stats['lexical'] - served_by_bm25
+            rows.append((query_type, mode, float(np.median(latencies)), hits / len(PROGRAMME_THEMES),
+                         served_by_bm25 / len(PROGRAMME_THEMES) if mode == "hybride" else None))
+    vs.close()
+    return rows
+
+
+def bench_hybrid_search(args):
+    """Latence p50 et taux de réussite (programme retrouvé dans le top-k): dense, BM25, hybride"""
+    import tempfile
+
+    size = min(args.size, 5000)
+    top_k = 3
+    with tempfile.TemporaryDirectory() as workdir:
+        results = _run_isolated(_hybrid_search_worker, size, top_k, workdir)
+
+    rows = []
+    for query_type, mode, latency, hit_rate, served_by_bm25 in results:
+        value = f"{latency:8.2f} ms   réussite {hit_rate:.0%}"
+        if served_by_bm25 is not None:
+            value += f"   (BM25 seul: {served_by_bm25:.0%})"
+        rows.append((f"[{query_type}] {mode}", value))
+    _print_table(f"Recherche de {len(PROGRAMME_THEMES)} thèmes du programme parmi {size} chunks (top {top_k})", rows)
+
+
+# ---------------------------------------------------------------------------
+# user-017 : fusion des quasi-doublons (taille de l'index, latence de recherche)
+# ---------------------------------------------------------------------------
+
+def _near_duplicate_corpus(size: int):
+    """Chunks de programmes: un tiers de passages communs répétés d'un niveau à l'autre, légèrement modifiés"""
+    import random
+
+    rng = random.Random(1)
+    unique = _synthetic_chunks(size - size // 3)
+    boilerplate = unique[:max(1, size // 30)]
+    texts, metadatas = [], []
+    for i, text in enumerate(unique):
+        texts.append(text)
+        metadatas.append({'matiere': 'Mathématiques', 'niveau': f"niveau_{i % 4}"})
+    for i in range(size - len(unique)):
+        words = rng.choice(boilerplate).split()
+        words[rng.randrange(len(words))] = "modifié"
+        texts.append(" ".join(words))
+        metadatas.append({'matiere': 'Mathématiques', 'niveau': f"niveau_{i % 4}"})
+    return texts, metadatas
+
+
+def _near_duplicate_worker(size: int, deduplicate: bool, nb_queries: int, workdir: str):
+    """Ingère le corpus (fusion activée ou non) puis mesure la recherche filtrée"""
+    import io
+    from contextlib import redirect_stdout
+    import numpy as np
+    import config
+    config.VECTORSTORE_DIR = Path(workdir)
+    from utils.vectorstore import VectorStoreManager
+
+    with redirect_stdout(io.StringIO()):
+        vs = VectorStoreManager()
+        vs.near_duplicates_config['enabled'] = deduplicate
+        texts, metadatas = _near_duplicate_corpus(size)
+        start = time.perf_counter()
+        for begin in range(0, len(texts), vs.ingest_batch_size):
+            end = begin + vs.ingest_batch_size
+            vs.upsert(texts[begin:end], metadatas[begin:end], [f"chunk_{i}" for i in range(begin, end)],
+                      deduplicate=True)
+        ingest = time.perf_counter() - start
+        vs.warmup()
+
+        queries = [" ".join(text.split()[:15]) for text in texts[::max(1, len(texts) // nb_queries)]][:nb_queries]
+        vs._get_embeddings_batch(queries)
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            vs.search_similar(query, matiere="Mathématiques", niveau="niveau_1", top_k=5, similarity_threshold=0.0)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        stats = vs.get_stats()
+        vs.close()
+    return ingest, stats['index_size'], stats['cache_bytes'], float(np.median(latencies))
+
+
+def bench_near_duplicates(args):
+    """Taille de l'index, du cache et latence de recherche filtrée, avec et sans fusion des quasi-doublons"""
+    import tempfile
+
+    size = min(args.size, 5000)
+    nb_queries = 200
+    rows = []
+    results = {}
+    for deduplicate in (False, True):
+        with tempfile.TemporaryDirectory() as workdir:
+            results[deduplicate] = _run_isolated(_near_duplicate_worker, size, deduplicate, nb_queries, workdir)
+    for deduplicate, label in ((False, "sans fusion"), (True, "avec fusion")):
+        ingest, vectors, cache_bytes, latency = results[deduplicate]
+        rows.append((f"[{label}] ingestion (s)", f"{ingest:.2f}"))
+        rows.append((f"[{label}] vecteurs dans l'index", f"{vectors}"))
+        rows.append((f"[{label}] cache des embeddings (Mo)", f"{cache_bytes / 1e6:.1f}"))
+        rows.append((f"[{label}] recherche filtrée p50 (ms)", f"{latency:.2f}"))
+    rows.append(("Réduction de l'index", f"-{1 - results[True][1] / results[False][1]:.0%}"))
+    _print_table(f"Quasi-doublons: {size} chunks dont un tiers de passages répétés", rows)
+
+
+# ---------------------------------------------------------------------------
+# user-019 : première requête avec ingestion à la demande vs artefact prébuilt
+# ---------------------------------------------------------------------------
+
+def _first_request_corpus(workdir: str, nb_files: int):
+    """Pointe la configuration vers un corpus TXT synthétique (créé au premier appel)"""
+    import config
+    config.CORPUS_DIR = Path(workdir) / "Corpus"
+    matiere_dir = config.CORPUS_DIR / "Informatique"
+    if not matiere_dir.exists():
+        matiere_dir.mkdir(parents=True)
+        texts = _synthetic_chunks(nb_files * 20)
+        for i in range(nb_files):
+            (matiere_dir / f"cours_{i:05d}.txt").write_text("\n\n".join(texts[i * 20:(i + 1) * 20]), encoding="utf-8")
+
+
+def _prebuilt_build_worker(nb_files: int, workdir: str):
+    """Build hors ligne (processus non démon: le build lance son propre pool)"""
+    import io
+    from contextlib import redirect_stdout
+    import config
+    _first_request_corpus(workdir, nb_files)
+    config.VECTORSTORE_DIR = Path(workdir) / "build"
+    config.VECTORSTORE_DIR.mkdir(exist_ok=True)
+    from utils.corpus_build import build_corpus
+
+    with redirect_stdout(io.StringIO()):
+        build_corpus(
+            subjects=["Informatique"], cycles=["Secondaire"],
+            corpus_dir=config.CORPUS_DIR, releases_dir=Path(workdir) / "releases"
+        )
+
+
+def _first_request_worker(mode: str, nb_files: int, workdir: str):
+    """
+    Première requête d'un serveur neuf (chargement du vector store, load_corpus,
+    recherche), corpus ingéré à la demande ou prébuilt; retourne les durées
+    """
+    import io
+    from contextlib import redirect_stdout
+    import config
+    _first_request_corpus(workdir, nb_files)
+    config.VECTORSTORE_DIR = Path(workdir) / mode
+    config.VECTORSTORE_DIR.mkdir(exist_ok=True)
+    from utils.vectorstore import VectorStoreManager, open_prebuilt_vectorstore
+
+    with redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        if mode == "prebuilt":
+            vs = open_prebuilt_vectorstore(Path(workdir) / "releases")
+        else:
+            vs = VectorStoreManager(parse_workers=1)
+        startup = time.perf_counter() - start
+        start = time.perf_counter()
+        vs.load_corpus("Informatique", "Secondaire")
+        vs.search_hybrid("objectifs boucle algorithme", "Informatique", "Secondaire", top_k=5)
+        first_request = time.perf_counter() - start
+        vs.close()
+    return startup, first_request
+
+
+def bench_prebuilt_artifacts(args):
+    """Latence de la première requête: ingestion dans le chemin de la requête vs artefact prébuilt"""
+    import tempfile
+
+    nb_files = max(1, args.size // 20)
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        startup, first = _run_isolated(_first_request_worker, "lazy", nb_files, workdir)
+        rows.append(("ingestion à la demande", f"démarrage {startup:.2f} s  première requête {first:.2f} s"))
+
+        build = multiprocessing.get_context("spawn").Process(target=_prebuilt_build_worker, args=(nb_files, workdir))
+        start = time.perf_counter()
+        build.start()
+        build.join()
+        build_time = time.perf_counter() - start
+        startup, first = _run_isolated(_first_request_worker, "prebuilt", nb_files, workdir)
+        rows.append(("artefact prébuilt", f"démarrage {startup:.2f} s  première requête {first:.2f} s"
+                                          f"  (build hors ligne {build_time:.1f} s)"))
+
+    _print_table(f"Première requête, corpus de {nb_files} fichiers ({nb_files * 20} chunks)", rows)
+
+
+# ---------------------------------------------------------------------------
+# user-020 : débit de search_similar sous N clients simultanés, en processus vs service local
+# ---------------------------------------------------------------------------
+
+SERVICE_CLIENTS = (1, 4, 16)
+
+
+def _concurrent_searches(search, nb_clients: int, per_client: int, tag: str) -> float:
+    """
+    Lance nb_clients threads de per_client recherches distinctes (jamais vues:
+    `tag` différent à chaque mesure); retourne le débit (requêtes/s)
+    """
+    import threading
+
+    def client(number: int):
+        for i in range(per_client):
+            search(f"{tag} exercice {number} numéro {i}: boucle et variable en algorithmique")
+
+    threads = [threading.Thread(target=client, args=(number,)) for number in range(nb_clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return nb_clients * per_client / (time.perf_counter() - start)
+
+
+def _service_store(workdir: str, size: int):
+    """Vector store du benchmark (corpus synthétique ingéré au premier appel, cache des requêtes désactivé)"""
+    import config
+    config.VECTORSTORE_DIR = Path(workdir)
+    from utils.vectorstore import VectorStoreManager
+
+    vs = VectorStoreManager()
+    vs.query_cache.maxsize = 0
+    if not vs.index.ntotal:
+        vs.add_documents(_synthetic_chunks(size), [{'matiere': 'Informatique'}] * size)
+        vs.flush()
+    vs.warmup()
+    return vs
+
+
+def _in_process_search_worker(workdir: str, size: int, nb_clients: int, per_client: int):
+    """Débit d'un VectorStoreManager partagé par nb_clients threads du même processus"""
+    import io
+    from contextlib import redirect_stdout
+
+    with redirect_stdout(io.StringIO()):
+        vs = _service_store(workdir, size)
+        throughput = _concurrent_searches(
+            lambda query: vs.search_similar(query, matiere="Informatique", similarity_threshold=-1.0),
+            nb_clients, per_client, f"processus {nb_clients}"
+        )
+        vs.close()
+    return throughput
+
+
+def _service_server_worker(workdir: str, size: int, address: str, window_ms: float, ready):
+    """Processus serveur du benchmark (arrêté par terminate())"""
+    import io
+    from contextlib import redirect_stdout
+
+    with redirect_stdout(io.StringIO()):
+        vs = _service_store(workdir, size)
+        from utils.vectorstore_service import VectorStoreServer
+        server = VectorStoreServer(vs, address, window_ms)
+        ready.set()
+        server.serve_forever()
+
+
+def bench_vectorstore_service(args):
+    """Débit de search_similar sous N clients simultanés: vector store dans le processus vs service micro-lots"""
+    import io
+    import tempfile
+    from contextlib import redirect_stdout
+    from utils.vectorstore_service import VectorStoreClient
+
+    size = min(args.size, 20_000)
+    per_client = max(1, args.requests) * 4
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for nb_clients in SERVICE_CLIENTS:
+            results[("processus", nb_clients)] = (
+                _run_isolated(_in_process_search_worker, workdir, size, nb_clients, per_client), None
+            )
+
+        for window_ms in (0.0, 5.0):
+            address = str(Path(workdir) / "service.sock") if sys.platform != "win32" else r"\\.\pipe\vectorstore-bench"
+            ready = ctx.Event()
+            server = ctx.Process(target=_service_server_worker, args=(workdir, size, address, window_ms, ready))
+            server.start()
+            ready.wait()
+            try:
+                for nb_clients in SERVICE_CLIENTS:
+                    client = VectorStoreClient(address)
+                    before = client.get_stats()['service']['search']
+                    throughput = _concurrent_searches(
+                        lambda query: client.search_similar(query, matiere="Informatique", similarity_threshold=-1.0),
+                        nb_clients, per_client, f"service {window_ms} {nb_clients}"
+                    )
+                    after = client.get_stats()['service']['search']
+                    batches = after['batches'] - before['batches']
+                    mean_batch = (after['requests'] - before['requests']) / max(1, batches)
+                    results[(f"service {window_ms:g} ms", nb_clients)] = (throughput, mean_batch)
+                    client.close()
+            finally:
+                server.terminate()
+                server.join()
+
+    rows = []
+    for (mode, nb_clients), (throughput, mean_batch) in results.items():
+        detail = f"  (lots de {mean_batch:.1f} requêtes en moyenne)" if mean_batch is not None else ""
+        rows.append((f"{mode}, {nb_clients} client(s)", f"{throughput:.0f} requêtes/s{detail}"))
+    _print_table(f"search_similar concurrent ({size} chunks, {per_client} requêtes par client)", rows)
+
+
+# ---------------------------------------------------------------------------
+# user-021 : lectures sans verrou pendant les écritures (cohérence et débit)
+# ---------------------------------------------------------------------------
+
+CONCURRENCY_READERS = (4, 16)
+
+
+def _concurrency_worker(workdir: str, size: int, nb_readers: int, per_reader: int, with_writer: bool):
+    """
+    nb_readers threads de recherche, avec ou sans un thread qui ajoute et
+    supprime des fiches en continu
+
+    Chaque chunk commence par "[n]" et porte n dans ses métadonnées: un
+    résultat dont le texte et les métadonnées ne concordent pas trahirait une
+    lecture d'un index en cours de modification.
+
+    Returns:
+        Tuple: (débit des lectures, écritures/s, résultats incohérents, exceptions)
+    """
+    import io
+    import threading
+    from contextlib import redirect_stdout
+    import config
+    config.VECTORSTORE_DIR = Path(workdir)
+    from utils.vectorstore import VectorStoreManager
+
+    counters = {'inconsistent': 0, 'errors': 0, 'writes': 0}
+    stop = threading.Event()
+
+    def check(results):
+        for content, _, metadata in results:
+            if not content.startswith(f"[{metadata.get('n')}] "):
+                counters['inconsistent'] += 1
+
+    def reader(number: int):
+        for i in range(per_reader):
+            try:
+                check(vs.search_similar(
+                    f"lecteur {number} requête {i} {with_writer}: boucle et variable",
+                    matiere="Informatique", top_k=10, similarity_threshold=-1.0
+                ))
+            except Exception:
+                counters['errors'] += 1
+
+    def writer():
+        n = size
+        while not stop.is_set():
+            try:
+                vs.add_validated_fiche(
+                    f"fiche_{n}", f"[{n}] fiche validée {n}: boucle, variable et algorithme",
+                    {'matiere': 'Informatique', 'n': n}
+                )
+                if n % 2:
+                    vs.delete([f"fiche_{n - 1}"])
+                counters['writes'] += 1
+            except Exception:
+                counters['errors'] += 1
+            n += 1
+
+    with redirect_stdout(io.StringIO()):
+        vs = VectorStoreManager()
+        vs.query_cache.maxsize = 0
+        if not vs.index.ntotal:
+            vs.add_documents(
+                [f"[{n}] {text}" for n, text in enumerate(_synthetic_chunks(size))],
+                [{'matiere': 'Informatique', 'n': n} for n in range(size)]
+            )
+            vs.flush()
+        vs.warmup()
+
+        threads = [threading.Thread(target=reader, args=(number,)) for number in range(nb_readers)]
+        writer_thread = threading.Thread(target=writer)
+        start = time.perf_counter()
+        if with_writer:
+            writer_thread.start()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        stop.set()
+        if with_writer:
+            writer_thread.join()
+
+        # Index publié aligné sur la base des chunks après les écritures
+        vs.flush()
+        if vs.index.ntotal != len(vs.store.vector_labels()):
+            counters['inconsistent'] += 1
+        vs.delete_where({'type': 'fiche_validee'})
+        vs.close()
+    return nb_readers * per_reader / elapsed, counters['writes'] / elapsed, counters['inconsistent'], counters['errors']
+
+
+def bench_concurrency(args):
+    """Débit des recherches sans verrou, seules et pendant des écritures continues; cohérence des résultats"""
+    import tempfile
+
+    size = min(args.size, 20_000)
+    per_reader = max(1, args.requests) * 4
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for nb_readers in CONCURRENCY_READERS:
+            for with_writer in (False, True):
+                throughput, writes, inconsistent, errors = _run_isolated(
+                    _concurrency_worker, workdir, size, nb_readers, per_reader, with_writer
+                )
+                label = f"{nb_readers} lecteurs" + (" + 1 écrivain" if with_writer else "")
+                detail = f", {writes:.1f} écritures/s" if with_writer else ""
+                rows.append((label, f"{throughput:.0f} recherches/s{detail}, "
+                                    f"{inconsistent} incohérence(s), {errors} erreur(s)"))
+    _print_table(f"Lectures concurrentes sans verrou ({size} chunks, {per_reader} recherches par lecteur)", rows)
+
+
+# ---------------------------------------------------------------------------
+# user-022 : coût par fiche validée, sauvegarde à chaque fiche vs différée
+# ---------------------------------------------------------------------------
+
+FICHE_CORPUS_SIZES = (2_000, 10_000, 20_000)
+
+
+def _fiche_store(workdir: str, size: int):
+    """Vector store de `size` chunks synthétiques (ingérés au premier appel)"""
+    import config
+    config.VECTORSTORE_DIR = Path(workdir) / str(size)
+    config.VECTORSTORE_DIR.mkdir(exist_ok=True)
+    config.SNAPSHOT_WRITE_BEHIND = {**config.SNAPSHOT_WRITE_BEHIND, 'interval_s': 3600.0}
+    from utils.vectorstore import VectorStoreManager
+
+    vs = VectorStoreManager()
+    if not vs.index.ntotal:
+        vs.add_documents(_synthetic_chunks(size), [{'matiere': 'Informatique'}] * size)
+        vs.flush()
+    vs.warmup()
+    return vs
+
+
+def _fiche_latency_worker(workdir: str, size: int, nb_fiches: int, synchronous: bool):
+    """Latence de add_validated_fiche (ms, moyenne et p95), suivie ou non d'une sauvegarde immédiate"""
+    import io
+    from contextlib import redirect_stdout
+    import numpy as np
+
+    with redirect_stdout(io.StringIO()):
+        vs = _fiche_store(workdir, size)
+        timings = []
+        for i in range(nb_fiches):
+            start = time.perf_counter()
+            vs.add_validated_fiche(
+                f"fiche_{synchronous}_{i}", f"fiche validée {synchronous} {i}: boucle et variable",
+                {'matiere': 'Informatique'}
+            )
+            if synchronous:
+                # Comportement précédent: instantané complet écrit avant de répondre
+                vs.flush()
+            timings.append((time.perf_counter() - start) * 1000)
+        vs.delete_where({'type': 'fiche_validee'})
+        vs.close()
+    return float(np.mean(timings)), float(np.percentile(timings, 95))
+
+
+def _fiche_crash_worker(workdir: str, size: int, nb_fiches: int):
+    """Ajoute des fiches puis s'arrête brutalement, sans sauvegarde de l'index"""
+    import io
+    import os
+    from contextlib import redirect_stdout
+
+    with redirect_stdout(io.StringIO()):
+        vs = _fiche_store(workdir, size)
+        vs.add_validated_fiches([
+            (f"fiche_crash_{i}", f"fiche validée avant l'arrêt {i}", {'matiere': 'Informatique'})
+            for i in range(nb_fiches)
+        ])
+    os._exit(0)
+
+
+def _fiche_replay_worker(workdir: str, size: int):
+    """Fiches rejouées au redémarrage: présentes dans la base et dans l'index chargé"""
+    import io
+    from contextlib import redirect_stdout
+    import numpy as np
+
+    with redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        vs = _fiche_store(workdir, size)
+        startup = time.perf_counter() - start
+        from utils import index_factory
+        fiches = vs.store.labels_where({'type': 'fiche_validee'})
+        indexed = int(np.isin(fiches, index_factory.stored_labels(vs.index)).sum())
+        vs.delete_where({'type': 'fiche_validee'})
+        vs.close()
+    return len(fiches), indexed, startup
+
+
+def bench_write_behind(args):
+    """Latence de add_validated_fiche selon la taille de l'index, et reprise après un arrêt brutal"""
+    import tempfile
+
+    nb_fiches = max(1, args.requests) * 4
+    sizes = [size for size in FICHE_CORPUS_SIZES if size <= args.size] or [args.size]
+    ctx = multiprocessing.get_context("spawn")
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            for synchronous in (True, False):
+                mean, p95 = _run_isolated(_fiche_latency_worker, workdir, size, nb_fiches, synchronous)
+                mode = "sauvegarde à chaque fiche" if synchronous else "sauvegarde différée"
+                rows.append((f"{size} chunks, {mode}", f"{mean:.1f} ms (p95 {p95:.1f} ms)"))
+
+        crash = ctx.Process(target=_fiche_crash_worker, args=(workdir, sizes[-1], nb_fiches))
+        crash.start()
+        crash.join()
+        stored, indexed, startup = _run_isolated(_fiche_replay_worker, workdir, sizes[-1])
+        rows.append((f"Arrêt brutal après {nb_fiches} fiches",
+                     f"{indexed}/{stored} rejouées au redémarrage ({startup:.2f} s)"))
+    _print_table(f"Fiches validées ({nb_fiches} ajouts un par un)", rows)
+
+
+
+# ---------------------------------------------------------------------------
+# user-023 : cache des embeddings borné, politiques lru et lfu
+# ---------------------------------------------------------------------------
+
+def bench_cache_policies(args):
+    """Taux de succès, évictions et taille du cache sur un flux de requêtes répétées (loi de Zipf)"""
+    import tempfile
+    import numpy as np
+    from utils.embedding_cache import EmbeddingCache
+
+    nb_lookups = max(args.requests, 1) * 10_000
+    vocabulary = max(args.size // 10, 1_000)
+    rng = np.random.default_rng(0)
+    # Quelques requêtes très fréquentes, une longue traîne de requêtes rares
+    stream = (rng.zipf(1.2, nb_lookups) - 1) % vocabulary
+    vectors = _synthetic_embeddings(vocabulary)
+    hashes = [f"{i:032x}" for i in range(vocabulary)]
+
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for policy, max_entries in (("lru", 0), ("lru", vocabulary // 20), ("lfu", vocabulary // 20)):
+            cache = EmbeddingCache(
+                Path(workdir) / f"{policy}_{max_entries}", vectors.shape[1], max_entries=max_entries, policy=policy
+            )
+            start = time.perf_counter()
+            for position in stream:
+                if cache.get(hashes[position]) is None:
+                    cache.put(hashes[position], vectors[position])
+            elapsed = time.perf_counter() - start
+            cache.flush()
+            stats = cache.stats()
+            name = f"{policy}, {max_entries} vecteurs max" if max_entries else "illimité"
+            rows.append((name, f"succès {stats['hit_rate']:.1%}  {stats['evictions']} évictions  "
+                               f"{stats['bytes'] / 1e6:.1f} Mo ({stats['disk_bytes'] / 1e6:.1f} Mo sur disque)  "
+                               f"{elapsed / nb_lookups * 1e6:.1f} µs/requête"))
+            cache.close()
+    _print_table(f"Cache des embeddings: {nb_lookups} requêtes sur {vocabulary} textes distincts", rows)
+
+
+# ---------------------------------------------------------------------------
+# user-024 : plusieurs processus sur le même vector store
+# ---------------------------------------------------------------------------
+
+def _mp_reader_worker(workdir: str, size: int, nb_searches: int, ready, published, results):
+    """Latence des recherches (détection d'une nouvelle génération incluse), puis rattrapage vs reload()"""
+    import io
+    from contextlib import redirect_stdout
+    import numpy as np
+
+    with redirect_stdout(io.StringIO()):
+        vs = _fiche_store(workdir, size)
+        queries = [f"boucle variable {i}" for i in range(nb_searches)]
+        vs.search_similar("échauffement")
+        # 1000 stats en ms = µs par stat
+        start = time.perf_counter()
+        for _ in range(1000):
+            vs.snapshots.signature()
+        detection = (time.perf_counter() - start) * 1000
+        timings = []
+        for query in queries[1:]:
+            start = time.perf_counter()
+            vs.search_similar(query)
+            timings.append((time.perf_counter() - start) * 1000)
+        ready.set()
+        published.wait()
+
+        start = time.perf_counter()
+        vs.search_similar(queries[0], filters={'type': 'publiée'})
+        catch_up = (time.perf_counter() - start) * 1000
+        seen = int(vs.index.ntotal)
+        start = time.perf_counter()
+        vs.reload()
+        reload = (time.perf_counter() - start) * 1000
+        vs.close()
+    results.put((detection, float(np.mean(timings)), catch_up, seen, reload))
+
+
+def _mp_writer_worker(workdir: str, size: int, writer: int, nb_batches: int) -> float:
+    """Ajouts concurrents d'un processus écrivain; retourne la latence moyenne d'un ajout (ms)"""
+    import io
+    from contextlib import redirect_stdout
+
+    with redirect_stdout(io.StringIO()):
+        vs = _fiche_store(workdir, size)
+        start = time.perf_counter()
+        for batch in range(nb_batches):
+            vs.add_documents(
+                [f"chunk publié {writer} {batch} {i}: boucle et variable" for i in range(10)],
+                [{'matiere': 'Informatique', 'type': 'publiée'}] * 10,
+                [f"publie_{writer}_{batch}_{i}" for i in range(10)]
+            )
+        elapsed = (time.perf_counter() - start) * 1000 / nb_batches
+        vs.close()
+    return elapsed
+
+
+def _mp_check_worker(workdir: str, size: int):
+    """Chunks dans la base et vecteurs dans l'index rechargé, puis nettoyage"""
+    import io
+    from contextlib import redirect_stdout
+    import numpy as np
+
+    with redirect_stdout(io.StringIO()):
+        vs = _fiche_store(workdir, size)
+        from utils import index_factory
+        labels = index_factory.stored_labels(vs.index)
+        consistent = bool(np.array_equal(np.sort(labels), vs.store.vector_labels()))
+        published = len(vs.store.labels_where({'type': 'publiée'}))
+        vs.delete_where({'type': 'publiée'})
+        vs.close()
+    return published, consistent
+
+
+def bench_multiprocess(args):
+    """Un écrivain publie pendant qu'un autre processus cherche; deux écrivains concurrents"""
+    import tempfile
+
+    size = min(args.size, 20_000)
+    nb_batches = max(args.requests, 1)
+    ctx = multiprocessing.get_context("spawn")
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        _run_isolated(_mp_check_worker, workdir, size)
+
+        ready, published, results = ctx.Event(), ctx.Event(), ctx.Queue()
+        reader = ctx.Process(target=_mp_reader_worker, args=(workdir, size, 50, ready, published, results))
+        reader.start()
+        ready.wait()
+        _run_isolated(_mp_writer_worker, workdir, size, 0, 1)
+        published.set()
+        detection, search, catch_up, seen, reload = results.get()
+        reader.join()
+        rows.append(("Détection d'une publication (1 stat)", f"{detection:.2f} µs"))
+        rows.append(("Recherche (détection incluse)", f"{search:.2f} ms"))
+        rows.append(("Recherche après publication d'un autre processus",
+                     f"{catch_up:.1f} ms (rattrapage, {seen} vecteurs vus)"))
+        rows.append(("reload() complet", f"{reload:.1f} ms"))
+
+        with ctx.Pool(2) as pool:
+            latencies = pool.starmap(_mp_writer_worker, [(workdir, size, writer, nb_batches) for writer in (1, 2)])
+        stored, consistent = _run_isolated(_mp_check_worker, workdir, size)
+        rows.append((f"2 écrivains x {nb_batches} ajouts de 10 chunks",
+                     f"{max(latencies):.1f} ms/ajout, {stored} chunks, index {'cohérent' if consistent else 'INCOHÉRENT'}"))
+    _print_table(f"Plusieurs processus sur un vector store de {size} chunks", rows)
+
+
+# ---------------------------------------------------------------------------
+# user-025 : projection PCA (64, 128, 192 dimensions) vs index 384 dimensions
+# ---------------------------------------------------------------------------
+
+def _corpus_vectors(limit: int):
+    """Vecteurs exacts du vector store de VECTORSTORE_DIR (None s'il en a trop peu ou les a compressés)"""
+    from config import VECTORSTORE_DIR
+    from utils import index_factory
+    from utils.snapshots import SnapshotStore
+
+    if not (VECTORSTORE_DIR / "snapshots" / "manifest.json").exists():
+        return None
+    loaded = SnapshotStore(VECTORSTORE_DIR / "snapshots").load(mmap=False)
+    if loaded is None or not index_factory.stores_exact_vectors(loaded[0]):
+        return None
+    labels = index_factory.stored_labels(loaded[0])[:limit]
+    if len(labels) < index_factory.MIN_PCA_TRAINING_SIZE:
+        return None
+    return index_factory.reconstruct(loaded[0], labels)
+
+
+def _low_rank_embeddings(size: int, dimension: int = 384, seed: int = 0):
+    """
+    Embeddings normalisés regroupés en thèmes, à spectre décroissant: la
+    variance se concentre sur quelques directions, comme pour un modèle de phrases
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    basis = np.linalg.qr(rng.standard_normal((dimension, dimension)))[0].astype('float32')
+    scales = (1.0 / np.sqrt(1 + np.arange(dimension))).astype('float32')
+    centers = rng.standard_normal((max(1, size // 200), dimension)).astype('float32') * scales
+    vectors = centers[rng.integers(0, len(centers), size)]
+    vectors = (vectors + 0.6 * rng.standard_normal((size, dimension)).astype('float32') * scales) @ basis
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def bench_pca(args):
+    """Rappel@k, latence, mémoire et auto-similarité d'un index flat projeté par PCA, par rapport au flat 384 dimensions"""
+    import numpy as np
+    import faiss
+    from config import VECTORSTORE_INDEX, SIMILARITY_THRESHOLD
+    from utils import index_factory
+
+    k = 10
+    nb_queries = 200
+    vectors = _corpus_vectors(args.size)
+    if vectors is not None:
+        # Requêtes: chunks du corpus tirés au hasard (leur propre vecteur compte dans les deux classements)
+        source = "vecteurs du vector store"
+        queries = vectors[np.random.default_rng(1).choice(len(vectors), nb_queries, replace=False)]
+    else:
+        source = "embeddings synthétiques"
+        vectors = _low_rank_embeddings(args.size + nb_queries)
+        vectors, queries = vectors[:-nb_queries], vectors[-nb_queries:]
+    labels = np.arange(len(vectors), dtype='int64')
+
+    rows = []
+    truth = flat_ms = flat_bytes = None
+    for pca_dim in (0, 64, 128, 192):
+        config = {**VECTORSTORE_INDEX, 'type': 'flat', 'pca_dim': pca_dim}
+        start = time.perf_counter()
+        # Sans seuil de similarité: la projection est mesurée même quand le vector store la refuserait
+        index = index_factory.build_index(vectors.shape[1], config, vectors)
+        index.add_with_ids(vectors, labels)
+        build_s = time.perf_counter() - start
+        nbytes = len(faiss.serialize_index(index))
+        ms, found = _time_search(index, queries, k)
+        start = time.perf_counter()
+        index.search(queries, k)
+        batch_ms = (time.perf_counter() - start) * 1000 / nb_queries
+        if truth is None:
+            truth, flat_ms, flat_bytes = np.array(found), ms, nbytes
+        residuals = index_factory.projection_residuals(index, queries)
+        kept = 1.0 if residuals is None else 1.0 - float(residuals.mean())
+        # Score d'un vecteur stocké cherché contre lui-même (1 sans projection) et part
+        # des correspondances exactes retrouvées au-dessus des seuils de réutilisation et de recherche
+        self_scores = index_factory.self_similarities(index, vectors[:nb_queries])
+        if self_scores is None:
+            self_scores = np.ones(nb_queries)
+        rows.append((index_factory.describe(index),
+                     f"recall@1={_recall_at_k(truth[:, :1], [f[:1] for f in found]):.3f}  "
+                     f"recall@{k}={_recall_at_k(truth, found):.3f}  "
+                     f"{ms:.3f} ms/req (x{flat_ms / ms:.1f})  lot {batch_ms:.3f} ms/req  "
+                     f"{nbytes / 1e6:.1f} Mo (x{flat_bytes / nbytes:.1f})  "
+                     f"variance gardée {kept:.1%}  build {build_s:.1f}s"))
+        rows.append(("  correspondances exactes",
+                     f"auto-similarité médiane {np.median(self_scores):.3f}  "
+                     f">= {SIMILARITY_THRESHOLD:.2f}: {(self_scores >= SIMILARITY_THRESHOLD).mean():.1%}  "
+                     f">= 0.70: {(self_scores >= 0.7).mean():.1%}"))
+
+    _print_table(f"Projection PCA sur {len(vectors)} {source}", rows)
+
+BENCHMARKS = {
+    "shared": bench_shared_instance,
+    "cache": bench_embedding_cache,
+    "encode": bench_batch_encoding,
+    "ann": bench_ann_indexes,
+    "batch-search": bench_batch_search,
+    "compression": bench_compression,
+    "parse": bench_parallel_parsing,
+    "stream": bench_streaming_ingest,
+    "snapshot": bench_snapshot_mmap,
+    "backends": bench_embedding_backends,
+    "hybrid": bench_hybrid_search,
+    "dedup": bench_near_duplicates,
+    "prebuilt": bench_prebuilt_artifacts,
+    "service": bench_vectorstore_service,
+    "concurrency": bench_concurrency,
+    "write-behind": bench_write_behind,
+    "cache-policy": bench_cache_policies,
+    "multiprocess": bench_multiprocess,
+    "pca": bench_pca,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks du VectorStore")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("--requests", type=int, default=5, help="Nombre de requêtes simulées")
+    parser.add_argument("--size", type=int, default=100_000, help="Taille du corpus simulé (chunks)")
+    args = parser.parse_args()
+
+    BENCHMARKS[args.benchmark](args)
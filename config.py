@@ -29,6 +29,113 @@ GEMINI_MAX_TOKENS = 2035
 # Configuration de l'embedding
 EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
 
+# Backend d'inférence du modèle d'embedding: "torch" (référence), "torch_int8"
+# (quantification dynamique), "onnx" ou "onnx_int8" (requièrent optimum[onnxruntime])
+EMBEDDING_BACKEND = "torch"
+
+# Similarité cosinus minimale entre un backend optimisé et la référence PyTorch
+# (en deçà, le backend est rejeté et PyTorch est utilisé)
+EMBEDDING_COSINE_TOLERANCE = 0.99
+
+# Taille des lots envoyés au modèle d'embedding
+EMBEDDING_BATCH_SIZE = 64
+
+# Nombre de processus pour parser le corpus (PDF/TXT) en parallèle (1 = séquentiel)
+CORPUS_PARSE_WORKERS = os.cpu_count() or 1
+
+# Ingestion en flux: nombre de chunks encodés et ajoutés à l'index par lot
+INGEST_BATCH_SIZE = 256
+
+# Cache des embeddings: nombre de nouveaux vecteurs écrits par lot sur le disque
+EMBEDDING_CACHE_FLUSH_EVERY = 256
+
+# Cache des embeddings: type de stockage, "float32" ou "float16" (moitié moins de mémoire)
+EMBEDDING_CACHE_DTYPE = "float32"
+
+# Cache des embeddings (un par modèle et dimension): nombre maximal de vecteurs (0 = illimité)
+# et politique d'éviction, "lru" (moins récemment utilisé) ou "lfu" (moins souvent utilisé).
+# Les vecteurs des chunks indexés sont lus dans l'index, pas gardés dans le cache
+EMBEDDING_CACHE_MAX_ENTRIES = 50_000
+EMBEDDING_CACHE_POLICY = "lru"
+
+# Cache LRU des résultats de recherche (nombre de recherches gardées, 0 = désactivé)
+QUERY_CACHE_SIZE = 1024
+
+# Recherche hybride (VectorStoreManager.search_hybrid): index inversé BM25 puis recherche dense
+HYBRID_SEARCH = {
+    "candidates": 50,              # Candidats de chaque classement avant fusion
+    "rrf_k": 60,                   # Constante de la Reciprocal Rank Fusion
+    "lexical_min_coverage": 0.5    # Part des termes de la requête couverte par le meilleur chunk BM25
+                                   # pour se passer de la recherche dense
+}
+
+# Fusion des chunks quasi-identiques à l'ingestion du corpus (MinHash + LSH)
+NEAR_DUPLICATES = {
+    "enabled": True,
+    "threshold": 0.85,     # Similarité de Jaccard (trigrammes de mots) à partir de laquelle on fusionne
+    "num_perm": 128,       # Longueur des signatures MinHash
+    "bands": 16,           # Bandes LSH (candidats dès ~0.7 de similarité avec 8 lignes par bande)
+    "shingle_size": 3      # Taille des n-grammes de mots
+}
+
+# Index FAISS du vector store
+# type: "flat" (exact), "ivf_flat", "ivf_pq" ou "hnsw" (approchés, pour les gros corpus)
+#       "sq_fp16", "sq8" ou "pq" (compressés: 2x, 4x ou 1536/pq_m x moins de mémoire que flat)
+# pca_dim: projection PCA apprise sur le corpus (64, 128 ou 192; 0 = pleine dimension),
+#          vecteurs et calcul par requête réduits d'autant, au prix d'un peu de rappel
+#          et de similarité: refusée si un vecteur projeté ne se retrouve plus au-dessus de
+#          SIMILARITY_THRESHOLD (python benchmark_vectorstore.py pca)
+# Changer le type d'un index existant: VectorStoreManager.rebuild_index()
+VECTORSTORE_INDEX = {
+    "type": "flat",
+    "nlist": 256,            # IVF: nombre de listes (entraîné dès 39 * nlist vecteurs)
+    "nprobe": 16,            # IVF: listes visitées par requête
+    "pq_m": 48,              # PQ: sous-vecteurs par embedding (doit diviser la dimension)
+    "hnsw_m": 32,            # HNSW: voisins par nœud
+    "ef_construction": 80,   # HNSW: largeur de recherche à la construction
+    "ef_search": 64,         # HNSW: largeur de recherche par requête
+    "exact_below": 4096,     # Recherche filtrée exacte sous ce nombre de candidats
+    "pca_dim": 0             # Dimension après projection PCA (apprise dès 4096 vecteurs)
+}
+
+# Instantanés de l'index: nombre de générations conservées sur le disque
+SNAPSHOT_RETENTION = 3
+
+# Mapper l'index en mémoire au chargement (pages partagées entre processus)
+VECTORSTORE_MMAP = True
+
+# Sauvegarde différée des fiches validées: acquittées dès leur écriture dans la base
+# des chunks, fusionnées dans l'index et sauvegardées en arrière-plan après
+# max_pending fiches ou interval_s secondes (rejouées depuis la base après un arrêt brutal)
+SNAPSHOT_WRITE_BEHIND = {
+    "max_pending": 256,
+    "interval_s": 30.0,
+}
+
+# Plusieurs processus sur le même VECTORSTORE_DIR (serveurs Streamlit d'une machine):
+# attente maximale (secondes) du verrou des écrivains avant d'abandonner une écriture.
+# Les lecteurs ne prennent aucun verrou et rechargent l'index publié par un autre processus
+VECTORSTORE_LOCK_TIMEOUT = 60.0
+
+# Artefacts prébuilt (python vectorstore_cli.py build): versions publiées et chargées
+# en lecture seule par les serveurs, qui n'ingèrent alors jamais le corpus
+VECTORSTORE_RELEASES_DIR = VECTORSTORE_DIR / "releases"
+VECTORSTORE_PREBUILT = os.getenv("VECTORSTORE_PREBUILT", "0") == "1"
+RELEASE_RETENTION = 3
+
+# Vector store servi par un processus local (python vectorstore_cli.py serve): adresse
+# "hôte:port", chemin de socket Unix ou tube nommé; vide = vector store dans le processus
+VECTORSTORE_SERVICE = os.getenv("VECTORSTORE_SERVICE", "")
+VECTORSTORE_SERVICE_DEFAULT = str(VECTORSTORE_DIR / "service.sock") if os.name == "posix" else r"\\.\pipe\vectorstore"
+# Clé d'authentification du service; vide = clé aléatoire propre à l'installation, créée
+# par le serveur dans VECTORSTORE_SERVICE_KEY_FILE (lisible par son seul propriétaire)
+VECTORSTORE_SERVICE_AUTHKEY = os.getenv("VECTORSTORE_SERVICE_AUTHKEY", "").encode()
+VECTORSTORE_SERVICE_KEY_FILE = VECTORSTORE_DIR / "service.key"
+
+# Micro-lots du service: attente maximale d'autres requêtes (ms) et taille maximale d'un lot
+VECTORSTORE_BATCH_WINDOW_MS = 5
+VECTORSTORE_BATCH_MAX = 64
+
 # Seuils de validation par cycle
 VALIDATION_THRESHOLDS = {
     "Primaire": 90,
@@ -139,6 +139,66 @@ def test_vectorstore():
     return True
 
 
+def test_vectorstore_service():
+    """Test du service du vector store: une requête invalide n'échoue que pour son client"""
+    print("\n" + "="*60)
+    print("TEST: Service du VectorStore (micro-lots)")
+    print("="*60)
+    
+    import os
+    import tempfile
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from utils.vectorstore import VectorStoreManager
+    from utils.vectorstore_service import VectorStoreServer, VectorStoreClient
+    
+    workdir = tempfile.mkdtemp()
+    address = os.path.join(workdir, "service.sock") if os.name == "posix" else r"\\.\pipe\vectorstore-test"
+    vs = VectorStoreManager(directory=Path(workdir))
+    vs.add_documents(["Les boucles for et while en Python"], [{'matiere': 'Informatique'}])
+    # Fenêtre large: les requêtes simultanées partagent un micro-lot
+    server = VectorStoreServer(vs, address, window_ms=300)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = VectorStoreClient(address)
+    
+    def call(method, *args, **kwargs):
+        try:
+            return getattr(client, method)(*args, **kwargs)
+        except Exception as e:
+            return e
+    
+    try:
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            searches = [
+                pool.submit(call, "search_similar", "boucles", top_k=-1),
+                # Valide pour le service, mais échoue dans la recherche (filtre non scalaire)
+                pool.submit(call, "search_similar", "boucles", filters={'chapitre': ['a', 'b']}),
+                pool.submit(call, "search_similar", "boucles", similarity_threshold=-1.0),
+                pool.submit(call, "search_similar", "boucles Python", similarity_threshold=-1.0),
+            ]
+            bad_top_k, bad_filter, good, other = [future.result() for future in searches]
+        assert isinstance(bad_top_k, ValueError), bad_top_k
+        assert isinstance(bad_filter, Exception), bad_filter
+        assert good and other, (good, other)
+        print("✓ Recherches valides servies malgré deux requêtes invalides du même lot")
+        
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            fiches = [
+                pool.submit(call, "add_validated_fiche", "fiche-bad", "Fiche invalide", "pas un dict"),
+                pool.submit(call, "add_validated_fiche", "fiche-ok", "Fiche sur les listes", {'matiere': 'Informatique'}),
+            ]
+            bad_fiche, good_fiche = [future.result() for future in fiches]
+        assert isinstance(bad_fiche, TypeError), bad_fiche
+        assert good_fiche is None, good_fiche
+        print("✓ Fiche valide ajoutée malgré une fiche invalide du même lot")
+    finally:
+        client.close()
+        server.close()
+    
+    print("\n✅ Service du VectorStore OK")
+    return True
+
+
 if __name__ == "__main__":
     print("\n" + "🧪 SUITE DE TESTS DU SYSTÈME MULTI-AGENTS")
     print("="*60)
@@ -146,6 +206,7 @@ if __name__ == "__main__":
     tests = [
         ("Agent Context", test_context_agent),
         ("VectorStore", test_vectorstore),
+        ("Service du VectorStore", test_vectorstore_service),
         ("Génération Complète", test_generation_complete),
     ]
     
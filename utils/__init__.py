@@ -1,3 +1,15 @@
-from .vectorstore import VectorStoreManager
+from .vectorstore import (
+    VectorStoreManager,
+    get_vectorstore,
+    warmup_vectorstore,
+    reload_vectorstore,
+    shutdown_vectorstore,
+)
 
-__all__ = ["VectorStoreManager"]
\ No newline at end of file
+__all__ = [
+    "VectorStoreManager",
+    "get_vectorstore",
+    "warmup_vectorstore",
+    "reload_vectorstore",
+    "shutdown_vectorstore",
+]
@@ -0,0 +1,284 @@
+"""
+Compaction hors ligne du vector store (sans modèle d'embedding)
+
+Réécrit l'index FAISS avec un seul vecteur par ID et par contenu, retire du
+cache d'embeddings les vecteurs que l'index restitue déjà et compacte la base
+SQLite. Le vector store ne doit pas être utilisé par un autre processus.
+"""
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import faiss
+
+from config import VECTORSTORE_DIR, VECTORSTORE_INDEX, EMBEDDING_MODEL, EMBEDDING_CACHE_DTYPE, SNAPSHOT_RETENTION
+from utils import index_factory
+from utils.embedding_cache import VECTOR_SUFFIXES, EmbeddingCache, cache_path, text_hash
+from utils.ingestion import CorpusManifest
+from utils.metadata_store import MetadataStore
+from utils.snapshots import SnapshotStore
+
+
+def migrate_metadata_json(
+    metadata_file: Path,
+    store: MetadataStore,
+    index: faiss.Index
+) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Importe l'ancien metadata.json dans SQLite (sans supprimer le fichier)
+
+    Un ancien index positionnel (ligne i = i-ème document) est converti en
+    étiquettes 0..n-1, en ne gardant que la dernière occurrence de chaque ID
+    de document.
+
+    Returns:
+        Optional[Tuple[np.ndarray, np.ndarray]]: Étiquettes et vecteurs avec
+        lesquels reconstruire l'index (index positionnel), sinon None
+    """
+    with open(metadata_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    if store.count():
+        print("⚠️ metadata.json ignoré: la base SQLite contient déjà des chunks")
+        return None
+
+    if 'labels' in data:
+        store.insert_many(data['labels'], data['document_ids'], data['documents'], data['metadatas'])
+        store.set_meta('next_label', data.get('next_label', max(data['labels'], default=-1) + 1))
+        print(f"📦 Métadonnées JSON migrées vers SQLite: {len(data['labels'])} documents")
+        return None
+
+    document_ids = data.get('document_ids', [])
+    last_row = {doc_id: row for row, doc_id in enumerate(document_ids)}
+    rows = sorted(last_row.values())
+
+    vectors = index.reconstruct_n(0, index.ntotal)[rows] if rows else np.empty((0, index.d), dtype='float32')
+    store.insert_many(
+        list(range(len(rows))),
+        [document_ids[row] for row in rows],
+        [data['documents'][row] for row in rows],
+        [data['metadatas'][row] for row in rows]
+    )
+    store.set_meta('next_label', len(rows))
+    print(f"🔁 Index positionnel migré vers des IDs stables: "
+          f"{len(document_ids)} → {len(rows)} documents (doublons retirés)")
+    return np.arange(len(rows), dtype='int64'), vectors
+
+
+def _disk_sizes(directory: Path) -> Dict[str, int]:
+    """Taille sur disque (octets) de l'index, de la base, du cache et du total"""
+    def size(paths) -> int:
+        return sum(path.stat().st_size for path in paths if path.is_file())
+
+    everything = list(directory.rglob("*"))
+    return {
+        'index': size(p for p in everything if p.suffix == ".bin"),
+        'metadata': size(p for p in everything if p.name.startswith("metadata.")),
+        'cache': size(p for p in everything if p.name.startswith("embeddings_cache")),
+        'total': size(everything)
+    }
+
+
+def _remove_other_caches(directory: Path, current: Path):
+    """Supprime les caches d'embeddings des autres modèles (ou dimensions)"""
+    suffixes = (*VECTOR_SUFFIXES.values(), ".idx", ".lock")
+    for path in directory.glob("embeddings_cache-*"):
+        if path.suffix in suffixes and path.with_suffix("") != current:
+            path.unlink()
+            print(f"🗑️ Cache d'un autre modèle supprimé: {path.name}")
+
+
+def _plan_duplicates(store: MetadataStore, tracked_ids: set) -> Tuple[List[int], Dict[int, List[int]], Dict[int, int]]:
+    """
+    Chunks de même contenu
+
+    Parmi les chunks de même contenu et mêmes métadonnées (ex. anciens IDs
+    f"{matiere}_{niveau}_{i}" ajoutés à chaque load_corpus), un seul est gardé:
+    de préférence celui qui a un vecteur, suivi par le manifeste, le plus
+    récent. Les chunks de même contenu mais de métadonnées différentes
+    partagent un seul vecteur (quasi-doublons exacts).
+
+    Returns:
+        Tuple: (étiquettes à supprimer, groupes à fusionner {représentant: [représentant, autres...]},
+        nouveau représentant des quasi-doublons de chaque chunk supprimé ou fusionné)
+    """
+    with_vector = set(store.vector_labels().tolist())
+    by_content: Dict[str, List[Tuple[int, str, str]]] = {}
+    for label, doc_id, content, metadata in store.iter_chunks():
+        metadata.pop('doublons', None)
+        by_content.setdefault(text_hash(content), []).append(
+            (label, doc_id, json.dumps(metadata, sort_keys=True, ensure_ascii=False))
+        )
+
+    deleted, groups, targets = [], {}, {}
+    for rows in by_content.values():
+        if len(rows) < 2:
+            continue
+        by_metadata: Dict[str, List[Tuple[int, str]]] = {}
+        for label, doc_id, metadata in rows:
+            by_metadata.setdefault(metadata, []).append((label, doc_id))
+
+        survivors = []
+        for same in by_metadata.values():
+            keep = max(same, key=lambda row: (row[0] in with_vector, row[1] in tracked_ids, row[0]))[0]
+            survivors.append(keep)
+            for label, _ in same:
+                if label != keep:
+                    deleted.append(label)
+                    targets[label] = keep
+
+        vectored = sorted(label for label in survivors if label in with_vector)
+        if len(vectored) > 1:
+            groups[vectored[0]] = vectored
+            for label in vectored[1:]:
+                targets[label] = vectored[0]
+
+    # Un chunk gardé mais fusionné: ses anciens quasi-doublons vont au représentant final
+    for label, target in targets.items():
+        while target in targets:
+            target = targets[target]
+        targets[label] = target
+    return deleted, groups, targets
+
+
+def compact_vectorstore(directory: Path = VECTORSTORE_DIR, index_config: Optional[Dict] = None) -> Dict:
+    """
+    Compacte le vector store stocké dans `directory`, sans charger le modèle
+
+      - importe un ancien metadata.json / faiss_index.bin
+      - supprime les chunks répétés (même contenu et mêmes métadonnées) et
+        fait partager un vecteur aux chunks de même contenu
+      - reconstruit l'index avec un vecteur par chunk restant (vecteurs exacts
+        du cache, sinon ceux de l'ancien index) et le publie comme unique
+        génération
+      - retire du cache les embeddings des chunks (si l'index reconstruit les
+        restitue exactement) et les caches des autres modèles d'embedding
+      - compacte la base SQLite
+
+    Args:
+        directory: Dossier du vector store
+        index_config: Surcharge de VECTORSTORE_INDEX
+
+    Returns:
+        Dict: Tailles avant/après ('before', 'after') et compteurs de la compaction
+    """
+    index_config = {**VECTORSTORE_INDEX, **(index_config or {})}
+    before = _disk_sizes(directory)
+    store = MetadataStore(directory / "metadata.sqlite3")
+    snapshots = SnapshotStore(directory / "snapshots", SNAPSHOT_RETENTION)
+    index_file = directory / "faiss_index.bin"
+    metadata_file = directory / "metadata.json"
+
+    try:
+        loaded = snapshots.load(mmap=False)
+        if loaded is not None:
+            index = loaded[0]
+        elif index_file.exists():
+            index = faiss.read_index(str(index_file))
+        else:
+            index = faiss.IndexIDMap2(faiss.IndexFlatL2(384))
+        dimension = index.d
+
+        # Ancien format: métadonnées JSON (index positionnel converti en étiquettes)
+        vectors_by_label: Dict[int, np.ndarray] = {}
+        if metadata_file.exists():
+            migrated = migrate_metadata_json(metadata_file, store, index)
+            if migrated is not None:
+                vectors_by_label = dict(zip(migrated[0].tolist(), migrated[1]))
+        if not vectors_by_label:
+            labels = index_factory.stored_labels(index)
+            vectors_by_label = dict(zip(labels.tolist(), index_factory.reconstruct(index, labels)))
+
+        counts = {'chunks_before': store.count(), 'vectors_before': index.ntotal}
+
+        # Chunks répétés supprimés, chunks de même contenu fusionnés
+        manifest = CorpusManifest(directory / "corpus_manifest.json")
+        tracked_ids = {cid for key in manifest.entries for cid in manifest.chunk_ids(key)}
+        deleted, groups, targets = _plan_duplicates(store, tracked_ids)
+        store.reassign(targets)
+        store.delete_labels(deleted)
+        store.promote(groups)
+
+        # Index reconstruit: vecteurs exacts du cache, sinon ceux de l'ancien index
+        cache = EmbeddingCache(
+            cache_path(directory, EMBEDDING_MODEL, dimension), dimension, dtype=EMBEDDING_CACHE_DTYPE
+        )
+        chunk_hashes, labels, vectors, missing = set(), [], [], 0
+        with_vector = set(store.vector_labels().tolist())
+        for label, _, content, _ in store.iter_chunks():
+            content_hash = text_hash(content)
+            chunk_hashes.add(content_hash)
+            if label not in with_vector:
+                continue
+            vector = cache.get(content_hash)
+            if vector is None:
+                vector = vectors_by_label.get(label)
+            if vector is None:
+                # Ré-encodé par le vector store au prochain chargement (_reconcile)
+                missing += 1
+                continue
+            labels.append(label)
+            vectors.append(np.asarray(vector, dtype='float32'))
+        vectors = np.stack(vectors) if vectors else np.empty((0, dimension), dtype='float32')
+        labels = np.array(labels, dtype='int64')
+
+        compacted = index_factory.build_index(dimension, index_config, vectors)
+        if len(labels):
+            compacted.add_with_ids(vectors, labels)
+        next_label = max(store.get_meta('next_label', 0), store.max_label() + 1)
+        snapshots.publish(compacted, {
+            'index_type': index_factory.index_kind(compacted),
+            'next_label': next_label
+        })
+        snapshots.prune(keep=1)
+        store.set_meta('next_label', next_label)
+
+        # Cache: les embeddings des chunks sont lus dans l'index, seuls restent ceux
+        # des requêtes (et des chunks d'un index compressé, qui ne les restitue pas exactement)
+        cache_before = len(cache)
+        if index_factory.stores_exact_vectors(compacted):
+            cache.discard(chunk_hashes)
+        cache.compact()
+        cache_after = len(cache)
+        cache.close()
+        _remove_other_caches(directory, cache.vectors_file.with_suffix(""))
+
+        for legacy in (index_file, metadata_file):
+            if legacy.exists():
+                legacy.unlink()
+        store.vacuum()
+    finally:
+        store.close()
+
+    counts.update({
+        'chunks_after': counts['chunks_before'] - len(deleted),
+        'vectors_after': int(compacted.ntotal),
+        'chunks_removed': len(deleted),
+        'chunks_merged': sum(len(members) - 1 for members in groups.values()),
+        'vectors_missing': missing,
+        'cache_before': cache_before,
+        'cache_after': cache_after
+    })
+    return {'before': before, 'after': _disk_sizes(directory), **counts}
+
+
+def print_report(report: Dict):
+    """Affiche le rapport de compaction (tailles avant/après)"""
+    print("\n" + "=" * 60)
+    print("Compaction du vector store")
+    print("=" * 60)
+    rows = [
+        ("Chunks", f"{report['chunks_before']} → {report['chunks_after']}"
+                   f" ({report['chunks_removed']} répétés supprimés)"),
+        ("Vecteurs dans l'index", f"{report['vectors_before']} → {report['vectors_after']}"
+                                  f" ({report['chunks_merged']} chunks de même contenu fusionnés)"),
+        ("Embeddings en cache", f"{report['cache_before']} → {report['cache_after']}"),
+    ]
+    for name, label in (('index', "Index (Mo)"), ('metadata', "Base SQLite (Mo)"),
+                        ('cache', "Cache des embeddings (Mo)"), ('total', "Total sur disque (Mo)")):
+        rows.append((label, f"{report['before'][name] / 1e6:.2f} → {report['after'][name] / 1e6:.2f}"))
+    if report['vectors_missing']:
+        rows.append(("Vecteurs introuvables", f"{report['vectors_missing']} (ré-encodés au prochain chargement)"))
+    width = max(len(name) for name, _ in rows)
+    for name, value in rows:
+        print(f"  {name:<{width}} {value}")
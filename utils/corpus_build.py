@@ -0,0 +1,196 @@
+"""
+Build hors ligne du vector store: ingestion de toutes les matières et de tous
+les cycles du corpus, publiée comme artefact versionné (voir utils.releases)
+
+Chaque matière est ingérée dans son propre vector store de travail
+(releases/.staging/<matière>, incrémental d'un build à l'autre), par un
+processus dédié. Les vector stores de travail sont ensuite fusionnés en une
+version: index, base SQLite figée, manifeste du corpus et build.json.
+"""
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+
+from config import (
+    CORPUS_DIR, EMBEDDING_MODEL, EMBEDDING_BACKEND, SUPPORTED_SUBJECTS, EDUCATION_LEVELS,
+    VECTORSTORE_INDEX, VECTORSTORE_RELEASES_DIR, RELEASE_RETENTION, SIMILARITY_THRESHOLD
+)
+from utils import index_factory
+from utils.ingestion import CorpusManifest
+from utils.metadata_store import MetadataStore
+from utils.releases import ReleaseStore
+from utils.snapshots import SnapshotStore
+
+# Chunks copiés par transaction lors de la fusion
+_MERGE_BATCH = 1024
+
+
+def _build_subject(subject: str, cycles: List[str], corpus_dir: Path, staging: Path, log_file: Path) -> Dict[str, int]:
+    """
+    Ingère tous les cycles d'une matière dans son vector store de travail
+    (processus dédié, journal dans `log_file`)
+
+    Returns:
+        Dict[str, int]: Nombre de chunks par cycle
+    """
+    from utils.vectorstore import VectorStoreManager
+
+    staging.mkdir(parents=True, exist_ok=True)
+    with open(log_file, 'w', encoding='utf-8') as log, redirect_stdout(log):
+        # Index exact et non projeté: les vecteurs sont relus tels quels à la fusion
+        vs = VectorStoreManager(
+            directory=staging, corpus_dir=corpus_dir, parse_workers=1, index_config={'type': 'flat', 'pca_dim': 0}
+        )
+        try:
+            return {cycle: vs.load_corpus(subject, cycle) for cycle in cycles}
+        finally:
+            vs.close()
+
+
+def _merge(stagings: Dict[str, Path], target: Path, index_config: Dict) -> Dict[str, int]:
+    """
+    Fusionne les vector stores de travail dans `target`
+
+    Les étiquettes de chaque matière sont décalées pour rester uniques; les
+    quasi-doublons gardent leur représentant. Les signatures MinHash ne sont
+    pas copiées: un artefact n'est jamais modifié.
+
+    Returns:
+        Dict[str, int]: Nombre de chunks et de vecteurs de la version
+    """
+    target.mkdir(parents=True)
+    store = MetadataStore(target / "metadata.sqlite3")
+    manifest = CorpusManifest(target / "corpus_manifest.json")
+    all_labels, all_vectors = [], []
+    offset = 0
+    dimension = None
+    try:
+        for subject, staging in stagings.items():
+            source = MetadataStore(staging / "metadata.sqlite3")
+            try:
+                canonicals = source.canonicals()
+                batch = []
+                for label, doc_id, content, metadata in source.iter_chunks():
+                    canonical = canonicals.get(label)
+                    batch.append((label + offset, doc_id, content, metadata,
+                                  None if canonical is None else canonical + offset))
+                    if len(batch) >= _MERGE_BATCH:
+                        store.insert_many(*map(list, zip(*batch)))
+                        batch = []
+                if batch:
+                    store.insert_many(*map(list, zip(*batch)))
+
+                loaded = SnapshotStore(staging / "snapshots").load(mmap=False)
+                if loaded is not None:
+                    index = loaded[0]
+                    dimension = index.d
+                    labels = source.vector_labels()
+                    all_labels.append(labels + offset)
+                    all_vectors.append(index_factory.reconstruct(index, labels))
+                offset += source.max_label() + 1
+            finally:
+                source.close()
+            manifest.entries.update(CorpusManifest(staging / "corpus_manifest.json").entries)
+
+        dimension = dimension or 384
+        labels = np.concatenate(all_labels) if all_labels else np.empty(0, dtype='int64')
+        vectors = np.concatenate(all_vectors) if all_vectors else np.empty((0, dimension), dtype='float32')
+        index = index_factory.build_index(dimension, index_config, vectors, SIMILARITY_THRESHOLD)
+        if len(labels):
+            index.add_with_ids(vectors, labels)
+        SnapshotStore(target / "snapshots", retention=1).publish(index, {
+            'index_type': index_factory.index_kind(index),
+            'next_label': offset
+        })
+        store.set_meta('next_label', offset)
+        manifest.save()
+        chunks = store.count()
+        store.freeze()
+    finally:
+        store.close()
+    return {'chunks': chunks, 'vectors': int(index.ntotal), 'index_type': index_factory.index_kind(index)}
+
+
+def build_corpus(
+    subjects: Optional[List[str]] = None,
+    cycles: Optional[List[str]] = None,
+    workers: Optional[int] = None,
+    corpus_dir: Path = CORPUS_DIR,
+    releases_dir: Path = VECTORSTORE_RELEASES_DIR,
+    index_config: Optional[Dict] = None
+) -> Dict:
+    """
+    Construit et publie une nouvelle version du vector store
+
+    Args:
+        subjects: Matières à (ré)ingérer (défaut: SUPPORTED_SUBJECTS); les autres
+            matières déjà construites sont reprises telles quelles
+        cycles: Cycles à ingérer pour chaque matière (défaut: EDUCATION_LEVELS)
+        workers: Matières ingérées en parallèle (défaut: une par matière)
+        corpus_dir: Dossier du corpus
+        releases_dir: Dossier des versions
+        index_config: Surcharge de VECTORSTORE_INDEX pour l'index publié
+
+    Returns:
+        Dict: Informations de build (build.json) de la version publiée
+    """
+    subjects = list(subjects or SUPPORTED_SUBJECTS)
+    cycles = list(cycles or EDUCATION_LEVELS)
+    unknown = [subject for subject in subjects if subject not in SUPPORTED_SUBJECTS]
+    if unknown:
+        raise ValueError(f"Matière(s) non supportée(s): {', '.join(unknown)}")
+    index_config = {**VECTORSTORE_INDEX, **(index_config or {})}
+    releases = ReleaseStore(releases_dir, RELEASE_RETENTION)
+    start = time.perf_counter()
+
+    # Ingestion en parallèle, un processus par matière
+    stagings = {subject: releases.staging(subject) for subject in subjects}
+    logs = {subject: releases.directory / ".staging" / f"{subject}.log" for subject in subjects}
+    for staging in stagings.values():
+        staging.mkdir(parents=True, exist_ok=True)
+    print(f"🏗️  Build du vector store: {len(subjects)} matière(s) × {len(cycles)} cycle(s)")
+    chunks: Dict[str, Dict[str, int]] = {}
+    with ProcessPoolExecutor(max_workers=max(1, min(workers or len(subjects), len(subjects)))) as pool:
+        futures = {
+            subject: pool.submit(_build_subject, subject, cycles, corpus_dir, stagings[subject], logs[subject])
+            for subject in subjects
+        }
+        for subject, future in futures.items():
+            try:
+                chunks[subject] = future.result()
+            except Exception as e:
+                raise RuntimeError(f"Build de {subject} échoué ({e}), voir {logs[subject]}") from e
+            print(f"   ✅ {subject}: " + ", ".join(f"{cycle} {count}" for cycle, count in chunks[subject].items()))
+
+    # Fusion dans un dossier temporaire, publié par renommage
+    stagings = {
+        subject: releases.staging(subject) for subject in SUPPORTED_SUBJECTS
+        if (releases.staging(subject) / "metadata.sqlite3").exists()
+    }
+    version = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    build_dir = releases.directory / f".{version}.tmp"
+    try:
+        counts = _merge(stagings, build_dir, index_config)
+        info = {
+            'version': version,
+            'created': datetime.now().isoformat(),
+            'embedding_model': EMBEDDING_MODEL,
+            'embedding_backend': EMBEDDING_BACKEND,
+            'index': index_config,
+            # Chunks par matière et par cycle
+            'subjects': chunks,
+            **counts,
+            'duration_s': round(time.perf_counter() - start, 1)
+        }
+        path = releases.publish(build_dir, info)
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+    print(f"📦 Version {version} publiée: {counts['chunks']} chunks, {counts['vectors']} vecteurs "
+          f"({counts['index_type']}) en {info['duration_s']} s → {path}")
+    return info
@@ -0,0 +1,170 @@
+"""
+Backends d'embedding interchangeables: PyTorch (référence), PyTorch int8, ONNX et ONNX int8
+
+Tous les backends exposent l'interface encode() de SentenceTransformer.
+sentence-transformers n'est importé qu'au chargement d'un modèle: les outils
+hors ligne (compaction...) n'en dépendent pas.
+"""
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Protocol, Union
+import numpy as np
+
+
+EMBEDDING_BACKENDS = ("torch", "torch_int8", "onnx", "onnx_int8")
+
+# Phrases de validation d'un backend optimisé contre la référence PyTorch
+VALIDATION_SENTENCES = [
+    "Les fonctions affines sont de la forme f(x) = ax + b",
+    "Objectifs pédagogiques Les fonctions affines niveau 3ème",
+    "Résoudre une équation du second degré à l'aide du discriminant",
+    "Python est un langage de programmation interprété",
+    "Écrire un algorithme utilisant une boucle et une variable",
+    "Compétences: savoir représenter une série statistique",
+    "Les élèves doivent être capables de calculer une probabilité",
+    "Fiche de cours: les vecteurs du plan, Secondaire, 2nde",
+]
+
+
+class EmbeddingModel(Protocol):
+    """Interface commune des backends (sous-ensemble de SentenceTransformer)"""
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        show_progress_bar: Optional[bool] = None,
+        convert_to_numpy: bool = True,
+        **kwargs
+    ) -> np.ndarray:
+        ...
+
+
+def _export_dir(models_dir: Path, model_name: str) -> Path:
+    """Dossier local d'un modèle exporté"""
+    return models_dir / model_name.replace("/", "__")
+
+
+def _load_torch_int8(model_name: str) -> EmbeddingModel:
+    """Modèle PyTorch avec couches linéaires quantifiées dynamiquement en int8"""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _load_onnx_int8(model_name: str, models_dir: Path) -> EmbeddingModel:
+    """Graphe ONNX quantifié dynamiquement en int8 (exporté une seule fois)"""
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    export_dir = _export_dir(models_dir, model_name)
+    quantized_file = Path("onnx") / "model_qint8_avx2.onnx"
+    if not (export_dir / quantized_file).exists():
+        print(f"📦 Export ONNX int8 de {model_name} vers {export_dir}")
+        model = SentenceTransformer(model_name, backend="onnx")
+        model.save(str(export_dir))
+        export_dynamic_quantized_onnx_model(model, "avx2", str(export_dir))
+    return SentenceTransformer(
+        str(export_dir), backend="onnx", model_kwargs={"file_name": quantized_file.as_posix()}
+    )
+
+
+def load_embedding_model(backend: str, model_name: str, models_dir: Path) -> EmbeddingModel:
+    """
+    Charge le modèle d'embedding avec le backend demandé
+
+    Args:
+        backend: "torch", "torch_int8", "onnx" ou "onnx_int8"
+        model_name: Nom du modèle sentence-transformers
+        models_dir: Dossier des modèles exportés (ONNX)
+
+    Returns:
+        EmbeddingModel: Modèle exposant encode()
+    """
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        return SentenceTransformer(model_name)
+    if backend == "torch_int8":
+        return _load_torch_int8(model_name)
+    if backend == "onnx":
+        # Export ONNX à la volée si le dépôt du modèle n'en fournit pas (requiert optimum[onnxruntime])
+        return SentenceTransformer(model_name, backend="onnx")
+    if backend == "onnx_int8":
+        return _load_onnx_int8(model_name, models_dir)
+    raise ValueError(f"Backend d'embedding inconnu: {backend} (attendu: {', '.join(EMBEDDING_BACKENDS)})")
+
+
+def cosine_agreement(model: EmbeddingModel, reference: EmbeddingModel, sentences: List[str]) -> np.ndarray:
+    """Similarité cosinus, phrase par phrase, entre les embeddings d'un backend et ceux de la référence"""
+    candidate = np.asarray(model.encode(sentences, convert_to_numpy=True, show_progress_bar=False), dtype='float32')
+    expected = np.asarray(reference.encode(sentences, convert_to_numpy=True, show_progress_bar=False), dtype='float32')
+    candidate /= np.linalg.norm(candidate, axis=1, keepdims=True)
+    expected /= np.linalg.norm(expected, axis=1, keepdims=True)
+    return (candidate * expected).sum(axis=1)
+
+
+def create_embedding_model(
+    backend: str,
+    model_name: str,
+    models_dir: Path,
+    min_cosine: float
+) -> EmbeddingModel:
+    """
+    Charge le backend demandé, validé contre la référence PyTorch
+
+    Un backend optimisé n'est retenu que si ses embeddings restent à une
+    similarité cosinus d'au moins `min_cosine` de ceux de la référence. La
+    validation n'est faite qu'une fois par (backend, modèle): son résultat est
+    gardé dans <models_dir>/validation.json. En cas d'échec (ou de dépendance
+    manquante), le backend PyTorch est utilisé.
+
+    Args:
+        backend: Backend souhaité
+        model_name: Nom du modèle sentence-transformers
+        models_dir: Dossier des modèles exportés et des validations
+        min_cosine: Similarité cosinus minimale avec la référence
+
+    Returns:
+        EmbeddingModel: Modèle exposant encode()
+    """
+    if backend == "torch":
+        return load_embedding_model("torch", model_name, models_dir)
+
+    models_dir.mkdir(parents=True, exist_ok=True)
+    validation_file = models_dir / "validation.json"
+    validations: Dict[str, Dict] = {}
+    if validation_file.exists():
+        with open(validation_file, 'r', encoding='utf-8') as f:
+            validations = json.load(f)
+    key = f"{backend}|{model_name}"
+
+    try:
+        model = load_embedding_model(backend, model_name, models_dir)
+    except ImportError as e:
+        print(f"⚠️ Backend d'embedding '{backend}' indisponible ({e}), utilisation de PyTorch")
+        return load_embedding_model("torch", model_name, models_dir)
+
+    validation = validations.get(key)
+    if validation is None or validation['min_cosine_required'] != min_cosine:
+        reference = load_embedding_model("torch", model_name, models_dir)
+        agreement = cosine_agreement(model, reference, VALIDATION_SENTENCES)
+        validation = {
+            'min_cosine': float(agreement.min()),
+            'mean_cosine': float(agreement.mean()),
+            'min_cosine_required': min_cosine,
+            'valid': bool(agreement.min() >= min_cosine)
+        }
+        validations[key] = validation
+        with open(validation_file, 'w', encoding='utf-8') as f:
+            json.dump(validations, f, ensure_ascii=False, indent=2)
+        del reference
+
+    if not validation['valid']:
+        print(f"⚠️ Backend '{backend}' rejeté: cosinus min {validation['min_cosine']:.4f} "
+              f"< {min_cosine} avec la référence, utilisation de PyTorch")
+        return load_embedding_model("torch", model_name, models_dir)
+
+    print(f"⚡ Backend d'embedding '{backend}' (cosinus min {validation['min_cosine']:.4f} avec la référence)")
+    return model
@@ -0,0 +1,460 @@
+"""
+Cache binaire des embeddings: matrice float32 (ou float16) mappée en mémoire + index hash → ligne
+"""
+import os
+import re
+import json
+import heapq
+import hashlib
+import itertools
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+
+from utils.file_lock import FileLock, file_signature
+
+# Extension du fichier de vecteurs selon le type de stockage
+VECTOR_SUFFIXES = {"float32": ".f32", "float16": ".f16"}
+
+# Politiques d'éviction d'un cache borné
+EVICTION_POLICIES = ("lru", "lfu")
+
+
+def text_hash(text: str) -> str:
+    """Clé de cache d'un texte: hash MD5 hexadécimal"""
+    return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+
+def cache_path(directory: Path, model_name: str, dimension: int) -> Path:
+    """
+    Chemin (sans extension) du cache des embeddings d'un modèle
+
+    Un cache par modèle et par dimension: changer de modèle ne sert jamais
+    les vecteurs de l'ancien. Le cache d'avant les espaces de noms
+    (embeddings_cache.*), écrit par le modèle configuré, lui est attribué
+    une seule fois.
+
+    Args:
+        directory: Dossier du vector store
+        model_name: Nom du modèle d'embedding
+        dimension: Dimension des embeddings
+
+    Returns:
+        Path: <directory>/embeddings_cache-<modèle>-<dimension>
+    """
+    namespace = re.sub(r"[^A-Za-z0-9_-]+", "_", f"{model_name}-{dimension}")
+    base = directory / f"embeddings_cache-{namespace}"
+    legacy = directory / "embeddings_cache"
+    suffixes = (*VECTOR_SUFFIXES.values(), ".idx", ".json")
+    legacy_files = [legacy.with_suffix(suffix) for suffix in suffixes if legacy.with_suffix(suffix).exists()]
+    if legacy_files and not any(base.with_suffix(suffix).exists() for suffix in suffixes):
+        for legacy_file in legacy_files:
+            os.replace(legacy_file, base.with_suffix(legacy_file.suffix))
+        print(f"📦 Cache des embeddings attribué au modèle {model_name} ({dimension} dimensions)")
+    return base
+
+
+class EmbeddingCache:
+    """
+    Cache d'embeddings en ajout seul
+
+    Deux fichiers évoluent en parallèle:
+      - <nom>.f32 : matrice float32 (une ligne par embedding), mappée en mémoire
+                    (<nom>.f16 en float16: moitié moins de disque et de mémoire)
+      - <nom>.idx : digests MD5 bruts (16 octets par ligne), dans le même ordre
+
+    Les nouveaux vecteurs sont mis en attente puis ajoutés par lots en fin de
+    fichier. Une lecture retourne une vue sur la matrice mappée, sans copie.
+    Les méthodes sont sûres entre threads (les recherches lisent le cache
+    sans le verrou du vector store).
+
+    Avec `max_entries`, les vecteurs les moins récemment (lru) ou les moins
+    souvent (lfu) utilisés sont évincés au-delà de la limite. Leurs lignes
+    restent dans les fichiers jusqu'à ce qu'elles soient aussi nombreuses
+    que les lignes vivantes: les fichiers sont alors réécrits.
+
+    Plusieurs processus peuvent partager le cache: les écritures (ajouts,
+    réécritures) se font sous un verrou de fichier (<nom>.lock), et chaque
+    processus intègre les lignes ajoutées par les autres avant d'écrire et
+    quand un vecteur lui manque (_sync).
+    """
+
+    DIGEST_SIZE = 16
+
+    def __init__(
+        self,
+        base_path: Path,
+        dimension: int,
+        flush_every: int = 256,
+        dtype: str = "float32",
+        max_entries: int = 0,
+        policy: str = "lru",
+        lock_timeout: Optional[float] = None
+    ):
+        """
+        Args:
+            base_path: Chemin des fichiers du cache, sans extension
+            dimension: Dimension des embeddings
+            flush_every: Nombre de vecteurs en attente déclenchant une écriture
+            dtype: Type de stockage des vecteurs, "float32" ou "float16"
+            max_entries: Nombre maximal de vecteurs gardés (0 = illimité)
+            policy: Politique d'éviction, "lru" ou "lfu"
+            lock_timeout: Attente maximale du verrou des écritures (secondes, None = illimitée)
+        """
+        if dtype not in VECTOR_SUFFIXES:
+            raise ValueError(f"Type de cache inconnu: {dtype} (attendu: {', '.join(VECTOR_SUFFIXES)})")
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"Politique d'éviction inconnue: {policy} (attendu: {', '.join(EVICTION_POLICIES)})")
+        self.dimension = dimension
+        self.flush_every = flush_every
+        self.dtype = np.dtype(dtype)
+        self.max_entries = max(0, max_entries)
+        self.policy = policy
+        self.vectors_file = base_path.with_suffix(VECTOR_SUFFIXES[dtype])
+        self.index_file = base_path.with_suffix(".idx")
+        self.legacy_file = base_path.with_suffix(".json")
+
+        # Lignes vivantes, de la moins récemment utilisée à la plus récente
+        self._rows: "OrderedDict[bytes, int]" = OrderedDict()
+        # Lignes des fichiers (vivantes et évincées) et signature de la matrice lue
+        self._file_rows = 0
+        self._vectors_signature: Optional[Tuple[int, int, int]] = None
+        self._matrix: Optional[np.ndarray] = None
+        self._pending: Dict[bytes, np.ndarray] = {}
+        # Nombre d'utilisations de chaque vecteur (politique lfu)
+        self._uses: Dict[bytes, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(base_path.with_suffix(".lock"), lock_timeout)
+
+        with self._lock, self._file_lock:
+            self._convert_other_dtype(base_path)
+            self._open()
+            self._migrate_legacy_json()
+            # Limite abaissée depuis la dernière ouverture: les lignes les plus anciennes partent
+            self._evict()
+
+    def _convert_other_dtype(self, base_path: Path):
+        """Convertit une seule fois la matrice écrite avec l'autre type de stockage"""
+        if self.vectors_file.exists():
+            return
+        for dtype, suffix in VECTOR_SUFFIXES.items():
+            other_file = base_path.with_suffix(suffix)
+            if other_file == self.vectors_file or not other_file.exists():
+                continue
+            other = np.fromfile(other_file, dtype=dtype)
+            nb_rows = len(other) // self.dimension
+            other[:nb_rows * self.dimension].astype(self.dtype).tofile(self.vectors_file)
+            other_file.unlink()
+            print(f"📦 Cache des embeddings converti {dtype} → {self.dtype.name}: {nb_rows} vecteurs")
+            return
+
+    def _open(self):
+        """Charge l'index des digests et mappe la matrice existante"""
+        with self._file_lock:
+            self._load_rows()
+
+    def _load_rows(self):
+        row_bytes = self.dimension * self.dtype.itemsize
+        vectors_size = self.vectors_file.stat().st_size if self.vectors_file.exists() else 0
+        index_size = self.index_file.stat().st_size if self.index_file.exists() else 0
+
+        # Une écriture interrompue peut laisser un fichier plus long que l'autre
+        nb_rows = min(vectors_size // row_bytes, index_size // self.DIGEST_SIZE)
+        if vectors_size != nb_rows * row_bytes:
+            with open(self.vectors_file, 'r+b') as f:
+                f.truncate(nb_rows * row_bytes)
+        if index_size != nb_rows * self.DIGEST_SIZE:
+            with open(self.index_file, 'r+b') as f:
+                f.truncate(nb_rows * self.DIGEST_SIZE)
+
+        # Ordre des fichiers: du moins récemment utilisé au plus récent (voir _rewrite)
+        self._rows = OrderedDict()
+        if nb_rows:
+            with open(self.index_file, 'rb') as f:
+                digests = f.read()
+            for row in range(nb_rows):
+                self._rows[digests[row * self.DIGEST_SIZE:(row + 1) * self.DIGEST_SIZE]] = row
+        self._file_rows = nb_rows
+        self._vectors_signature = file_signature(self.vectors_file)
+        self._remap()
+
+    def _sync(self):
+        """
+        Intègre les lignes ajoutées par d'autres processus (un stat si rien n'a changé)
+
+        Fichiers réécrits entre-temps (autre inode de la matrice): rechargés.
+        L'inode de la matrice mappée ne peut pas être réutilisé par un autre
+        fichier tant qu'elle l'est, contrairement à celui de l'index des
+        digests. Lecture sous le verrou de fichier: jamais pendant l'ajout ou
+        la réécriture d'un autre processus.
+        """
+        if file_signature(self.vectors_file) == self._vectors_signature:
+            return
+        with self._file_lock:
+            self._sync_rows()
+
+    def _sync_rows(self):
+        vectors = file_signature(self.vectors_file)
+        row_bytes = self.dimension * self.dtype.itemsize
+        if vectors is None or not self._file_rows or vectors[0] != self._vectors_signature[0] \
+                or vectors[2] < self._file_rows * row_bytes:
+            self._load_rows()
+            return
+
+        # Vecteurs écrits avant leurs digests: une ligne n'est lue qu'une fois complète
+        index = file_signature(self.index_file)
+        nb_rows = min((index[2] if index else 0) // self.DIGEST_SIZE, vectors[2] // row_bytes)
+        self._vectors_signature = vectors
+        if nb_rows <= self._file_rows:
+            return
+        with open(self.index_file, 'rb') as f:
+            f.seek(self._file_rows * self.DIGEST_SIZE)
+            digests = f.read((nb_rows - self._file_rows) * self.DIGEST_SIZE)
+        added = len(digests) // self.DIGEST_SIZE
+        for offset in range(added):
+            self._rows[digests[offset * self.DIGEST_SIZE:(offset + 1) * self.DIGEST_SIZE]] = self._file_rows + offset
+        self._file_rows += added
+        self._remap()
+
+    def _remap(self):
+        """(Re)mappe la matrice après un ajout"""
+        if self._file_rows:
+            self._matrix = np.memmap(
+                self.vectors_file, dtype=self.dtype, mode='r', shape=(self._file_rows, self.dimension)
+            )
+        else:
+            self._matrix = None
+
+    def _migrate_legacy_json(self):
+        """Importe l'ancien embeddings_cache.json une seule fois, puis le supprime"""
+        if not self.legacy_file.exists():
+            return
+        try:
+            with open(self.legacy_file, 'r', encoding='utf-8') as f:
+                legacy = json.load(f)
+            for text_hash, vector in legacy.items():
+                if len(vector) == self.dimension:
+                    self.put(text_hash, np.asarray(vector, dtype='float32'))
+            self.flush()
+            self.legacy_file.unlink()
+            print(f"📦 Cache JSON migré vers le format binaire: {len(legacy)} embeddings")
+        except Exception as e:
+            print(f" Erreur lors de la migration du cache JSON: {e}")
+
+    def __len__(self) -> int:
+        return len(self._rows) + len(self._pending)
+
+    def __contains__(self, text_hash: str) -> bool:
+        digest = bytes.fromhex(text_hash)
+        return digest in self._pending or digest in self._rows
+
+    @property
+    def nbytes(self) -> int:
+        """Taille des vecteurs du cache (octets)"""
+        return len(self) * self.dimension * self.dtype.itemsize
+
+    def get(self, text_hash: str) -> Optional[np.ndarray]:
+        """
+        Récupère un embedding
+
+        Args:
+            text_hash: Hash MD5 (hexadécimal) du texte
+
+        Returns:
+            Optional[np.ndarray]: Vue en lecture seule sur le vecteur, ou None
+        """
+        digest = bytes.fromhex(text_hash)
+        with self._lock:
+            pending = self._pending.get(digest)
+            row = self._rows.get(digest)
+            if pending is None and row is None:
+                # Peut-être ajouté par un autre processus
+                self._sync()
+                row = self._rows.get(digest)
+            if pending is None and row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if self.policy == "lfu":
+                self._uses[digest] = self._uses.get(digest, 0) + 1
+            elif row is not None:
+                self._rows.move_to_end(digest)
+            return pending if pending is not None else self._matrix[row]
+
+    def put(self, text_hash: str, embedding: np.ndarray):
+        """Met un embedding en attente d'écriture (écrit par lots)"""
+        digest = bytes.fromhex(text_hash)
+        with self._lock:
+            if digest in self._rows or digest in self._pending:
+                return
+            self._pending[digest] = np.asarray(embedding, dtype=self.dtype).reshape(self.dimension)
+            if self.policy == "lfu":
+                self._uses[digest] = 1
+            self._evict()
+            if len(self._pending) >= self.flush_every:
+                self.flush()
+
+    def put_many(self, text_hashes: List[str], embeddings: np.ndarray):
+        """Met plusieurs embeddings en attente d'écriture"""
+        with self._lock:
+            for text_hash, embedding in zip(text_hashes, embeddings):
+                self.put(text_hash, embedding)
+
+    def flush(self):
+        """Ajoute les vecteurs en attente en fin de fichiers"""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        try:
+            with self._file_lock:
+                self._append_pending()
+        except Exception as e:
+            print(f" Erreur lors de la sauvegarde du cache: {e}")
+
+    def _append_pending(self):
+        """Ajoute les vecteurs en attente en fin de fichiers (verrou de fichier tenu)"""
+        # Lignes des autres processus d'abord: nos lignes suivent les leurs
+        self._sync()
+        digests = [digest for digest in self._pending if digest not in self._rows]
+        if digests:
+            matrix = np.stack([self._pending[d] for d in digests]).astype(self.dtype, copy=False)
+
+            # Vecteurs d'abord: au rechargement, seules les lignes ayant un digest comptent
+            with open(self.vectors_file, 'ab') as f:
+                f.write(matrix.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self.index_file, 'ab') as f:
+                f.write(b''.join(digests))
+                f.flush()
+                os.fsync(f.fileno())
+
+            start = self._file_rows
+            for offset, digest in enumerate(digests):
+                self._rows[digest] = start + offset
+            self._file_rows += len(digests)
+            self._vectors_signature = file_signature(self.vectors_file)
+        self._pending = {}
+        self._remap()
+
+    def _evict(self):
+        """Évince les vecteurs au-delà de max_entries (par paquets: la politique lfu trie tout le cache)"""
+        if not self.max_entries or len(self) <= self.max_entries:
+            return
+        count = len(self) - self.max_entries + self.max_entries // 20
+        # Vecteurs en attente: les plus récents, évincés en dernier
+        candidates = itertools.chain(self._rows, self._pending)
+        if self.policy == "lfu":
+            victims = heapq.nsmallest(count, candidates, key=lambda digest: self._uses.get(digest, 0))
+        else:
+            victims = list(itertools.islice(candidates, count))
+        self._drop(victims)
+        self.evictions += len(victims)
+
+    def _drop(self, digests: Iterable[bytes]):
+        """Oublie ces vecteurs; fichiers réécrits dès que les lignes mortes sont majoritaires"""
+        for digest in digests:
+            self._uses.pop(digest, None)
+            if self._pending.pop(digest, None) is None:
+                self._rows.pop(digest, None)
+        dead = self._file_rows - len(self._rows)
+        if dead and dead >= max(len(self._rows), self.flush_every):
+            self._rewrite()
+
+    def discard(self, text_hashes: Iterable[str]):
+        """Retire ces embeddings du cache (ex. vecteurs désormais sauvegardés dans l'index)"""
+        with self._lock:
+            self._drop([bytes.fromhex(text_hash) for text_hash in text_hashes])
+
+    def compact(self, keep: Optional[Set[str]] = None) -> int:
+        """
+        Réécrit le cache sans les lignes évincées, en ne gardant que ces hash
+        de textes s'ils sont donnés
+
+        Le cache ne doit pas être utilisé par un autre processus.
+
+        Args:
+            keep: Hash MD5 (hexadécimaux) des textes à garder (défaut: tous)
+
+        Returns:
+            int: Nombre d'embeddings retirés
+        """
+        with self._lock:
+            self._flush()
+            before = len(self._rows)
+            if keep is not None:
+                digests = {bytes.fromhex(text_hash) for text_hash in keep}
+                for digest in [digest for digest in self._rows if digest not in digests]:
+                    self._uses.pop(digest, None)
+                    del self._rows[digest]
+            if self._file_rows > len(self._rows):
+                self._rewrite()
+            return before - len(self._rows)
+
+    def _rewrite(self):
+        """
+        Réécrit les fichiers avec les seules lignes vivantes, dans l'ordre d'utilisation
+
+        L'index des digests est vidé avant le remplacement de la matrice: une
+        interruption laisse au pire un cache vide, jamais des digests décalés.
+        """
+        with self._file_lock:
+            self._rewrite_files()
+
+    def _rewrite_files(self):
+        self._flush()
+        self._sync()
+        kept = list(self._rows.items())
+        rows = np.array([row for _, row in kept], dtype='int64')
+        matrix = self._matrix[rows] if len(rows) else np.empty((0, self.dimension), dtype=self.dtype)
+        self._matrix = None
+
+        tmp_vectors = self.vectors_file.with_suffix(self.vectors_file.suffix + ".tmp")
+        tmp_index = self.index_file.with_suffix(".idx.tmp")
+        with open(tmp_vectors, 'wb') as f:
+            f.write(np.ascontiguousarray(matrix).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with open(tmp_index, 'wb') as f:
+            f.write(b''.join(digest for digest, _ in kept))
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self.index_file, 'r+b') as f:
+            f.truncate(0)
+            os.fsync(f.fileno())
+        os.replace(tmp_vectors, self.vectors_file)
+        os.replace(tmp_index, self.index_file)
+
+        self._load_rows()
+
+    def stats(self) -> Dict:
+        """Compteurs du cache: taux de succès, évictions, taille"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self),
+                'max_entries': self.max_entries,
+                'policy': self.policy,
+                'bytes': self.nbytes,
+                'disk_bytes': self._file_rows * self.dimension * self.dtype.itemsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions
+            }
+
+    def close(self):
+        """Écrit les vecteurs en attente et libère la matrice mappée"""
+        with self._lock:
+            self._flush()
+            self._rows = OrderedDict()
+            self._file_rows = 0
+            self._matrix = None
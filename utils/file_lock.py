@@ -0,0 +1,144 @@
+"""
+Coordination entre processus partageant un dossier (plusieurs serveurs Streamlit
+sur une même machine): verrou de fichier exclusif et détection des fichiers
+remplacés par un autre processus
+"""
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: verrou d'un octet par msvcrt
+    fcntl = None
+    import msvcrt
+
+
+class LockTimeout(TimeoutError):
+    """Verrou tenu par un autre processus au-delà du délai d'attente"""
+
+
+def file_signature(path: Path) -> Optional[Tuple[int, int, int]]:
+    """
+    Identité d'un fichier (inode, date de modification, taille) en un seul stat
+
+    Un fichier remplacé par os.replace change d'inode: comparer deux signatures
+    suffit à savoir qu'un autre processus l'a réécrit, sans le relire.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class FileLock:
+    """
+    Verrou exclusif entre processus sur un fichier (fcntl.flock, msvcrt sous Windows)
+
+    Réentrant dans le processus: le thread qui le tient peut le reprendre, les
+    autres threads attendent comme les autres processus. Le verrou est libéré
+    par le système si le processus meurt: pas de verrou orphelin après un arrêt
+    brutal. Le PID du détenteur est écrit dans le fichier (message d'erreur).
+    """
+
+    # Attente entre deux tentatives (secondes)
+    POLL_INTERVAL = 0.01
+
+    def __init__(self, path: Path, timeout: Optional[float] = None):
+        """
+        Args:
+            path: Fichier du verrou (créé si besoin)
+            timeout: Attente maximale par défaut (secondes, None = illimitée)
+        """
+        self.path = path
+        self.timeout = timeout
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def acquire(self, timeout: Optional[float] = -1):
+        """
+        Prend le verrou
+
+        Args:
+            timeout: Attente maximale (secondes, 0 = aucune, None = illimitée,
+                défaut: celle du verrou)
+
+        Raises:
+            LockTimeout: Verrou toujours tenu à l'échéance
+        """
+        if timeout == -1:
+            timeout = self.timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if not self._thread_lock.acquire(timeout=-1 if timeout is None else max(0.0, timeout)):
+            raise LockTimeout(f"Verrou {self.path.name} tenu par un autre thread")
+        if self._depth:
+            self._depth += 1
+            return
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            lock_file = open(self.path, 'a+b')
+            while not self._try_lock(lock_file):
+                if deadline is not None and time.monotonic() >= deadline:
+                    holder = self._holder()
+                    lock_file.close()
+                    raise LockTimeout(
+                        f"Verrou {self.path} tenu par le processus {holder} depuis plus de {timeout:g} s"
+                    )
+                time.sleep(self.POLL_INTERVAL)
+            lock_file.seek(0)
+            lock_file.truncate()
+            lock_file.write(str(os.getpid()).encode())
+            lock_file.flush()
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        self._file = lock_file
+        self._depth = 1
+
+    @staticmethod
+    def _try_lock(lock_file) -> bool:
+        """Une tentative sans attente"""
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def _holder(self) -> str:
+        """PID écrit par le détenteur du verrou (illisible sous Windows pendant qu'il le tient)"""
+        try:
+            return self.path.read_text().strip() or "?"
+        except OSError:
+            return "?"
+
+    def release(self):
+        """Rend le verrou (au système quand le thread le rend pour la dernière fois)"""
+        self._depth -= 1
+        if not self._depth:
+            lock_file, self._file = self._file, None
+            try:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            finally:
+                lock_file.close()
+        self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
@@ -0,0 +1,299 @@
+"""
+Fabrique d'index FAISS: flat (exact), IVF-Flat, IVF-PQ et HNSW (approchés),
+et index compressés sans partitionnement: float16, int8 (quantification
+scalaire) et PQ. Chacun peut être précédé d'une projection PCA apprise
+(IndexPreTransform, sérialisée avec l'index) qui réduit la dimension des
+vecteurs indexés et des requêtes.
+
+Tous les index sont adressés par des IDs int64 stables (étiquettes): IndexIDMap2
+pour flat, HNSW et les index compressés, IDs natifs + carte directe (table de
+hachage) pour IVF.
+"""
+from typing import Dict, Optional
+import numpy as np
+import faiss
+
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw", "sq_fp16", "sq8", "pq")
+
+# Index compressés à recherche exhaustive (pas de partitionnement)
+COMPRESSED_TYPES = ("sq_fp16", "sq8", "pq")
+
+# Index restituant exactement les vecteurs ajoutés (reconstruct sans perte)
+EXACT_TYPES = ("flat", "ivf_flat", "hnsw")
+
+# Nombre minimal de vecteurs d'entraînement par liste IVF (recommandation FAISS)
+MIN_POINTS_PER_CENTROID = 39
+
+# Nombre minimal de vecteurs pour apprendre la projection PCA (covariance 384 x 384)
+MIN_PCA_TRAINING_SIZE = 4096
+
+# Vecteurs d'entraînement sur lesquels la similarité d'un vecteur projeté avec lui-même est mesurée
+SELF_SIMILARITY_SAMPLE = 4096
+
+
+def _effective_nlist(config: Dict, nb_vectors: int) -> int:
+    """Nombre de listes IVF, réduit si le corpus est trop petit pour la valeur configurée"""
+    return max(1, min(config['nlist'], nb_vectors // MIN_POINTS_PER_CENTROID))
+
+
+def factory_string(config: Dict, nb_vectors: int = 0) -> str:
+    """
+    Chaîne index_factory FAISS correspondant à la configuration
+
+    Args:
+        config: Configuration d'index (voir VECTORSTORE_INDEX dans config.py)
+        nb_vectors: Nombre de vecteurs disponibles pour l'entraînement
+
+    Returns:
+        str: Ex. "IVF256,Flat", "HNSW32", "PCA128,Flat"
+    """
+    if config['pca_dim']:
+        if config['type'] in ("pq", "ivf_pq") and config['pca_dim'] % config['pq_m']:
+            raise ValueError(f"pq_m={config['pq_m']} doit diviser la dimension projetée pca_dim={config['pca_dim']}")
+        return f"PCA{config['pca_dim']}," + factory_string({**config, 'pca_dim': 0}, nb_vectors)
+    index_type = config['type']
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "ivf_flat":
+        return f"IVF{_effective_nlist(config, nb_vectors)},Flat"
+    if index_type == "ivf_pq":
+        return f"IVF{_effective_nlist(config, nb_vectors)},PQ{config['pq_m']}"
+    if index_type == "hnsw":
+        return f"HNSW{config['hnsw_m']},Flat"
+    if index_type == "sq_fp16":
+        return "SQfp16"
+    if index_type == "sq8":
+        return "SQ8"
+    if index_type == "pq":
+        return f"PQ{config['pq_m']}"
+    raise ValueError(f"Type d'index inconnu: {index_type} (attendu: {', '.join(INDEX_TYPES)})")
+
+
+def needs_training(config: Dict) -> bool:
+    """Indique si le type d'index (ou sa projection PCA) doit être entraîné avant usage"""
+    return bool(config['pca_dim']) or config['type'] in ("ivf_flat", "ivf_pq", "sq8", "pq")
+
+
+def min_training_size(config: Dict) -> int:
+    """Nombre de vecteurs à partir duquel l'index approché (ou projeté) est construit"""
+    if not needs_training(config):
+        return 0
+    minimum = MIN_PCA_TRAINING_SIZE if config['pca_dim'] else 0
+    if config['type'] in ("sq8", "pq"):
+        # PQ: 256 centroïdes par sous-quantificateur; SQ8: 256 niveaux par dimension
+        return max(minimum, 256 * MIN_POINTS_PER_CENTROID)
+    if config['type'] not in ("ivf_flat", "ivf_pq"):
+        return minimum
+    minimum = max(minimum, MIN_POINTS_PER_CENTROID * config['nlist'])
+    if config['type'] == "ivf_pq":
+        # Le PQ (8 bits) entraîne 256 centroïdes par sous-quantificateur
+        minimum = max(minimum, 256 * MIN_POINTS_PER_CENTROID)
+    return minimum
+
+
+def _projection(index: faiss.Index) -> Optional[faiss.IndexPreTransform]:
+    """Projection (IndexPreTransform) d'un index, sous son IndexIDMap2 éventuel"""
+    index = faiss.downcast_index(index)
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        index = faiss.downcast_index(index.index)
+    return index if isinstance(index, faiss.IndexPreTransform) else None
+
+
+def _unwrap(index: faiss.Index) -> faiss.Index:
+    """Index sous-jacent d'un IndexIDMap / IndexIDMap2, sans sa projection"""
+    index = faiss.downcast_index(index)
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        index = faiss.downcast_index(index.index)
+    if isinstance(index, faiss.IndexPreTransform):
+        index = faiss.downcast_index(index.index)
+    return index
+
+
+def index_kind(index: faiss.Index) -> str:
+    """Type logique ("flat", "ivf_flat", ...) d'un index FAISS existant"""
+    index = _unwrap(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVFFlat):
+        return "ivf_flat"
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return {faiss.ScalarQuantizer.QT_fp16: "sq_fp16",
+                faiss.ScalarQuantizer.QT_8bit: "sq8"}.get(index.sq.qtype, "sq")
+    if isinstance(index, faiss.IndexPQ):
+        return "pq"
+    if isinstance(index, faiss.IndexFlat):
+        return "flat"
+    return type(index).__name__
+
+
+def projected_dimension(index: faiss.Index) -> int:
+    """Dimension des vecteurs indexés après projection PCA (0 = sans projection)"""
+    projection = _projection(index)
+    return projection.index.d if projection is not None else 0
+
+
+def describe(index: faiss.Index) -> str:
+    """Type d'un index et sa projection, pour l'affichage: "hnsw" ou "flat + PCA 128" par exemple"""
+    dimension = projected_dimension(index)
+    return index_kind(index) + (f" + PCA {dimension}" if dimension else "")
+
+
+def describe_config(config: Dict) -> str:
+    """Type et projection configurés, pour l'affichage (voir describe)"""
+    return config['type'] + (f" + PCA {config['pca_dim']}" if config['pca_dim'] else "")
+
+
+def matches_config(index: faiss.Index, config: Dict) -> bool:
+    """Index du type et de la projection configurés"""
+    return index_kind(index) == config['type'] and projected_dimension(index) == config['pca_dim']
+
+
+def build_index(
+    dimension: int,
+    config: Dict,
+    vectors: Optional[np.ndarray] = None,
+    min_self_similarity: float = 0.0
+) -> faiss.Index:
+    """
+    Construit un index vide du type configuré, entraîné sur `vectors` si nécessaire
+
+    Tant que les vecteurs d'entraînement sont insuffisants, retourne un index
+    flat: il sera remplacé par l'index approché dès que le seuil est atteint.
+    Une projection PCA qui ôte trop aux vecteurs est refusée (index en pleine
+    dimension): la part perdue plafonne le score de toute correspondance, même
+    exacte (voir self_similarities).
+
+    Args:
+        dimension: Dimension des embeddings
+        config: Configuration d'index
+        vectors: Vecteurs d'entraînement (optionnel)
+        min_self_similarity: Similarité médiane minimale d'un vecteur
+            d'entraînement avec lui-même une fois projeté
+
+    Returns:
+        faiss.Index: Index vide, prêt à recevoir des ajouts
+    """
+    nb_vectors = 0 if vectors is None else len(vectors)
+    if (config['type'] == "flat" and not config['pca_dim']) or \
+            (needs_training(config) and nb_vectors < min_training_size(config)):
+        return faiss.IndexIDMap2(faiss.IndexFlatL2(dimension))
+
+    index = faiss.index_factory(dimension, factory_string(config, nb_vectors), faiss.METRIC_L2)
+
+    if config['type'] == "hnsw":
+        _unwrap(index).hnsw.efConstruction = config['ef_construction']
+    if needs_training(config):
+        # Projection PCA apprise d'abord, puis l'index sur les vecteurs projetés
+        index.train(vectors)
+    if config['pca_dim'] and min_self_similarity:
+        self_similarity = float(np.median(self_similarities(index, vectors[:SELF_SIMILARITY_SAMPLE])))
+        if self_similarity < min_self_similarity:
+            print(f"⚠️ Projection PCA {config['pca_dim']} refusée: similarité médiane d'un vecteur avec "
+                  f"lui-même {self_similarity:.3f} < {min_self_similarity:.2f}, index en pleine dimension")
+            return build_index(dimension, {**config, 'pca_dim': 0}, vectors)
+    if config['type'] in ("ivf_flat", "ivf_pq"):
+        # Carte directe par table de hachage: reconstruct() et remove_ids() en O(1) par ID
+        faiss.extract_index_ivf(index).set_direct_map_type(faiss.DirectMap.Hashtable)
+    else:
+        index = faiss.IndexIDMap2(index)
+
+    apply_search_params(index, config)
+    return index
+
+
+def apply_search_params(index: faiss.Index, config: Dict):
+    """Applique nprobe / efSearch configurés à un index"""
+    kind = index_kind(index)
+    if kind in ("ivf_flat", "ivf_pq"):
+        faiss.extract_index_ivf(index).nprobe = config['nprobe']
+    elif kind == "hnsw":
+        _unwrap(index).hnsw.efSearch = config['ef_search']
+
+
+def search_parameters(index: faiss.Index, config: Dict, selector=None) -> Optional[faiss.SearchParameters]:
+    """
+    Paramètres de recherche par requête, avec sélecteur d'IDs optionnel
+
+    Les SearchParameters remplacent les réglages de l'index: nprobe et
+    efSearch doivent donc y être reportés.
+    """
+    kind = index_kind(index)
+    if kind in ("ivf_flat", "ivf_pq"):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=config['nprobe'])
+    if kind == "hnsw":
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=config['ef_search'])
+    if selector is not None:
+        return faiss.SearchParameters(sel=selector)
+    return None
+
+
+def supports_remove(index: faiss.Index) -> bool:
+    """HNSW ne supporte pas remove_ids: il faut reconstruire l'index"""
+    return index_kind(index) != "hnsw"
+
+
+def stores_exact_vectors(index: faiss.Index) -> bool:
+    """Vecteurs reconstruits identiques aux vecteurs ajoutés (index non compressé, non projeté)"""
+    return index_kind(index) in EXACT_TYPES and not projected_dimension(index)
+
+
+def projection_residuals(index: faiss.Index, vectors: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Carré de la norme de la part de chaque vecteur perdue par la projection PCA
+    de l'index (None sans projection)
+
+    Ajouté aux distances de l'index projeté, donne la distance de la requête
+    au vecteur stocké (reconstruit), comme pour un index compressé: sans lui,
+    la distance dans le sous-espace surestimerait la similarité.
+    """
+    projection = _projection(index)
+    if projection is None:
+        return None
+    transforms = [projection.chain.at(position) for position in range(projection.chain.size())]
+    projected = vectors
+    for transform in transforms:
+        projected = transform.apply(projected)
+    for transform in reversed(transforms):
+        projected = transform.reverse_transform(projected)
+    return ((vectors - projected) ** 2).sum(axis=1)
+
+
+def to_similarity(distances: np.ndarray) -> np.ndarray:
+    """Similarité des résultats de recherche à partir des distances L2 au carré (embeddings normalisés)"""
+    return 1.0 - (distances * distances) / 2.0
+
+
+def self_similarities(index: faiss.Index, vectors: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Score de recherche de chaque vecteur contre lui-même une fois stocké dans
+    l'index projeté (None sans projection)
+
+    Plafond de toute correspondance exacte: un score sous SIMILARITY_THRESHOLD
+    empêche la réutilisation d'une fiche identique.
+    """
+    residuals = projection_residuals(index, vectors)
+    return None if residuals is None else to_similarity(residuals)
+
+
+def stored_labels(index: faiss.Index) -> np.ndarray:
+    """Étiquettes des vecteurs présents dans l'index"""
+    top = faiss.downcast_index(index)
+    if isinstance(top, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.vector_to_array(top.id_map).astype('int64')
+    invlists = faiss.extract_index_ivf(index).invlists
+    labels = [
+        faiss.rev_swig_ptr(invlists.get_ids(list_no), invlists.list_size(list_no)).copy()
+        for list_no in range(invlists.nlist)
+        if invlists.list_size(list_no)
+    ]
+    return np.concatenate(labels).astype('int64') if labels else np.empty(0, dtype='int64')
+
+
+def reconstruct(index: faiss.Index, labels: np.ndarray) -> np.ndarray:
+    """Vecteurs stockés pour ces étiquettes (approchés pour les index compressés)"""
+    if len(labels) == 0:
+        return np.empty((0, index.d), dtype='float32')
+    return index.reconstruct_batch(np.asarray(labels, dtype='int64'))
@@ -0,0 +1,289 @@
+"""
+Ingestion incrémentale du corpus: découverte des fichiers, parsing parallèle
+et manifeste d'ingestion
+"""
+import os
+import json
+import hashlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Tuple, Optional, Iterator
+
+# Chargement de documents
+from langchain_community.document_loaders import PyPDFLoader, TextLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+
+# Formats pris en charge, dans l'ordre de chargement
+CORPUS_PATTERNS = ["**/*.pdf", "**/*.txt"]
+
+
+def discover_corpus_files(matiere_dir: Path) -> List[Path]:
+    """Liste les fichiers du corpus d'une matière (PDF puis TXT, ordre stable)"""
+    files = []
+    for pattern in CORPUS_PATTERNS:
+        files.extend(sorted(matiere_dir.glob(pattern)))
+    return files
+
+
+def file_content_hash(path: Path, block_size: int = 1 << 20) -> str:
+    """Calcule le hash SHA-256 du contenu d'un fichier"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_id(path: Path, root: Path) -> str:
+    """
+    Identifiant stable d'un fichier du corpus: hash de son chemin relatif à
+    `root` (séparateurs normalisés), distinct pour deux copies d'un même contenu
+    """
+    relative = Path(os.path.relpath(path, root)).as_posix()
+    return hashlib.sha256(relative.encode('utf-8')).hexdigest()[:16]
+
+
+def parse_corpus_file(path: Path, matiere: str, niveau: str) -> Optional[Tuple[List[str], List[Dict]]]:
+    """
+    Charge un fichier du corpus, annote ses pages et le découpe en chunks
+
+    Fonction de module: exécutable dans un processus de travail.
+
+    Args:
+        path: Fichier PDF ou TXT
+        matiere: Matière du corpus
+        niveau: Niveau scolaire
+        
+    Returns:
+        Optional[Tuple[List[str], List[Dict]]]: Textes et métadonnées des chunks, None en cas d'erreur
+    """
+    is_pdf = path.suffix.lower() == ".pdf"
+    try:
+        if is_pdf:
+            loader = PyPDFLoader(str(path))
+        else:
+            loader = TextLoader(str(path), encoding='utf-8')
+        docs = loader.load()
+    except Exception as e:
+        print(f"  ❌ Erreur {'PDF' if is_pdf else 'TXT'} {path.name}: {e}")
+        return None
+
+    for doc in docs:
+        doc.metadata.update({
+            "source": str(path),
+            "matiere": matiere,
+            "type": "officiel" if is_pdf and "programme" in path.stem.lower() else "complement",
+            "niveau": niveau,
+            "format": "pdf" if is_pdf else "txt"
+        })
+
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=1000,
+        chunk_overlap=200,
+        length_function=len,
+        separators=["\n\n", "\n", " ", ""]
+    )
+    chunks = text_splitter.split_documents(docs)
+
+    print(f"  ✅ {'PDF' if is_pdf else 'TXT'}: {path.name} ({len(docs)} pages, {len(chunks)} chunks)")
+    return [chunk.page_content for chunk in chunks], [chunk.metadata for chunk in chunks]
+
+
+def parse_corpus_files(
+    paths: List[Path],
+    matiere: str,
+    niveau: str,
+    workers: int = 1
+) -> Iterator[Tuple[Path, Optional[Tuple[List[str], List[Dict]]]]]:
+    """
+    Parse des fichiers du corpus, en parallèle sur un pool de processus
+
+    Les résultats sont produits dans l'ordre de `paths`, quel que soit l'ordre
+    de fin des processus: les IDs de chunks restent déterministes. L'échec
+    d'un fichier (y compris l'arrêt brutal de son processus) n'affecte pas
+    les autres.
+
+    Au plus `2 * workers` fichiers sont en cours ou en attente de lecture:
+    un consommateur lent (embedding) freine le parsing au lieu de laisser
+    les résultats s'accumuler en mémoire.
+
+    Args:
+        paths: Fichiers à parser
+        matiere: Matière du corpus
+        niveau: Niveau scolaire
+        workers: Nombre de processus (1 = parsing séquentiel dans le processus courant)
+        
+    Yields:
+        Tuple[Path, Optional[Tuple[List[str], List[Dict]]]]: Fichier et résultat de parse_corpus_file
+    """
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            yield path, parse_corpus_file(path, matiere, niveau)
+        return
+
+    window = 2 * workers
+    with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+        futures = deque(
+            (path, pool.submit(parse_corpus_file, path, matiere, niveau)) for path in paths[:window]
+        )
+        remaining = iter(paths[window:])
+        while futures:
+            path, future = futures.popleft()
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"  ❌ Erreur {path.name}: {e}")
+                result = None
+
+            # Un fichier lu: un suivant peut être soumis
+            next_path = next(remaining, None)
+            if next_path is not None:
+                futures.append((next_path, pool.submit(parse_corpus_file, next_path, matiere, niveau)))
+
+            yield path, result
+
+
+class CorpusManifest:
+    """
+    Manifeste d'ingestion: pour chaque (matière, niveau), les fichiers déjà
+    indexés avec taille, mtime, hash du contenu et IDs des chunks produits
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Dict]] = self._load()
+
+    @staticmethod
+    def key(matiere: str, niveau: str) -> str:
+        """Clé du manifeste pour une matière et un niveau"""
+        return f"{matiere}|{niveau}"
+
+    def _load(self) -> Dict[str, Dict[str, Dict]]:
+        """Charge le manifeste depuis le disque"""
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"⚠️ Manifeste illisible, ré-ingestion complète: {e}")
+        return {}
+
+    def save(self):
+        """Sauvegarde le manifeste (écriture dans un fichier temporaire puis renommage)"""
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def reset(self):
+        """Oublie tous les fichiers ingérés et supprime le manifeste"""
+        self.entries = {}
+        if self.path.exists():
+            self.path.unlink()
+
+    def has(self, key: str) -> bool:
+        """Indique si ce (matière, niveau) a déjà été ingéré avec le manifeste"""
+        return key in self.entries
+
+    def drop(self, key: str):
+        """Oublie tous les fichiers d'une clé"""
+        self.entries.pop(key, None)
+
+    def files(self, key: str) -> Dict[str, Dict]:
+        """Fichiers suivis pour une clé"""
+        return self.entries.get(key, {})
+
+    def chunk_ids(self, key: str) -> List[str]:
+        """IDs de tous les chunks suivis pour une clé"""
+        return [cid for entry in self.files(key).values() for cid in entry['chunk_ids']]
+
+    def record(self, key: str, source: str, signature: Dict, chunk_ids: List[str]):
+        """Enregistre un fichier ingéré"""
+        self.entries.setdefault(key, {})[source] = {**signature, 'chunk_ids': chunk_ids}
+
+    def forget(self, key: str, source: str):
+        """Retire un fichier du manifeste"""
+        self.entries.get(key, {}).pop(source, None)
+
+    def invalidate_shared(self, key: str) -> int:
+        """
+        Marque à ré-indexer les fichiers dont les chunks partagent des IDs
+        (anciens IDs dérivés du seul contenu: deux copies d'un fichier
+        s'écrasaient l'une l'autre)
+
+        Returns:
+            int: Nombre de fichiers marqués
+        """
+        owners: Dict[str, str] = {}
+        shared = set()
+        for source, entry in self.files(key).items():
+            for chunk_id in entry['chunk_ids']:
+                owner = owners.setdefault(chunk_id, source)
+                if owner != source:
+                    shared.update((owner, source))
+        for source in shared:
+            # Signature impossible: le fichier sera ré-indexé, ses anciens chunks retirés
+            self.entries[key][source].update(size=-1, sha256='')
+        return len(shared)
+
+    def unchanged(self, key: str, files: List[Path]) -> bool:
+        """
+        Indique que ces fichiers sont exactement ceux suivis, de mêmes taille et
+        mtime (un stat par fichier, sans lecture ni modification du manifeste)
+        """
+        tracked = self.files(key)
+        if not self.has(key) or len(tracked) != len(files):
+            return False
+        for path in files:
+            entry = tracked.get(str(path))
+            try:
+                stat = path.stat()
+            except OSError:
+                return False
+            if entry is None or entry['size'] != stat.st_size or entry['mtime'] != stat.st_mtime:
+                return False
+        return True
+
+    def plan(self, key: str, files: List[Path]) -> Tuple[List[Tuple[Path, Dict]], List[str], bool]:
+        """
+        Compare l'état du disque avec le manifeste
+
+        Args:
+            key: Clé (matière, niveau)
+            files: Fichiers présents sur le disque
+
+        Returns:
+            (à indexer [(chemin, signature)], sources supprimées, manifeste modifié)
+        """
+        tracked = self.entries.setdefault(key, {})
+        to_index = []
+        touched = False
+
+        for path in files:
+            stat = path.stat()
+            entry = tracked.get(str(path))
+
+            # Chemin rapide: taille et mtime inchangés, pas de lecture du fichier
+            if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+                continue
+
+            signature = {
+                'size': stat.st_size,
+                'mtime': stat.st_mtime,
+                'sha256': file_content_hash(path)
+            }
+
+            # Fichier touché mais contenu identique: on met juste à jour la signature
+            if entry and entry['sha256'] == signature['sha256']:
+                entry.update(signature)
+                touched = True
+                continue
+
+            to_index.append((path, signature))
+
+        present = {str(path) for path in files}
+        removed = [source for source in tracked if source not in present]
+
+        return to_index, removed, touched
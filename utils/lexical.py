@@ -0,0 +1,75 @@
+"""
+Recherche lexicale: termes d'une requête (comme le tokenizer FTS5 des chunks),
+couverture d'un texte par ces termes et fusion de classements (RRF)
+"""
+import re
+import unicodedata
+from typing import Dict, Iterable, List
+
+
+# Mots vides retirés des requêtes lexicales (formes sans accents)
+FRENCH_STOPWORDS = frozenset("""
+    a au aux avec ce ces cet cette d dans de des du elle en est et il ils l la le les leur leurs
+    lui mais me meme mes n ne nos notre nous on ou par pas pour qu que qui s sa se ses son sur
+    ta te tes ton tu un une vos votre vous y
+""".split())
+
+_WORD = re.compile(r"\w+")
+
+
+def fold(text: str) -> str:
+    """Minuscules sans accents (équivalent de unicode61 remove_diacritics 2)"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def _singular(term: str) -> str:
+    """Radical approché: marque du pluriel retirée (objectifs -> objectif)"""
+    if len(term) > 3 and term[-1] in "sx":
+        return term[:-1]
+    return term
+
+
+def query_terms(query: str) -> List[str]:
+    """Termes distincts d'une requête (radicaux), sans mots vides, dans l'ordre d'apparition"""
+    terms = []
+    for word in _WORD.findall(fold(query)):
+        term = _singular(word)
+        if word not in FRENCH_STOPWORDS and term not in terms:
+            terms.append(term)
+    return terms
+
+
+def match_expression(terms: List[str]) -> str:
+    """
+    Expression MATCH FTS5: disjonction des termes en préfixes ("objectif"*
+    trouve objectif et objectifs), entre guillemets pour n'injecter aucune
+    syntaxe FTS5
+    """
+    return " OR ".join(f'"{term}"*' for term in terms)
+
+
+def term_coverage(terms: List[str], text: str) -> float:
+    """Part des termes de la requête présents dans le texte (mêmes préfixes que MATCH)"""
+    if not terms:
+        return 0.0
+    words = set(_WORD.findall(fold(text)))
+    return sum(any(word.startswith(term) for word in words) for term in terms) / len(terms)
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[int]], k: int = 60) -> Dict[int, float]:
+    """
+    Fusion de classements par Reciprocal Rank Fusion
+
+    Chaque étiquette reçoit la somme de 1 / (k + rang) sur les classements où
+    elle apparaît: seuls les rangs comptent, pas les échelles de score (BM25
+    et similarité cosinus ne sont pas comparables).
+
+    Returns:
+        Dict[int, float]: Score de fusion par étiquette
+    """
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, label in enumerate(ranking, start=1):
+            scores[label] = scores.get(label, 0.0) + 1.0 / (k + rank)
+    return scores
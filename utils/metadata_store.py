@@ -0,0 +1,483 @@
+"""
+Stockage SQLite des chunks et de leurs métadonnées, indexé par étiquette FAISS
+"""
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, Dict, Tuple, Optional, Iterable
+import numpy as np
+
+
+# Champs de métadonnées dupliqués en colonnes indexées (filtres et GROUP BY rapides);
+# les autres champs sont filtrés via json_extract()
+INDEXED_FIELDS = ("matiere", "niveau", "type", "source")
+
+# Limite de variables par requête SQLite (valeur par défaut des anciennes versions)
+_MAX_VARIABLES = 900
+
+
+def _chunked(values: List, size: int = _MAX_VARIABLES) -> Iterable[List]:
+    """Découpe une liste en morceaux de taille bornée"""
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class MetadataStore:
+    """
+    Chunks (texte + métadonnées) dans une base SQLite en mode WAL
+
+    La clé primaire est l'étiquette int64 du vecteur dans l'index FAISS: le
+    texte n'est lu que pour les résultats de recherche, jamais gardé en mémoire.
+    Les lectures des recherches passent par une connexion par thread (WAL: elles
+    ne bloquent pas l'écrivain et ne voient que des transactions validées).
+    """
+
+    def __init__(self, path: Path, read_only: bool = False):
+        """
+        Args:
+            path: Fichier de la base
+            read_only: Base figée d'un artefact prébuilt (voir freeze()), ouverte
+                sans écriture ni création du schéma
+        """
+        self.path = path
+        self.read_only = read_only
+        self._readers = threading.local()
+        self._reader_connections: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        # Connexion d'écriture: le VectorStoreManager sérialise les écritures
+        self._conn = self._connect()
+        if read_only:
+            return
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        """Crée les tables et index s'ils n'existent pas"""
+        columns = ", ".join(f"{field} TEXT" for field in INDEXED_FIELDS)
+        with self._conn:
+            self._conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS chunks (
+                    label INTEGER PRIMARY KEY,
+                    doc_id TEXT NOT NULL UNIQUE,
+                    content TEXT NOT NULL,
+                    metadata TEXT NOT NULL,
+                    {columns}
+                )
+            """)
+            for field in INDEXED_FIELDS:
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_chunks_{field} ON chunks({field})")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._create_lexical_index()
+            self._create_near_duplicates_schema()
+
+    def _create_near_duplicates_schema(self):
+        """
+        Quasi-doublons: un chunk fusionné garde sa ligne (texte, métadonnées, ID)
+        mais n'a pas de vecteur; sa colonne canonical désigne le chunk qui le
+        représente dans l'index. Les chunks représentants portent leur signature
+        MinHash et ses clés de bandes LSH.
+        """
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(chunks)")}
+        if "canonical" not in columns:
+            self._conn.execute("ALTER TABLE chunks ADD COLUMN canonical INTEGER")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_canonical ON chunks(canonical)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS chunk_minhash (label INTEGER PRIMARY KEY, signature BLOB NOT NULL)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunk_lsh (band INTEGER NOT NULL, bucket INTEGER NOT NULL, label INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunk_lsh_bucket ON chunk_lsh(band, bucket)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunk_lsh_label ON chunk_lsh(label)")
+        self._conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS chunks_minhash_delete AFTER DELETE ON chunks BEGIN
+                DELETE FROM chunk_minhash WHERE label = old.label;
+                DELETE FROM chunk_lsh WHERE label = old.label;
+            END
+        """)
+
+    def _create_lexical_index(self):
+        """
+        Index inversé FTS5 du texte des chunks (classement BM25)
+
+        Table à contenu externe: le texte n'est pas dupliqué, l'index est tenu à
+        jour par des triggers dans la même transaction que les chunks.
+        """
+        exists = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chunks_fts'"
+        ).fetchone()
+        self._conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+                content, content='chunks', content_rowid='label',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        """)
+        self._conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS chunks_fts_insert AFTER INSERT ON chunks BEGIN
+                INSERT INTO chunks_fts (rowid, content) VALUES (new.label, new.content);
+            END
+        """)
+        self._conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS chunks_fts_delete AFTER DELETE ON chunks BEGIN
+                INSERT INTO chunks_fts (chunks_fts, rowid, content) VALUES ('delete', old.label, old.content);
+            END
+        """)
+        self._conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS chunks_fts_update AFTER UPDATE OF content ON chunks BEGIN
+                INSERT INTO chunks_fts (chunks_fts, rowid, content) VALUES ('delete', old.label, old.content);
+                INSERT INTO chunks_fts (rowid, content) VALUES (new.label, new.content);
+            END
+        """)
+        if not exists:
+            # Base créée avant l'index lexical: indexation des chunks existants
+            self._conn.execute("INSERT INTO chunks_fts (chunks_fts) VALUES ('rebuild')")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Nouvelle connexion à la base (en lecture seule pour une base figée)"""
+        if self.read_only:
+            return sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+        return sqlite3.connect(str(self.path), check_same_thread=False)
+
+    def _reader(self) -> sqlite3.Connection:
+        """Connexion de lecture du thread courant (ouverte au premier appel)"""
+        conn = getattr(self._readers, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            conn.execute("PRAGMA query_only=1")
+            self._readers.conn = conn
+            with self._readers_lock:
+                self._reader_connections.append(conn)
+        return conn
+
+    def _close_readers(self):
+        """Ferme les connexions de lecture (rouvertes au besoin)"""
+        with self._readers_lock:
+            readers, self._reader_connections = self._reader_connections, []
+            self._readers = threading.local()
+        for conn in readers:
+            conn.close()
+
+    def close(self):
+        """Ferme les connexions"""
+        self._close_readers()
+        self._conn.close()
+
+    # --- Écritures -----------------------------------------------------------
+
+    def insert_many(
+        self,
+        labels: List[int],
+        ids: List[str],
+        texts: List[str],
+        metadatas: List[Dict],
+        canonicals: Optional[List[Optional[int]]] = None
+    ):
+        """Insère des chunks (une seule transaction), éventuellement quasi-doublons d'un chunk représentant"""
+        if canonicals is None:
+            canonicals = [None] * len(labels)
+        rows = [
+            (label, doc_id, text, json.dumps(metadata, ensure_ascii=False), canonical,
+             *(self._column_value(metadata.get(field)) for field in INDEXED_FIELDS))
+            for label, doc_id, text, metadata, canonical in zip(labels, ids, texts, metadatas, canonicals)
+        ]
+        placeholders = ", ".join("?" * (5 + len(INDEXED_FIELDS)))
+        with self._conn:
+            self._conn.executemany(
+                f"INSERT INTO chunks (label, doc_id, content, metadata, canonical, {', '.join(INDEXED_FIELDS)}) "
+                f"VALUES ({placeholders})",
+                rows
+            )
+
+    def set_signatures(self, labels: List[int], signatures: List[np.ndarray], band_keys: List[List[int]]):
+        """Enregistre les signatures MinHash et clés de bandes LSH de chunks représentants"""
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunk_minhash (label, signature) VALUES (?, ?)",
+                [(label, signature.astype('<u4').tobytes()) for label, signature in zip(labels, signatures)]
+            )
+            self._conn.executemany(
+                "INSERT INTO chunk_lsh (band, bucket, label) VALUES (?, ?, ?)",
+                [(band, key, label) for label, keys in zip(labels, band_keys) for band, key in enumerate(keys)]
+            )
+
+    def reassign(self, mapping: Dict[int, int]):
+        """Rattache les quasi-doublons de chaque ancien représentant à un autre chunk"""
+        with self._conn:
+            self._conn.executemany(
+                "UPDATE chunks SET canonical = ? WHERE canonical = ?",
+                [(new, old) for old, new in mapping.items()]
+            )
+
+    def vacuum(self):
+        """Compacte la base: journal WAL vidé, index lexical optimisé, pages libres rendues au disque"""
+        with self._conn:
+            self._conn.execute("INSERT INTO chunks_fts (chunks_fts) VALUES ('optimize')")
+        self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self._conn.execute("VACUUM")
+        self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def freeze(self):
+        """
+        Fige la base d'un artefact prébuilt: compactée, sans journal WAL (un seul
+        fichier, lisible en lecture seule sans fichiers -wal / -shm)
+        """
+        # Changer de journal demande d'être la seule connexion ouverte
+        self._close_readers()
+        self.vacuum()
+        self._conn.execute("PRAGMA journal_mode=DELETE")
+
+    def clear_signatures(self):
+        """Oublie toutes les signatures (paramètres MinHash changés)"""
+        with self._conn:
+            self._conn.execute("DELETE FROM chunk_minhash")
+            self._conn.execute("DELETE FROM chunk_lsh")
+
+    def promote(self, groups: Dict[int, List[int]]):
+        """
+        Le premier chunk de chaque groupe de quasi-doublons devient représentant
+        des suivants (leur représentant a été supprimé)
+        """
+        with self._conn:
+            for members in groups.values():
+                head, rest = members[0], members[1:]
+                self._conn.execute("UPDATE chunks SET canonical = NULL WHERE label = ?", (head,))
+                self._conn.executemany(
+                    "UPDATE chunks SET canonical = ? WHERE label = ?", [(head, label) for label in rest]
+                )
+                # Seuls les représentants portent une signature (candidats LSH)
+                self._conn.executemany("DELETE FROM chunk_minhash WHERE label = ?", [(label,) for label in rest])
+                self._conn.executemany("DELETE FROM chunk_lsh WHERE label = ?", [(label,) for label in rest])
+
+    def delete_labels(self, labels: List[int]):
+        """Supprime des chunks par étiquette"""
+        with self._conn:
+            for chunk in _chunked(list(labels)):
+                self._conn.execute(
+                    f"DELETE FROM chunks WHERE label IN ({', '.join('?' * len(chunk))})", chunk
+                )
+
+    def clear(self):
+        """Supprime tous les chunks"""
+        with self._conn:
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.execute("DELETE FROM meta")
+            self._conn.execute("DELETE FROM chunk_minhash")
+            self._conn.execute("DELETE FROM chunk_lsh")
+
+    def set_meta(self, key: str, value):
+        """Enregistre une valeur de service (ex. prochaine étiquette)"""
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value))
+            )
+
+    @property
+    def changes(self) -> int:
+        """Lignes modifiées par la connexion d'écriture depuis son ouverture"""
+        return self._conn.total_changes
+
+    def get_meta(self, key: str, default=None):
+        """Lit une valeur de service"""
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    # --- Lectures ------------------------------------------------------------
+
+    def count(self) -> int:
+        """Nombre de chunks"""
+        return self._reader().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def max_label(self) -> int:
+        """Plus grande étiquette utilisée (-1 si vide)"""
+        return self._conn.execute("SELECT COALESCE(MAX(label), -1) FROM chunks").fetchone()[0]
+
+    def count_by(self, field: str) -> Dict[str, int]:
+        """Nombre de chunks par valeur d'un champ indexé (GROUP BY sur index)"""
+        if field not in INDEXED_FIELDS:
+            raise ValueError(f"Champ non indexé: {field}")
+        rows = self._reader().execute(
+            f"SELECT COALESCE({field}, 'inconnu'), COUNT(*) FROM chunks GROUP BY {field}"
+        ).fetchall()
+        return dict(rows)
+
+    def count_duplicates(self) -> int:
+        """Nombre de chunks fusionnés dans un chunk représentant (sans vecteur)"""
+        return self._reader().execute("SELECT COUNT(*) FROM chunks WHERE canonical IS NOT NULL").fetchone()[0]
+
+    def get_many(self, labels: Iterable[int], filters: Optional[Dict] = None) -> Dict[int, Tuple[str, Dict]]:
+        """
+        Texte et métadonnées de ces étiquettes
+
+        Les métadonnées d'un chunk représentant listent celles de ses
+        quasi-doublons fusionnés sous la clé 'doublons'. Avec des filtres, le
+        texte et les métadonnées retournés sont ceux du membre du groupe qui
+        les satisfait (le représentant s'il y satisfait, sinon le premier
+        quasi-doublon qui y satisfait), les autres membres étant sous 'doublons'.
+        """
+        clauses, params = self._where(filters or {})
+        conn = self._reader()
+        found = {}
+        for chunk in _chunked([int(label) for label in labels], (_MAX_VARIABLES - len(params)) // 2):
+            requested = set(chunk)
+            members = f"(label IN ({', '.join('?' * len(chunk))}) OR canonical IN ({', '.join('?' * len(chunk))}))"
+            rows = conn.execute(
+                f"SELECT label, canonical, content, metadata FROM chunks WHERE {members} ORDER BY label", chunk * 2
+            ).fetchall()
+            matching = None
+            if clauses:
+                matching = {row[0] for row in conn.execute(
+                    f"SELECT label FROM chunks WHERE {members} AND {' AND '.join(clauses)}", chunk * 2 + params
+                )}
+
+            # Groupe de chaque étiquette demandée: elle-même puis ses quasi-doublons
+            groups: Dict[int, List[Tuple[int, str, Dict]]] = {}
+            for label, canonical, content, metadata in rows:
+                for head in (label, canonical):
+                    if head in requested:
+                        groups.setdefault(head, []).append((label, content, json.loads(metadata)))
+            for head, group in groups.items():
+                if not any(label == head for label, _, _ in group):
+                    continue
+                kept = [member for member in group if matching is None or member[0] in matching]
+                chosen = min(kept or group, key=lambda member: (member[0] != head, member[0]))
+                _, content, metadata = chosen
+                metadata = dict(metadata)
+                others = [member[2] for member in group if member is not chosen]
+                if others:
+                    metadata['doublons'] = others
+                found[head] = (content, metadata)
+        return found
+
+    def labels_for_ids(self, ids: Iterable[str]) -> Dict[str, int]:
+        """Étiquettes des IDs de documents présents"""
+        found = {}
+        for chunk in _chunked(list(ids)):
+            rows = self._conn.execute(
+                f"SELECT doc_id, label FROM chunks WHERE doc_id IN ({', '.join('?' * len(chunk))})",
+                chunk
+            )
+            found.update(rows)
+        return found
+
+    def canonicals(self) -> Dict[int, int]:
+        """Représentant de chaque quasi-doublon"""
+        return dict(self._conn.execute("SELECT label, canonical FROM chunks WHERE canonical IS NOT NULL"))
+
+    def vector_labels(self) -> np.ndarray:
+        """Étiquettes des chunks ayant un vecteur dans l'index (hors quasi-doublons), triées"""
+        rows = self._conn.execute("SELECT label FROM chunks WHERE canonical IS NULL ORDER BY label").fetchall()
+        return np.array([row[0] for row in rows], dtype='int64')
+
+    def dependents(self, labels: Iterable[int]) -> Dict[int, List[int]]:
+        """Quasi-doublons (hors `labels`) de chacun de ces chunks représentants"""
+        labels = [int(label) for label in labels]
+        excluded = set(labels)
+        groups: Dict[int, List[int]] = {}
+        for chunk in _chunked(labels):
+            rows = self._conn.execute(
+                f"SELECT canonical, label FROM chunks WHERE canonical IN ({', '.join('?' * len(chunk))}) "
+                f"ORDER BY label",
+                chunk
+            )
+            for canonical, label in rows:
+                if label not in excluded:
+                    groups.setdefault(canonical, []).append(label)
+        return groups
+
+    def lsh_candidates(self, band_keys: List[int]) -> Dict[int, np.ndarray]:
+        """Signatures des chunks représentants partageant au moins une bande LSH"""
+        clauses = " OR ".join("(band = ? AND bucket = ?)" for _ in band_keys)
+        params = [value for band, key in enumerate(band_keys) for value in (band, key)]
+        rows = self._conn.execute(
+            f"SELECT label, signature FROM chunk_minhash WHERE label IN "
+            f"(SELECT label FROM chunk_lsh WHERE {clauses})",
+            params
+        )
+        return {label: np.frombuffer(signature, dtype='<u4') for label, signature in rows}
+
+    def iter_chunks(self, labels: Optional[Iterable[int]] = None) -> Iterable[Tuple[int, str, str, Dict]]:
+        """Parcourt (étiquette, ID, texte, métadonnées), éventuellement restreint à des étiquettes"""
+        if labels is None:
+            for label, doc_id, content, metadata in self._conn.execute(
+                "SELECT label, doc_id, content, metadata FROM chunks ORDER BY label"
+            ):
+                yield label, doc_id, content, json.loads(metadata)
+            return
+        for chunk in _chunked([int(label) for label in labels]):
+            for label, doc_id, content, metadata in self._conn.execute(
+                f"SELECT label, doc_id, content, metadata FROM chunks "
+                f"WHERE label IN ({', '.join('?' * len(chunk))}) ORDER BY label",
+                chunk
+            ):
+                yield label, doc_id, content, json.loads(metadata)
+
+    def labels_where(self, filters: Dict, canonical: bool = False) -> Optional[np.ndarray]:
+        """
+        Étiquettes des chunks satisfaisant tous les filtres d'égalité (en SQL)
+
+        Args:
+            filters: Filtres d'égalité sur les métadonnées
+            canonical: Remplacer un quasi-doublon par son chunk représentant
+                (étiquettes présentes dans l'index, pour la recherche)
+
+        Returns:
+            Optional[np.ndarray]: Étiquettes triées, ou None si aucun filtre actif
+        """
+        clauses, params = self._where(filters)
+        if not clauses:
+            return None
+
+        column = "COALESCE(canonical, label)" if canonical else "label"
+        rows = self._reader().execute(
+            f"SELECT DISTINCT {column} FROM chunks WHERE {' AND '.join(clauses)} ORDER BY 1", params
+        ).fetchall()
+        return np.array([row[0] for row in rows], dtype='int64')
+
+    def search_lexical(self, match: str, filters: Dict, limit: int) -> List[Tuple[int, float]]:
+        """
+        Meilleurs chunks au sens de BM25 pour une expression MATCH FTS5, filtrés en SQL
+
+        Args:
+            match: Expression MATCH (voir utils.lexical.match_expression)
+            filters: Filtres d'égalité sur les métadonnées
+            limit: Nombre maximal de résultats
+
+        Returns:
+            List[Tuple[int, float]]: (étiquette, score BM25), score décroissant
+        """
+        clauses, params = self._where(filters, table="chunks")
+        where = "".join(f" AND {clause}" for clause in clauses)
+        rows = self._reader().execute(
+            f"SELECT COALESCE(chunks.canonical, chunks.label), -bm25(chunks_fts) FROM chunks_fts "
+            f"JOIN chunks ON chunks.label = chunks_fts.rowid "
+            f"WHERE chunks_fts MATCH ?{where} ORDER BY bm25(chunks_fts)",
+            [match, *params]
+        )
+        # Un quasi-doublon trouvé est remplacé par son chunk représentant (meilleur score gardé)
+        found: Dict[int, float] = {}
+        for label, score in rows:
+            if label not in found:
+                found[label] = score
+                if len(found) == limit:
+                    break
+        return list(found.items())
+
+    def _where(self, filters: Dict, table: str = "") -> Tuple[List[str], List]:
+        """Clauses SQL (et paramètres) des filtres d'égalité actifs"""
+        prefix = f"{table}." if table else ""
+        clauses, params = [], []
+        for field, value in filters.items():
+            if value is None:
+                continue
+            if field in INDEXED_FIELDS:
+                clauses.append(f"{prefix}{field} = ?")
+                params.append(self._column_value(value))
+            else:
+                clauses.append(f"json_extract({prefix}metadata, ?) = ?")
+                params.extend([f'$."{field}"', value])
+        return clauses, params
+
+    @staticmethod
+    def _column_value(value) -> Optional[str]:
+        """Valeur stockée dans une colonne indexée"""
+        return None if value is None else str(value)
@@ -0,0 +1,79 @@
+"""
+Détection des chunks quasi-identiques par MinHash et LSH (bandes)
+
+Deux chunks sont quasi-identiques si la similarité de Jaccard de leurs
+ensembles de n-grammes de mots dépasse un seuil. La signature MinHash estime
+cette similarité; le découpage en bandes (LSH) ne compare un chunk qu'aux
+chunks partageant au moins une bande.
+"""
+import hashlib
+import re
+from typing import Dict, List
+import numpy as np
+
+from utils.lexical import fold
+
+
+# Nombre premier de Mersenne 2^31 - 1: a * x + b tient dans un uint64
+_PRIME = np.uint64((1 << 31) - 1)
+
+_WORD = re.compile(r"\w+")
+
+
+def _hash(data: bytes) -> int:
+    """Empreinte 64 bits stable entre processus (contrairement à hash())"""
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+
+class MinHasher:
+    """Signatures MinHash de textes et clés de bandes LSH"""
+
+    def __init__(self, num_perm: int = 128, bands: int = 16, shingle_size: int = 3, seed: int = 1):
+        """
+        Args:
+            num_perm: Nombre de permutations (longueur de la signature)
+            bands: Nombre de bandes LSH (doit diviser num_perm); avec r = num_perm / bands
+                lignes par bande, les paires de similarité > (1 / bands) ** (1 / r) sont
+                presque toujours candidates
+            shingle_size: Taille des n-grammes de mots
+            seed: Graine des permutations (fixe: signatures comparables entre exécutions)
+        """
+        if num_perm % bands:
+            raise ValueError(f"bands ({bands}) doit diviser num_perm ({num_perm})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, num_perm, dtype=np.uint64)
+
+    @property
+    def params(self) -> Dict:
+        """Paramètres dont dépendent les signatures (stockés avec elles)"""
+        return {'num_perm': self.num_perm, 'bands': self.bands, 'shingle_size': self.shingle_size}
+
+    def _shingles(self, text: str) -> np.ndarray:
+        """Empreintes des n-grammes de mots du texte (minuscules, sans accents)"""
+        words = _WORD.findall(fold(text))
+        size = self.shingle_size
+        grams = {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+        return np.array([_hash(gram.encode('utf-8')) for gram in grams], dtype=np.uint64) % _PRIME
+
+    def signature(self, text: str) -> np.ndarray:
+        """Signature MinHash (num_perm valeurs uint32)"""
+        shingles = self._shingles(text)
+        permuted = (self._a[:, None] * shingles[None, :] + self._b[:, None]) % _PRIME
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def band_keys(self, signature: np.ndarray) -> List[int]:
+        """Clé (int64 signé, stockable dans SQLite) de chaque bande de la signature"""
+        rows = self.num_perm // self.bands
+        return [
+            _hash(signature[band * rows:(band + 1) * rows].tobytes()) - (1 << 63)
+            for band in range(self.bands)
+        ]
+
+
+def similarity(signature_a: np.ndarray, signature_b: np.ndarray) -> float:
+    """Similarité de Jaccard estimée entre deux signatures"""
+    return float(np.mean(signature_a == signature_b))
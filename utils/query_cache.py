@@ -0,0 +1,113 @@
+"""
+Cache LRU des résultats de recherche, invalidé par génération de l'index
+"""
+import copy
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple
+
+
+def normalize_query(query: str) -> str:
+    """Requête normalisée pour la clé de cache (espaces superflus retirés)"""
+    return " ".join(query.split())
+
+
+def _copy_results(results: List[Tuple[str, float, Dict]]) -> List[Tuple[str, float, Dict]]:
+    """Copie des résultats: modifier les métadonnées reçues ne modifie pas le cache"""
+    return [(content, score, copy.deepcopy(metadata)) for content, score, metadata in results]
+
+
+class QueryCache:
+    """
+    Cache borné (LRU) des résultats de search_similar
+
+    Chaque entrée est associée à la génération de l'index au moment de la
+    recherche: dès que le vector store est modifié (génération incrémentée),
+    toutes les entrées deviennent invalides et sont libérées à la lecture
+    suivante. Une recherche commencée sur une génération antérieure (lecture
+    concurrente d'une écriture) ne lit ni n'écrit le cache. Les résultats
+    sont copiés à l'entrée et à la sortie du cache (métadonnées comprises).
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        """
+        Args:
+            maxsize: Nombre maximal de recherches en cache (0 = cache désactivé)
+        """
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, List[Tuple[str, float, Dict]]]" = OrderedDict()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(query: str, filters: Dict, top_k: int, similarity_threshold: float) -> Optional[Hashable]:
+        """
+        Clé de cache d'une recherche
+
+        Returns:
+            Optional[Hashable]: Clé, ou None si un filtre n'est pas hachable
+        """
+        active = tuple(sorted((field, value) for field, value in filters.items() if value is not None))
+        key = (normalize_query(query), active, top_k, float(similarity_threshold))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def _sync(self, generation: int) -> bool:
+        """
+        Vide le cache si l'index a changé depuis les entrées stockées
+
+        Returns:
+            bool: False si la génération est antérieure à celle du cache
+        """
+        if generation > self._generation:
+            self._entries.clear()
+            self._generation = generation
+        return generation == self._generation
+
+    def get(self, key: Optional[Hashable], generation: int) -> Optional[List[Tuple[str, float, Dict]]]:
+        """Résultats en cache pour cette clé et cette génération d'index, ou None"""
+        if key is None or not self.maxsize:
+            return None
+        with self._lock:
+            if not self._sync(generation):
+                return None
+            results = self._entries.get(key)
+            if results is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return _copy_results(results)
+
+    def put(self, key: Optional[Hashable], generation: int, results: List[Tuple[str, float, Dict]]):
+        """Met en cache les résultats d'une recherche faite à cette génération d'index"""
+        if key is None or not self.maxsize:
+            return
+        results = _copy_results(results)
+        with self._lock:
+            if not self._sync(generation):
+                return
+            self._entries[key] = results
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict:
+        """Compteurs du cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,155 @@
+"""
+Artefacts prébuilt du vector store: versions publiées par le build hors ligne
+et chargées en lecture seule par les serveurs d'application
+
+    releases/
+      current.json          version courante
+      <version>/            index (snapshots/), base SQLite, manifeste, build.json
+      .staging/<matière>/   vector stores de travail du build (incrémentaux)
+"""
+import os
+import json
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from utils.ingestion import CorpusManifest, discover_corpus_files, file_content_hash
+from utils.snapshots import fsync_dir
+
+
+class ReleaseStore:
+    """Versions publiées du vector store dans un dossier dédié"""
+
+    def __init__(self, directory: Path, retention: int = 3):
+        """
+        Args:
+            directory: Dossier des versions (créé si besoin)
+            retention: Nombre de versions conservées
+        """
+        self.directory = directory
+        self.retention = max(1, retention)
+        self.current_file = directory / "current.json"
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def path(self, version: str) -> Path:
+        """Dossier d'une version"""
+        return self.directory / version
+
+    def staging(self, subject: str) -> Path:
+        """Vector store de travail d'une matière (conservé entre deux builds)"""
+        return self.directory / ".staging" / subject
+
+    def versions(self) -> List[str]:
+        """Versions publiées, de la plus ancienne à la plus récente"""
+        return sorted(
+            path.name for path in self.directory.iterdir()
+            if path.is_dir() and not path.name.startswith(".") and (path / "build.json").exists()
+        )
+
+    def current(self) -> Optional[Dict]:
+        """Informations de build de la version courante, ou None"""
+        if not self.current_file.exists():
+            return None
+        try:
+            with open(self.current_file, 'r', encoding='utf-8') as f:
+                version = json.load(f)['version']
+            with open(self.path(version) / "build.json", 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Version courante illisible: {e}")
+            return None
+
+    def publish(self, build_dir: Path, info: Dict) -> Path:
+        """
+        Publie un dossier construit comme nouvelle version courante
+
+        Le dossier est renommé (atomique), puis current.json est remplacé: un
+        serveur démarrant pendant la publication voit l'ancienne ou la nouvelle
+        version, jamais une version partielle.
+        """
+        final = self.path(info['version'])
+        with open(build_dir / "build.json", 'w', encoding='utf-8') as f:
+            json.dump(info, f, ensure_ascii=False, indent=2)
+        os.replace(build_dir, final)
+
+        tmp = self.current_file.with_suffix(".tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': info['version']}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.current_file)
+        fsync_dir(self.directory)
+
+        for version in self.versions()[:-self.retention]:
+            shutil.rmtree(self.path(version), ignore_errors=True)
+        return final
+
+
+def _relative_source(source: str, matiere: str, on_disk: Set[str]) -> str:
+    """
+    Chemin d'un fichier suivi relatif au dossier de sa matière (séparateurs normalisés)
+
+    Le manifeste garde les chemins absolus de la machine de build: la partie
+    suivant le dossier de la matière est retenue (celle présente sur le disque
+    si le nom de la matière apparaît plusieurs fois dans le chemin).
+    """
+    parts = source.replace('\\', '/').split('/')
+    candidates = ['/'.join(parts[i + 1:]) for i, part in enumerate(parts) if part == matiere]
+    for candidate in candidates:
+        if candidate in on_disk:
+            return candidate
+    return candidates[-1] if candidates else parts[-1]
+
+
+def artifact_status(manifest: CorpusManifest, corpus_dir: Path, matiere: str, niveaux: List[str]) -> Dict[str, Dict]:
+    """
+    État de l'artefact d'une matière, pour chaque niveau, par rapport au corpus sur le disque
+
+    Les fichiers sont comparés par chemin relatif au dossier de la matière (les
+    chemins absolus diffèrent entre la machine de build et les serveurs), par
+    taille puis par contenu. Chaque fichier est lu au plus une fois pour tous
+    les niveaux.
+
+    Returns:
+        Dict[str, Dict]: Par niveau, {'status': 'ok' | 'stale' | 'missing', 'chunks', 'changed', 'removed'}
+    """
+    matiere_dir = corpus_dir / matiere
+    files = {
+        path.relative_to(matiere_dir).as_posix(): path
+        for path in (discover_corpus_files(matiere_dir) if matiere_dir.exists() else [])
+    }
+    on_disk = set(files)
+    sizes = {relative: path.stat().st_size for relative, path in files.items()}
+    hashes: Dict[str, str] = {}
+
+    statuses = {}
+    for niveau in niveaux:
+        key = CorpusManifest.key(matiere, niveau)
+        if not manifest.has(key):
+            statuses[niveau] = {
+                'status': 'missing' if files else 'ok', 'chunks': 0, 'changed': len(files), 'removed': 0
+            }
+            continue
+
+        tracked = {
+            _relative_source(source, matiere, on_disk): entry
+            for source, entry in manifest.files(key).items()
+        }
+        changed = 0
+        for relative, path in files.items():
+            entry = tracked.get(relative)
+            if entry is None or entry['size'] != sizes[relative]:
+                changed += 1
+                continue
+            if relative not in hashes:
+                hashes[relative] = file_content_hash(path)
+            if entry['sha256'] != hashes[relative]:
+                changed += 1
+        removed = len(set(tracked) - on_disk)
+        statuses[niveau] = {
+            'status': 'stale' if changed or removed else 'ok',
+            'chunks': len(manifest.chunk_ids(key)),
+            'changed': changed,
+            'removed': removed
+        }
+    return statuses
@@ -0,0 +1,225 @@
+"""
+Instantanés versionnés de l'index FAISS: publication atomique, manifeste et rétention
+"""
+import os
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+
+from utils.file_lock import FileLock, file_signature
+from utils.ingestion import file_content_hash
+
+
+def fsync_dir(directory: Path):
+    """Rend durable un renommage dans ce dossier (sans effet sous Windows)"""
+    if os.name != "posix":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def mmap_flags(index_type: str) -> int:
+    """
+    Drapeaux de lecture FAISS pour mapper un index en mémoire
+
+    Les listes IVF sont mappées par IO_FLAG_MMAP; les codes des index flat,
+    HNSW et compressés par IO_FLAG_MMAP_IFC (FAISS >= 1.11, sinon lus en RAM).
+    """
+    if index_type in ("ivf_flat", "ivf_pq"):
+        return faiss.IO_FLAG_MMAP
+    return getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+
+
+class SnapshotStore:
+    """
+    Instantanés immuables de l'index dans un dossier dédié
+
+      - faiss_index.<génération>.bin : un fichier par génération publiée
+      - manifest.json : générations disponibles (taille, SHA-256, nombre de
+        vecteurs...), la dernière étant la génération courante
+
+    Une génération est écrite dans un fichier temporaire, synchronisée sur le
+    disque puis renommée; le manifeste est remplacé de la même façon. Un arrêt
+    brutal laisse donc toujours la génération précédente intacte et lisible.
+    Les publications de plusieurs processus sont sérialisées par un verrou de
+    fichier (.lock); les lecteurs n'en prennent aucun.
+    """
+
+    def __init__(self, directory: Path, retention: int = 3, lock_timeout: Optional[float] = None):
+        """
+        Args:
+            directory: Dossier des instantanés (créé si besoin)
+            retention: Nombre de générations conservées
+            lock_timeout: Attente maximale du verrou de publication (secondes, None = illimitée)
+        """
+        self.directory = directory
+        self.retention = max(1, retention)
+        self.manifest_file = directory / "manifest.json"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.lock = FileLock(directory / ".lock", lock_timeout)
+
+    def _read_manifest(self) -> Dict:
+        """Contenu du manifeste (vide s'il est absent ou illisible)"""
+        if not self.manifest_file.exists():
+            return {}
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Manifeste des instantanés illisible: {e}")
+            return {}
+
+    def signature(self) -> Optional[Tuple[int, int, int]]:
+        """Identité du manifeste, changée par chaque publication (un seul stat)"""
+        return file_signature(self.manifest_file)
+
+    def state(self) -> Tuple[Optional[Tuple[int, int, int]], int]:
+        """Identité du manifeste et numéro de la dernière génération publiée, lus ensemble"""
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                stat = os.fstat(f.fileno())
+                generation = json.load(f).get('generation', 0)
+        except (OSError, ValueError):
+            return None, 0
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size), generation
+
+    def entries(self) -> List[Dict]:
+        """Générations publiées, de la plus ancienne à la plus récente"""
+        return self._read_manifest().get('snapshots', [])
+
+    def latest(self) -> Optional[Dict]:
+        """Génération courante, ou None"""
+        entries = self.entries()
+        return entries[-1] if entries else None
+
+    def path(self, entry: Dict) -> Path:
+        """Fichier d'une génération"""
+        return self.directory / entry['file']
+
+    def publish(self, index: faiss.Index, info: Dict) -> Dict:
+        """
+        Publie une nouvelle génération de l'index
+
+        Args:
+            index: Index à écrire
+            info: Informations ajoutées à l'entrée du manifeste (type d'index...)
+
+        Returns:
+            Dict: Entrée du manifeste de la génération publiée
+        """
+        with self.lock:
+            return self._publish(index, info)
+
+    def _publish(self, index: faiss.Index, info: Dict) -> Dict:
+        manifest = self._read_manifest()
+        entries = manifest.get('snapshots', [])
+        # Les numéros ne sont jamais réutilisés, même après clear()
+        generation = manifest.get('generation', 0) + 1
+        final = self.directory / f"faiss_index.{generation:06d}.bin"
+        tmp = self.directory / f".{final.name}.tmp"
+
+        faiss.write_index(index, str(tmp))
+        with open(tmp, 'rb') as f:
+            os.fsync(f.fileno())
+        entry = {
+            **info,
+            'generation': generation,
+            'file': final.name,
+            'size': tmp.stat().st_size,
+            'sha256': file_content_hash(tmp),
+            'ntotal': index.ntotal,
+            'timestamp': datetime.now().isoformat()
+        }
+        os.replace(tmp, final)
+
+        entries.append(entry)
+        kept, dropped = entries[-self.retention:], entries[:-self.retention]
+        self._write_manifest(kept, generation)
+        fsync_dir(self.directory)
+
+        for old in dropped:
+            try:
+                self.path(old).unlink()
+            except OSError:
+                # Encore mappé par un autre processus (Windows): retiré à la prochaine publication
+                pass
+        self._remove_strays(kept)
+        return entry
+
+    def _write_manifest(self, entries: List[Dict], generation: int):
+        """Remplace atomiquement le manifeste"""
+        tmp = self.manifest_file.with_suffix(".tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'generation': generation, 'snapshots': entries}, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.manifest_file)
+
+    def _remove_strays(self, kept: List[Dict]):
+        """Supprime les fichiers temporaires et générations absentes du manifeste"""
+        names = {entry['file'] for entry in kept} | {self.manifest_file.name, self.lock.path.name}
+        for path in self.directory.iterdir():
+            if path.name not in names:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def verify(self, entry: Dict) -> bool:
+        """Vérifie la présence, la taille et la somme SHA-256 d'une génération"""
+        path = self.path(entry)
+        if not path.exists() or path.stat().st_size != entry['size']:
+            return False
+        return file_content_hash(path) == entry['sha256']
+
+    def load(self, mmap: bool = True, verify: bool = True) -> Optional[Tuple[faiss.Index, Dict]]:
+        """
+        Charge la génération valide la plus récente
+
+        Une génération corrompue ou incomplète est signalée et la précédente
+        est essayée.
+
+        Args:
+            mmap: Mapper l'index en mémoire (partagé entre processus via le cache de pages)
+            verify: Vérifier la somme SHA-256 (lecture complète du fichier); inutile
+                pour une génération que l'on vient de voir publier
+
+        Returns:
+            Optional[Tuple[faiss.Index, Dict]]: Index et entrée du manifeste, ou None
+        """
+        for entry in reversed(self.entries()):
+            if verify and not self.verify(entry):
+                print(f"⚠️ Instantané {entry['file']} corrompu ou incomplet, génération précédente")
+                continue
+            flags = mmap_flags(entry.get('index_type', 'flat')) if mmap else 0
+            try:
+                return faiss.read_index(str(self.path(entry)), flags), entry
+            except RuntimeError as e:
+                print(f"⚠️ Lecture de l'instantané {entry['file']} impossible: {e}")
+        return None
+
+    def prune(self, keep: int = 1):
+        """Supprime les générations les plus anciennes pour n'en garder que `keep`"""
+        with self.lock:
+            entries = self.entries()
+            kept = entries[-max(1, keep):]
+            if len(kept) == len(entries):
+                return
+            self._write_manifest(kept, self._read_manifest().get('generation', 0))
+            fsync_dir(self.directory)
+            self._remove_strays(kept)
+
+    def clear(self):
+        """
+        Supprime tous les instantanés (le compteur de générations avance: les
+        autres processus voient un index vide publié)
+        """
+        with self.lock:
+            self._write_manifest([], self._read_manifest().get('generation', 0) + 1)
+            self._remove_strays([])
@@ -2,128 +2,734 @@
 Gestion du Vector Store pour la recherche de similarité avec FAISS
 """
 import os
+import atexit
+import threading
+from collections import deque
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, NamedTuple, Tuple, Optional
 import numpy as np
-import json
-import hashlib
 from datetime import datetime
 
 # FAISS pour la recherche vectorielle
 import faiss
-from sentence_transformers import SentenceTransformer
-# Chargement de documents
-from langchain_community.document_loaders import PyPDFLoader, TextLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-from config import CORPUS_DIR, VECTORSTORE_DIR, EMBEDDING_MODEL, SUPPORTED_SUBJECTS
+from config import (
+    CORPUS_DIR, VECTORSTORE_DIR, EMBEDDING_MODEL, EMBEDDING_BACKEND, EMBEDDING_COSINE_TOLERANCE, SUPPORTED_SUBJECTS,
+    EMBEDDING_CACHE_FLUSH_EVERY, EMBEDDING_CACHE_DTYPE, EMBEDDING_CACHE_MAX_ENTRIES, EMBEDDING_CACHE_POLICY, EMBEDDING_BATCH_SIZE, VECTORSTORE_INDEX,
+    EDUCATION_LEVELS, QUERY_CACHE_SIZE, HYBRID_SEARCH, NEAR_DUPLICATES, CORPUS_PARSE_WORKERS, INGEST_BATCH_SIZE, SNAPSHOT_RETENTION, VECTORSTORE_MMAP,
+    VECTORSTORE_RELEASES_DIR, VECTORSTORE_PREBUILT, RELEASE_RETENTION, VECTORSTORE_SERVICE, SNAPSHOT_WRITE_BEHIND,
+    VECTORSTORE_LOCK_TIMEOUT, SIMILARITY_THRESHOLD
+)
+from utils import index_factory, lexical, near_duplicates
+from utils.compaction import migrate_metadata_json
+from utils.embedding_backends import create_embedding_model
+from utils.embedding_cache import EmbeddingCache, cache_path, text_hash
+from utils.file_lock import FileLock, LockTimeout, file_signature
+from utils.ingestion import CorpusManifest, discover_corpus_files, parse_corpus_files, source_id
+from utils.metadata_store import MetadataStore
+from utils.query_cache import QueryCache
+from utils.releases import ReleaseStore, artifact_status
+from utils.snapshots import SnapshotStore
+from utils.write_behind import WriteBehind
+
+
+class IndexGeneration(NamedTuple):
+    """Génération publiée de l'index: jamais modifiée, lue sans verrou par les recherches"""
+    index: faiss.Index
+    generation: int
+    # Instantané mappé en mémoire dont l'index lit ses vecteurs (lecture seule)
+    mapped_snapshot: Optional[Path] = None
+    # Fiches acquittées pas encore fusionnées dans l'index (petit index flat, voir add_validated_fiches)
+    delta: Optional[faiss.Index] = None
 
 
 class VectorStoreManager:
-    """Gestionnaire du Vector Store avec FAISS et cache"""
+    """
+    Gestionnaire du Vector Store avec FAISS et cache
+    
+    Les recherches ne prennent aucun verrou: elles lisent la dernière
+    génération publiée de l'index. Les écritures sont sérialisées et portent
+    sur un brouillon (copie de l'index à la première modification), publié
+    en une seule affectation à la fin de l'écriture (voir _writing).
+    """
     
-    def __init__(self, dimension: int = 384):
+    def __init__(
+        self,
+        dimension: int = 384,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+        index_config: Optional[Dict] = None,
+        parse_workers: int = CORPUS_PARSE_WORKERS,
+        ingest_batch_size: int = INGEST_BATCH_SIZE,
+        embedding_backend: str = EMBEDDING_BACKEND,
+        directory: Optional[Path] = None,
+        read_only: bool = False,
+        corpus_dir: Optional[Path] = None
+    ):
         """
         Initialise le vector store avec FAISS
         
         Args:
             dimension: Dimension des embeddings (384 pour MiniLM)
+            batch_size: Taille des lots envoyés au modèle d'embedding
+            index_config: Surcharge de VECTORSTORE_INDEX (type d'index, nprobe, efSearch...)
+            parse_workers: Processus de parsing du corpus (1 = séquentiel)
+            ingest_batch_size: Chunks encodés et ajoutés à l'index par lot lors de l'ingestion
+            embedding_backend: Backend d'inférence du modèle ("torch", "torch_int8", "onnx", "onnx_int8")
+            directory: Dossier du vector store (défaut: VECTORSTORE_DIR, créé si besoin)
+            read_only: Artefact prébuilt (voir open_prebuilt_vectorstore): aucune écriture,
+                load_corpus() n'ingère pas et signale les corpus absents ou périmés
+            corpus_dir: Dossier du corpus (défaut: CORPUS_DIR)
+        
+        Raises:
+            FileNotFoundError: Dossier d'un artefact en lecture seule absent
         """
         print("🔧 Initialisation du Vector Store avec FAISS")
         
-        # Modèle d'embedding
-        self.embedding_model = SentenceTransformer(EMBEDDING_MODEL)
+        # Verrou des écritures (instance partagée entre sessions); les lectures n'en prennent pas
+        self._lock = threading.RLock()
+        self._writer: Optional[int] = None
+        self._draft: Optional[faiss.Index] = None
+        self._draft_delta: Optional[faiss.Index] = None
+        # Publication des instantanés (écrivain ou sauvegarde différée)
+        self._snapshot_lock = threading.Lock()
+        
+        self.directory = directory or VECTORSTORE_DIR
+        self.read_only = read_only
+        if read_only and not self.directory.is_dir():
+            raise FileNotFoundError(
+                f"Artefact prébuilt introuvable: {self.directory} (relancer `python vectorstore_cli.py build`)"
+            )
+        if not read_only:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self.corpus_dir = corpus_dir or CORPUS_DIR
+        # État des artefacts prébuilt par (matière, niveau), calculé au premier accès
+        self._artifact_status: Dict[str, Dict] = {}
+        # Corpus trouvés à jour par (matière, niveau): (état du vector store, nombre de chunks)
+        self._corpus_checked: Dict[str, Tuple[Tuple, int]] = {}
+        
+        # Modèle d'embedding (backend optimisé validé contre la référence PyTorch)
+        self.embedding_backend = embedding_backend
+        self.embedding_model = create_embedding_model(
+            embedding_backend, EMBEDDING_MODEL, VECTORSTORE_DIR / "models", EMBEDDING_COSINE_TOLERANCE
+        )
         self.dimension = dimension
+        self.batch_size = batch_size
+        self.parse_workers = parse_workers
+        self.ingest_batch_size = ingest_batch_size
         
         # Index FAISS (L2 distance - cosine similarity via normalisation)
-        self.index = faiss.IndexFlatL2(dimension)
+        # Type configurable: flat (exact) ou IVF / HNSW (approchés)
+        self.index_config = {**VECTORSTORE_INDEX, **(index_config or {})}
+        self._state = IndexGeneration(self._new_index(), 0)
+        
+        # Chunks et métadonnées dans SQLite, par étiquette FAISS (int64):
+        # filtres poussés en SQL, texte lu seulement pour les résultats
+        self.store = MetadataStore(self.directory / "metadata.sqlite3", read_only=read_only)
+        self._next_label = 0
+        
+        # Cache binaire borné pour éviter de recalculer les mêmes embeddings, un par modèle
+        # (en lecture seule: cache des requêtes dans VECTORSTORE_DIR, hors artefact)
+        self.cache_path = cache_path(VECTORSTORE_DIR if read_only else self.directory, EMBEDDING_MODEL, dimension)
+        self.cache = self._open_cache()
+        # Vecteurs des chunks remplacés pendant une ingestion, par hash de texte (voir _indexed_vectors)
+        self._known_vectors: Dict[str, np.ndarray] = {}
+        # Hash des fiches dont l'embedding reste en cache jusqu'à leur sauvegarde dans l'index
+        self._pending_hashes: List[str] = []
         
-        # Stockage des documents et métadonnées
-        self.documents: List[str] = []
-        self.metadatas: List[Dict] = []
-        self.document_ids: List[str] = []
+        # Instantanés versionnés de l'index FAISS (publication atomique, mappés en mémoire au chargement)
+        self.snapshots = SnapshotStore(self.directory / "snapshots", SNAPSHOT_RETENTION, VECTORSTORE_LOCK_TIMEOUT)
+        # Plusieurs processus sur le même dossier: un seul écrivain à la fois, qui rattrape
+        # d'abord les générations publiées par les autres (voir _catch_up)
+        self.writer_lock = None if read_only else FileLock(self.directory / "writer.lock", VECTORSTORE_LOCK_TIMEOUT)
+        # Manifeste des instantanés tel que chargé, dernière génération publiée connue et
+        # étiquettes déjà publiées (les suivantes ne sont que dans ce processus)
+        self._snapshot_signature, self._disk_generation = self.snapshots.state()
+        self._published_label = 0
+        # Dernier index publié par ce processus (déjà sur le disque)
+        self._saved_index: Optional[faiss.Index] = None
+        # Instantané mappé du brouillon de l'écrivain (copié en RAM avant toute modification)
+        self._mapped_snapshot: Optional[Path] = None
+        # Ancien fichier unique de l'index, remplacé par les instantanés
+        self.index_file = self.directory / "faiss_index.bin"
+        # Ancien fichier de métadonnées, importé dans SQLite au premier chargement
+        self.metadata_file = self.directory / "metadata.json"
         
-        # Cache pour éviter de recalculer les mêmes embeddings
-        self.cache_file = VECTORSTORE_DIR / "embeddings_cache.json"
-        self.cache = self._load_cache()
+        # Cache LRU des résultats de recherche, invalidé à chaque modification
+        # de l'index (génération publiée incrémentée)
+        self.query_cache = QueryCache(QUERY_CACHE_SIZE)
         
-        # Fichier de sauvegarde de l'index FAISS
-        self.index_file = VECTORSTORE_DIR / "faiss_index.bin"
-        self.metadata_file = VECTORSTORE_DIR / "metadata.json"
+        # Fusion des quasi-doublons à l'ingestion du corpus (signatures MinHash dans SQLite)
+        self.near_duplicates_config = dict(NEAR_DUPLICATES)
+        self.minhasher = near_duplicates.MinHasher(
+            self.near_duplicates_config['num_perm'],
+            self.near_duplicates_config['bands'],
+            self.near_duplicates_config['shingle_size']
+        )
+        
+        # Recherche hybride BM25 + dense (index inversé FTS5 tenu à jour par la base des chunks)
+        self.hybrid_config = dict(HYBRID_SEARCH)
+        self.hybrid_stats = {'lexical': 0, 'fused': 0}
+        
+        # Manifeste d'ingestion incrémentale du corpus
+        self.manifest = CorpusManifest(self.directory / "corpus_manifest.json")
+        self._manifest_signature = file_signature(self.manifest.path)
         
         # Charge l'index existant s'il existe
-        self._load_existing_index()
+        with self._writing():
+            self._load_existing_index()
+        
+        # Fiches validées acquittées dès leur écriture dans la base des chunks; index fusionné
+        # et sauvegardé en arrière-plan (voir SNAPSHOT_WRITE_BEHIND), comme après add_documents,
+        # upsert et delete: l'instantané publié rend ces écritures visibles aux autres processus
+        self.write_behind = None if read_only else WriteBehind(
+            self._save_pending, SNAPSHOT_WRITE_BEHIND['max_pending'], SNAPSHOT_WRITE_BEHIND['interval_s'],
+            "vectorstore-snapshots"
+        )
+    
+    @property
+    def index(self) -> faiss.Index:
+        """Index vu par le thread courant: brouillon pour l'écrivain, dernière génération publiée sinon"""
+        if self._writer == threading.get_ident():
+            return self._draft
+        return self._state.index
     
-    def _load_cache(self) -> Dict:
-        """Charge le cache des embeddings depuis le disque"""
-        if self.cache_file.exists():
+    @index.setter
+    def index(self, index: faiss.Index):
+        if self._writer != threading.get_ident():
+            raise RuntimeError("L'index ne peut être remplacé que dans une écriture (_writing)")
+        self._draft = index
+    
+    @property
+    def _generation(self) -> int:
+        """Numéro de la génération publiée"""
+        return self._state.generation
+    
+    @contextmanager
+    def _writing(self, keep_delta: bool = False, timeout: Optional[float] = -1):
+        """
+        Écriture sérialisée (réentrante) avec publication par copie à l'écriture
+        
+        Entre processus, l'écriture prend le verrou des écrivains puis rattrape
+        les générations publiées par les autres (_catch_up).
+        
+        L'écrivain travaille sur un brouillon: la génération publiée tant qu'il
+        ne la modifie pas, une copie privée dès la première modification
+        (_ensure_writable). En sortie, le brouillon est publié comme nouvelle
+        génération par une seule affectation: une recherche voit l'ancienne ou
+        la nouvelle génération, jamais un index en cours de modification. Une
+        écriture sans effet (ni index, ni fiches en attente, ni base des chunks
+        modifiés) ne publie rien: le cache des requêtes reste valide. Les
+        chunks sont écrits dans SQLite avant la publication et leurs étiquettes
+        ne sont jamais réutilisées: un résultat ne peut pas désigner le texte
+        d'un autre chunk.
+        
+        Args:
+            keep_delta: Ne pas fusionner d'abord les fiches en attente dans
+                l'index (écritures qui ne portent que sur l'index delta)
+            timeout: Attente maximale du verrou des écrivains (secondes,
+                défaut: VECTORSTORE_LOCK_TIMEOUT)
+        
+        Raises:
+            LockTimeout: Un autre processus écrit depuis plus de `timeout` secondes
+        """
+        with self._lock:
+            if self._writer is not None:
+                if not keep_delta:
+                    self._fold_delta()
+                yield
+                return
+            if self.writer_lock is not None:
+                self.writer_lock.acquire(timeout)
             try:
-                with open(self.cache_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                print(f" Erreur lors du chargement du cache: {e}")
-        return {}
-    
-    def _save_cache(self):
-        """Sauvegarde le cache des embeddings sur le disque"""
+                published = self._state
+                self._draft, self._mapped_snapshot = published.index, published.mapped_snapshot
+                self._draft_delta = published.delta
+                self._writer = threading.get_ident()
+                next_label = self._next_label
+                store, changes = self.store, self.store.changes
+                try:
+                    self._catch_up()
+                    if not keep_delta:
+                        self._fold_delta()
+                    yield
+                finally:
+                    # Même interrompue, l'écriture publie les modifications déjà faites (déjà dans SQLite)
+                    self._writer = None
+                    if (self._draft is not published.index or self._draft_delta is not published.delta
+                            or self.store is not store or self.store.changes != changes):
+                        self._state = IndexGeneration(
+                            self._draft, published.generation + 1, self._mapped_snapshot, self._draft_delta
+                        )
+                    self._draft, self._draft_delta = None, None
+                    if self.writer_lock is not None and self._next_label > next_label:
+                        # Étiquettes jamais réutilisées, même par un autre processus
+                        self.store.set_meta('next_label', self._next_label)
+            finally:
+                if self.writer_lock is not None:
+                    self.writer_lock.release()
+    
+    def _catch_up(self):
+        """
+        Rattrape les écritures des autres processus (début d'écriture, verrou des écrivains tenu)
+        
+        Un stat du manifeste des instantanés suffit quand rien n'a changé.
+        Sinon la dernière génération publiée est rechargée (mappée en mémoire)
+        et resynchronisée avec la base des chunks: les vecteurs de ce
+        processus pas encore publiés sont repris de l'index en mémoire.
+        """
+        if self.writer_lock is None:
+            return
+        self._next_label = max(self._next_label, self.store.get_meta('next_label', 0), self.store.max_label() + 1)
+        signature = file_signature(self.manifest.path)
+        if signature != self._manifest_signature:
+            self.manifest = CorpusManifest(self.manifest.path)
+            self._manifest_signature = signature
+        
+        if self.snapshots.signature() == self._snapshot_signature:
+            return
+        signature, generation = self.snapshots.state()
+        if generation == self._disk_generation:
+            # Manifeste réécrit sans nouvelle génération (élagage)
+            self._snapshot_signature = signature
+            return
+        
+        print(f"🔄 Génération {generation} publiée par un autre processus: rechargement de l'index")
+        labels = index_factory.stored_labels(self.index)
+        self._known_vectors = self._indexed_vectors(labels[labels >= self._published_label].tolist())
         try:
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(self.cache, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f" Erreur lors de la sauvegarde du cache: {e}")
-
-    def _load_existing_index(self):
-        """Charge un index FAISS existant depuis le disque"""
-        if self.index_file.exists() and self.metadata_file.exists():
-            try:
-                # Charge l'index FAISS
+            self._reset_state()
+            # Génération publiée complète (écrite puis renommée): la relire pour sa somme SHA-256 est inutile
+            self._load_existing_index(verify=False)
+        finally:
+            self._known_vectors = {}
+    
+    def _refresh(self):
+        """
+        Recharge l'index si un autre processus en a publié un plus récent (un stat par appel)
+        
+        Sans attendre: si un écrivain est en cours (dans ce processus ou un
+        autre), la génération courante reste servie et il rattrapera lui-même
+        la dernière publiée.
+        """
+        if self.writer_lock is None or self.snapshots.signature() == self._snapshot_signature:
+            return
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            with self._writing(keep_delta=True, timeout=0):
+                pass
+        except LockTimeout:
+            pass
+        finally:
+            self._lock.release()
+    
+    def warmup(self):
+        """Précharge le modèle d'embedding (première inférence) sans toucher au cache"""
+        self.embedding_model.encode("warmup")
+    
+    def _reset_state(self):
+        """Vide l'index en mémoire (appelé dans une écriture)"""
+        self.index = self._new_index()
+        self._mapped_snapshot = None
+        self._draft_delta = None
+        self._next_label = 0
+    
+    def reload(self):
+        """Recharge le cache, la base des chunks et l'index depuis le disque sans recharger le modèle"""
+        # Fiches en attente déjà dans la base des chunks: rejouées par _reconcile
+        with self._writing(keep_delta=True):
+            self._reset_state()
+            old_cache, old_store = self.cache, self.store
+            self.cache = self._open_cache()
+            self.store = MetadataStore(old_store.path, read_only=self.read_only)
+            old_cache.close()
+            old_store.close()
+            self.manifest = CorpusManifest(self.manifest.path)
+            self._artifact_status = {}
+            self._load_existing_index()
+    
+    def _open_cache(self) -> EmbeddingCache:
+        """Ouvre le cache des embeddings (borné à EMBEDDING_CACHE_MAX_ENTRIES vecteurs)"""
+        return EmbeddingCache(
+            self.cache_path, self.dimension,
+            flush_every=EMBEDDING_CACHE_FLUSH_EVERY, dtype=EMBEDDING_CACHE_DTYPE,
+            max_entries=EMBEDDING_CACHE_MAX_ENTRIES, policy=EMBEDDING_CACHE_POLICY,
+            lock_timeout=VECTORSTORE_LOCK_TIMEOUT
+        )
+    
+    def close(self):
+        """Sauvegarde les fiches en attente puis libère l'index, le cache et la connexion SQLite"""
+        if self.write_behind is not None:
+            self.write_behind.close()
+        with self._writing(keep_delta=True):
+            self._reset_state()
+            self.cache.close()
+            self.store.close()
+    
+    def _load_existing_index(self, verify: bool = True):
+        """
+        Charge l'index FAISS existant et le resynchronise avec la base des chunks (appelé dans une écriture)
+        
+        Args:
+            verify: Vérifier la somme SHA-256 de l'instantané (pas pour un simple rattrapage)
+        """
+        try:
+            # Lu avant l'instantané: une publication concurrente sera vue comme plus récente
+            self._snapshot_signature, self._disk_generation = self.snapshots.state()
+            loaded = self.snapshots.load(mmap=VECTORSTORE_MMAP, verify=verify)
+            if loaded is not None:
+                self.index, entry = loaded
+                self._mapped_snapshot = self.snapshots.path(entry) if VECTORSTORE_MMAP else None
+                index_factory.apply_search_params(self.index, self.index_config)
+                print(f"📸 Instantané génération {entry['generation']} ({entry['timestamp']})")
+            elif self.index_file.exists():
                 self.index = faiss.read_index(str(self.index_file))
+                index_factory.apply_search_params(self.index, self.index_config)
+            
+            self._next_label = max(self.store.get_meta('next_label', 0), self.store.max_label() + 1)
+            if self.read_only:
+                self._check_release()
+            else:
+                if self.metadata_file.exists():
+                    self._migrate_metadata_json()
                 
-                # Charge les métadonnées
-                with open(self.metadata_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.documents = data.get('documents', [])
-                    self.metadatas = data.get('metadatas', [])
-                    self.document_ids = data.get('document_ids', [])
-                
-                print(f"✅ Index FAISS chargé: {len(self.documents)} documents")
+                # Signatures MinHash calculées avec d'autres paramètres: incomparables, oubliées
+                params = self.store.get_meta('minhash')
+                if params is not None and params != self.minhasher.params:
+                    print("⚠️ Paramètres MinHash modifiés: signatures des quasi-doublons oubliées")
+                    self.store.clear_signatures()
+                self.store.set_meta('minhash', self.minhasher.params)
                 
-            except Exception as e:
-                print(f"⚠️ Erreur lors du chargement de l'index: {e}")
-                # Réinitialise en cas d'erreur
-                self.index = faiss.IndexFlatL2(self.dimension)
-                self.documents = []
-                self.metadatas = []
-                self.document_ids = []
+                self._next_label = max(self.store.get_meta('next_label', 0), self.store.max_label() + 1)
+                self._published_label = self._next_label
+                self._reconcile()
+            
+            if self.index.ntotal:
+                print(f"✅ Index FAISS chargé: {self.index.ntotal} documents "
+                      f"({index_factory.describe(self.index)})")
+                self._check_index_type()
+            else:
+                print("📭 Aucun index existant trouvé, création d'un nouvel index")
+            
+        except Exception as e:
+            print(f"⚠️ Erreur lors du chargement de l'index: {e}")
+            # Réinitialise en cas d'erreur
+            self._reset_state()
+    
+    def _check_release(self):
+        """Vérifie qu'un artefact prébuilt est cohérent et signale les corpus absents ou périmés"""
+        stored = self.store.vector_labels()
+        indexed = index_factory.stored_labels(self.index)
+        if len(stored) != len(indexed) or not np.array_equal(stored, np.sort(indexed)):
+            print(f"⚠️ Artefact incohérent: {len(indexed)} vecteurs pour {len(stored)} chunks, "
+                  f"relancer `python vectorstore_cli.py build`")
+        for matiere in SUPPORTED_SUBJECTS:
+            for niveau in EDUCATION_LEVELS:
+                self._release_status(matiere, niveau)
+    
+    def _release_status(self, matiere: str, niveau: str) -> Dict:
+        """État (mis en cache) de l'artefact d'une matière et d'un niveau, signalé au premier calcul"""
+        key = CorpusManifest.key(matiere, niveau)
+        status = self._artifact_status.get(key)
+        if status is None:
+            # Tous les niveaux de la matière d'un coup: chaque fichier n'est lu qu'une fois
+            niveaux = [level for level in dict.fromkeys([niveau, *EDUCATION_LEVELS])
+                       if CorpusManifest.key(matiere, level) not in self._artifact_status]
+            for level, computed in artifact_status(self.manifest, self.corpus_dir, matiere, niveaux).items():
+                self._artifact_status[CorpusManifest.key(matiere, level)] = computed
+                if computed['status'] == 'missing':
+                    print(f"⚠️ Artefact sans corpus {matiere} - {level} ({computed['changed']} fichier(s) "
+                          f"sur le disque): relancer `python vectorstore_cli.py build`")
+                elif computed['status'] == 'stale':
+                    print(f"⚠️ Artefact périmé pour {matiere} - {level}: {computed['changed']} fichier(s) "
+                          f"nouveau(x) ou modifié(s), {computed['removed']} supprimé(s): "
+                          f"relancer `python vectorstore_cli.py build`")
+            status = self._artifact_status[key]
+        return status
+    
+    def _check_writable(self):
+        """Refuse toute modification d'un artefact prébuilt"""
+        if self.read_only:
+            raise RuntimeError(
+                f"Vector store en lecture seule (artefact prébuilt {self.directory}): "
+                f"reconstruire avec `python vectorstore_cli.py build`"
+            )
+    
+    def _migrate_metadata_json(self):
+        """
+        Importe l'ancien metadata.json dans SQLite une seule fois, puis le supprime
+        
+        Un ancien index positionnel (ligne i = i-ème document) est converti en
+        index adressé par étiquettes, en ne gardant que la dernière occurrence
+        de chaque ID de document.
+        """
+        migrated = migrate_metadata_json(self.metadata_file, self.store, self.index)
+        if migrated is not None:
+            labels, vectors = migrated
+            self._next_label = len(labels)
+            self.index = self._new_index()
+            if len(labels):
+                self._rebuild(labels, vectors)
+            self._save_index()
+        
+        self.metadata_file.unlink()
+    
+    def _reconcile(self):
+        """
+        Aligne l'index FAISS sur la base des chunks (source de vérité)
+        
+        Après un arrêt entre l'écriture SQLite et la sauvegarde de l'index, les
+        chunks absents de l'index sont ré-encodés (fiches en attente: depuis
+        le cache) et les vecteurs orphelins retirés.
+        """
+        stored = self.store.vector_labels()
+        indexed = index_factory.stored_labels(self.index)
+        if len(stored) == len(indexed) and np.array_equal(stored, np.sort(indexed)):
+            return
+        
+        missing = np.setdiff1d(stored, indexed)
+        orphans = np.setdiff1d(indexed, stored)
+        self._ensure_writable()
+        
+        if len(missing):
+            chunks = list(self.store.iter_chunks(missing.tolist()))
+            embeddings = self._get_embeddings_batch(
+                [content for _, _, content, _ in chunks], cache=self._cache_chunks()
+            )
+            self.cache.flush()
+            self.index.add_with_ids(embeddings, np.array([label for label, *_ in chunks], dtype='int64'))
+        if len(orphans):
+            if index_factory.supports_remove(self.index):
+                self.index.remove_ids(orphans)
+            else:
+                self._rebuild_all()
+        self._maybe_train()
+        
+        print(f"🔧 Index resynchronisé avec la base: +{len(missing)} / -{len(orphans)} vecteurs")
+        self._save_index()
+    
+    def _new_index(self, vectors: Optional[np.ndarray] = None) -> faiss.Index:
+        """
+        Index vide du type configuré (entraîné sur `vectors` si nécessaire)
+        
+        Une projection PCA sous laquelle une fiche identique ne serait plus
+        retrouvée au-dessus de SIMILARITY_THRESHOLD est refusée pour de bon:
+        pca_dim est remis à 0 (sinon l'entraînement serait retenté à chaque ajout).
+        """
+        index = index_factory.build_index(self.dimension, self.index_config, vectors, SIMILARITY_THRESHOLD)
+        if self.index_config['pca_dim'] and not index_factory.projected_dimension(index) and \
+                vectors is not None and len(vectors) >= index_factory.min_training_size(self.index_config):
+            self.index_config = {**self.index_config, 'pca_dim': 0}
+        return index
+    
+    def _check_index_type(self):
+        """Signale un index sur disque d'un autre type (ou d'une autre projection) que celui configuré"""
+        if index_factory.matches_config(self.index, self.index_config):
+            return
+        if self._is_provisional() and self.index.ntotal < index_factory.min_training_size(self.index_config):
+            # Index flat provisoire, en attente d'assez de vecteurs pour l'entraînement
+            return
+        print(f"⚠️ Index sur disque de type '{index_factory.describe(self.index)}', "
+              f"configuré '{index_factory.describe_config(self.index_config)}': "
+              f"appeler rebuild_index() pour le convertir")
+    
+    def _is_provisional(self) -> bool:
+        """Index flat pleine dimension: provisoire tant que le type configuré n'a pas pu être entraîné"""
+        return index_factory.index_kind(self.index) == "flat" and not index_factory.projected_dimension(self.index)
+    
+    def _maybe_train(self):
+        """Remplace l'index flat provisoire par l'index approché dès qu'il peut être entraîné"""
+        if not index_factory.needs_training(self.index_config):
+            return
+        if not self._is_provisional():
+            return
+        if self.index.ntotal < index_factory.min_training_size(self.index_config):
+            return
+        print(f"🎯 Entraînement de l'index {index_factory.describe_config(self.index_config)} "
+              f"sur {self.index.ntotal} vecteurs")
+        self._rebuild_all()
+    
+    def _rebuild(self, labels: np.ndarray, vectors: np.ndarray):
+        """Reconstruit l'index du type configuré à partir de ces vecteurs (mêmes étiquettes)"""
+        index = self._new_index(vectors)
+        if len(vectors):
+            index.add_with_ids(vectors, labels)
+        self.index = index
+        self._mapped_snapshot = None
+    
+    def _rebuild_all(self, exact: bool = False):
+        """
+        Reconstruit l'index du type configuré avec tous les documents actuels
+        
+        Args:
+            exact: Index actuel compressé ou projeté: vecteurs exacts repris du cache,
+                sinon ré-encodés depuis les textes (au lieu des vecteurs approchés de l'index)
+        """
+        labels = self.store.vector_labels()
+        if exact and self._cache_chunks():
+            texts = {label: content for label, _, content, _ in self.store.iter_chunks(labels.tolist())}
+            print(f"🧮 Vecteurs exacts de {len(labels)} chunks (cache, sinon ré-encodage)")
+            vectors = self._get_embeddings_batch([texts[label] for label in labels.tolist()], cache=False)
         else:
-            print("📭 Aucun index existant trouvé, création d'un nouvel index")
+            vectors = index_factory.reconstruct(self.index, labels)
+        self._rebuild(labels, vectors)
+    
+    def rebuild_index(self, index_type: Optional[str] = None, **params):
+        """
+        Reconstruit l'index existant avec un autre type ou d'autres paramètres
+        
+        Exemple: vs.rebuild_index("hnsw", hnsw_m=32, ef_search=128), vs.rebuild_index(pca_dim=128)
+        
+        Args:
+            index_type: "flat", "ivf_flat", "ivf_pq" ou "hnsw" (défaut: type configuré)
+            **params: Autres réglages (nlist, nprobe, pq_m, hnsw_m, ef_construction, ef_search, pca_dim)
+        """
+        self._check_writable()
+        with self._writing():
+            if index_type is not None:
+                params['type'] = index_type
+            self.index_config = {**self.index_config, **params}
+            
+            before = index_factory.describe(self.index)
+            self._rebuild_all(exact=True)
+            print(f"🔁 Index reconstruit: {before} → {index_factory.describe(self.index)} "
+                  f"({self.index.ntotal} vecteurs)")
+            
+            self._save_index()
+    
+    def _ensure_writable(self):
+        """
+        Rend le brouillon de l'écrivain modifiable (appelé dans une écriture)
+        
+        Tant qu'il est la génération publiée, le brouillon est copié (les
+        recherches en cours continuent sur l'original). Les vecteurs mappés
+        sont en lecture seule (partagés entre processus): un index mappé est
+        relu depuis son instantané dans une copie privée.
+        """
+        if self._mapped_snapshot is not None:
+            self.index = faiss.read_index(str(self._mapped_snapshot))
+            index_factory.apply_search_params(self.index, self.index_config)
+            self._mapped_snapshot = None
+        elif self.index is self._state.index:
+            self.index = faiss.clone_index(self.index)
+            index_factory.apply_search_params(self.index, self.index_config)
     
     def _save_index(self):
-        """Sauvegarde l'index FAISS et les métadonnées sur le disque"""
+        """
+        Publie un nouvel instantané de l'index FAISS
+        
+        Les chunks et métadonnées sont déjà écrits dans SQLite au fil des ajouts:
+        seul l'index est écrit, dans un fichier temporaire renommé une fois
+        complet (les dernières générations restent disponibles).
+        """
         try:
-            # Sauvegarde l'index FAISS
-            faiss.write_index(self.index, str(self.index_file))
+            # Écrit les embeddings en attente
+            self.cache.flush()
             
-            # Sauvegarde les métadonnées
-            data = {
-                'documents': self.documents,
-                'metadatas': self.metadatas,
-                'document_ids': self.document_ids,
-                'timestamp': datetime.now().isoformat(),
-                'count': len(self.documents)
-            }
+            # Publie l'index FAISS
+            entry = self._publish_snapshot(self.index, self._next_label)
+            self.store.set_meta('next_label', self._next_label)
+            if entry is None:
+                return
+            if self.index_file.exists():
+                self.index_file.unlink()
             
-            with open(self.metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            
-            print(f"💾 Index sauvegardé: {len(self.documents)} documents")
+            print(f"💾 Index sauvegardé: {self.index.ntotal} documents (génération {entry['generation']})")
             
         except Exception as e:
             print(f"⚠️ Erreur lors de la sauvegarde de l'index: {e}")
     
+    def _publish_snapshot(
+        self, index: faiss.Index, next_label: int, disk_generation: Optional[int] = None
+    ) -> Optional[Dict]:
+        """
+        Écrit un instantané de cet index (une publication à la fois, tous processus confondus)
+        
+        Args:
+            index: Index à écrire
+            next_label: Prochaine étiquette de cet index (celles d'avant y sont toutes)
+            disk_generation: Génération sur le disque quand l'index a été lu
+                (sauvegarde différée, hors écriture); None: brouillon de l'écrivain
+        
+        Returns:
+            Optional[Dict]: Entrée du manifeste, None si une autre publication
+            a eu lieu depuis: l'écraser perdrait ses écritures. Les nôtres sont
+            dans la base des chunks et seront reprises par le prochain
+            rattrapage (_catch_up).
+        """
+        with self._snapshot_lock, self.snapshots.lock:
+            if disk_generation is not None and disk_generation != self._disk_generation:
+                # Index plus récent déjà publié par ce processus
+                return None
+            _, generation = self.snapshots.state()
+            if generation != self._disk_generation:
+                print(f"⚠️ Génération {generation} publiée par un autre processus: "
+                      f"sauvegarde reportée au prochain rechargement")
+                return None
+            entry = self.snapshots.publish(index, {
+                'index_type': index_factory.index_kind(index),
+                'next_label': next_label
+            })
+            self._snapshot_signature, self._disk_generation = self.snapshots.state()
+            self._published_label = entry['next_label']
+            self._saved_index = index
+            return entry
+    
+    def _fold_delta(self):
+        """Fusionne les fiches en attente (index delta) dans le brouillon de l'index (appelé dans une écriture)"""
+        delta = self._draft_delta
+        if delta is None:
+            return
+        labels = index_factory.stored_labels(delta)
+        self._ensure_writable()
+        self.index.add_with_ids(index_factory.reconstruct(delta, labels), labels)
+        self._draft_delta = None
+        self._maybe_train()
+    
+    def _save_pending(self):
+        """
+        Fusionne les fiches en attente dans l'index et publie un instantané
+        (thread de sauvegarde différée)
+        
+        Seule la fusion (copie de l'index et ajout des fiches) se fait sous le
+        verrou des écritures: l'instantané est écrit depuis la génération
+        publiée, jamais modifiée, lue avec sa prochaine étiquette et la
+        génération sur le disque sous ce même verrou. Des fiches acquittées
+        entre-temps restent dans la base des chunks et sont rejouées au
+        chargement (_reconcile).
+        """
+        with self._lock:
+            with self._writing(keep_delta=True):
+                self._fold_delta()
+                saved, self._pending_hashes = self._pending_hashes, []
+            index, next_label, disk_generation = self._state.index, self._next_label, self._disk_generation
+        self.cache.flush()
+        if index is self._saved_index:
+            # Génération déjà sur le disque (publiée par une écriture)
+            if not self._cache_chunks():
+                self.cache.discard(saved)
+            return
+        entry = self._publish_snapshot(index, next_label, disk_generation)
+        if entry is None:
+            # Vecteurs des fiches gardés en cache jusqu'à leur publication, et
+            # sauvegarde retentée au prochain déclenchement (après rattrapage)
+            self._pending_hashes.extend(saved)
+            self.write_behind.requeue(max(1, len(saved)))
+            return
+        print(f"💾 Sauvegarde différée: {index.ntotal} documents (génération {entry['generation']})")
+        if not self._cache_chunks():
+            # Fiches désormais dans l'instantané, qui restitue leurs vecteurs exacts
+            self.cache.discard(saved)
+    
+    def flush(self):
+        """Fusionne et sauvegarde sans attendre les fiches validées en attente"""
+        if self.write_behind is not None:
+            self.write_behind.flush()
+    
     def _get_text_hash(self, text: str) -> str:
         """Génère un hash MD5 du texte pour le cache"""
-        return hashlib.md5(text.encode('utf-8')).hexdigest()
+        return text_hash(text)
     
     def _get_embedding(self, text: str) -> np.ndarray:
         """
@@ -135,39 +741,79 @@ class VectorStoreManager:
         Returns:
             np.ndarray: Embedding normalisé
         """
-        text_hash = self._get_text_hash(text)
-        
-        # Vérifie le cache
-        if text_hash in self.cache:
-            embedding = np.array(self.cache[text_hash], dtype='float32')
-        else:
-            # Encode le texte
-            embedding = self.embedding_model.encode(text)
-            
-            # Normalise pour la similarité cosinus (plus pertinent avec L2)
-            embedding = embedding / np.linalg.norm(embedding)
-            
-            # Met en cache
-            self.cache[text_hash] = embedding.tolist()
-            self._save_cache()
+        # Vérifie le cache (vue sans copie sur la matrice mappée si stockée en float32)
+        embedding = self.cache.get(self._get_text_hash(text))
+        if embedding is None:
+            embedding = self._get_embeddings_batch([text])[0]
         
-        return embedding
+        return embedding.astype('float32', copy=False)
     
-    def _get_embeddings_batch(self, texts: List[str]) -> np.ndarray:
+    def _cache_chunks(self) -> bool:
+        """
+        Garder en cache les embeddings des chunks indexés: seulement si
+        l'index ne les restitue pas exactement (index compressés)
+        """
+        return not index_factory.stores_exact_vectors(self.index)
+    
+    def _get_embeddings_batch(self, texts: List[str], cache: bool = True) -> np.ndarray:
         """
         Récupère les embeddings d'un batch de textes
         
+        Les textes absents du cache (et des vecteurs connus d'une ingestion en
+        cours) sont dédupliqués puis encodés en un seul appel au modèle (par
+        lots de `batch_size`), normalisés de façon vectorisée et replacés dans
+        l'ordre d'entrée.
+        
         Args:
             texts: Liste de textes
+            cache: Garder les nouveaux embeddings dans le cache
             
         Returns:
             np.ndarray: Matrice d'embeddings normalisés
         """
-        embeddings = []
-        for text in texts:
-            embeddings.append(self._get_embedding(text))
+        embeddings = np.empty((len(texts), self.dimension), dtype='float32')
+        
+        # Recherche de tous les hashes dans le cache
+        missing: Dict[str, List[int]] = {}
+        for position, text in enumerate(texts):
+            text_hash = self._get_text_hash(text)
+            cached = self._known_vectors.get(text_hash)
+            if cached is None:
+                cached = self.cache.get(text_hash)
+            if cached is not None:
+                embeddings[position] = cached
+            else:
+                missing.setdefault(text_hash, []).append(position)
+        
+        if missing:
+            missing_hashes = list(missing)
+            missing_texts = [texts[missing[text_hash][0]] for text_hash in missing_hashes]
+            
+            # Encode les textes manquants en un seul appel
+            encoded = np.asarray(
+                self.embedding_model.encode(
+                    missing_texts,
+                    batch_size=self.batch_size,
+                    convert_to_numpy=True,
+                    show_progress_bar=False
+                ),
+                dtype='float32'
+            )
+            
+            # Normalise pour la similarité cosinus (plus pertinent avec L2)
+            norms = np.linalg.norm(encoded, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            encoded /= norms
+            
+            # Replace chaque vecteur à toutes ses positions d'origine
+            for text_hash, embedding in zip(missing_hashes, encoded):
+                embeddings[missing[text_hash]] = embedding
+            
+            # Met en cache (écrit par lots en fin de fichier)
+            if cache:
+                self.cache.put_many(missing_hashes, encoded)
         
-        return np.array(embeddings, dtype='float32')
+        return embeddings
     
     def load_corpus(self, matiere: str, niveau: str) -> int:
         """
@@ -183,94 +829,189 @@ class VectorStoreManager:
         if matiere not in SUPPORTED_SUBJECTS:
             print(f"⚠️ Matière non supportée: {matiere}")
             return 0
+        if self.read_only:
+            # Artefact prébuilt: jamais d'ingestion dans le chemin des requêtes
+            return self._release_status(matiere, niveau)['chunks']
+        
+        # Chemin rapide, sans verrou ni écriture: corpus trouvé à jour depuis la
+        # dernière génération publiée et fichiers inchangés (un stat chacun)
+        key = CorpusManifest.key(matiere, niveau)
+        checked = self._corpus_checked.get(key)
+        if checked is not None and checked[0] == self._corpus_state():
+            matiere_dir = self.corpus_dir / matiere
+            files = discover_corpus_files(matiere_dir) if matiere_dir.exists() else []
+            if self.manifest.unchanged(key, files):
+                return checked[1]
         
+        with self._writing():
+            return self._load_corpus(matiere, niveau)
+    
+    def _corpus_state(self) -> Tuple:
+        """État du vector store dont dépend un corpus trouvé à jour (génération, manifeste, instantanés)"""
+        snapshots = self.snapshots.signature() if self.writer_lock is not None else None
+        return self._state.generation, file_signature(self.manifest.path), snapshots
+    
+    def _load_corpus(self, matiere: str, niveau: str) -> int:
+        """
+        Charge le corpus (appelé sous verrou)
+        
+        Ingestion incrémentale guidée par le manifeste: les fichiers inchangés
+        sont ignorés, les fichiers modifiés voient leurs anciens chunks
+        remplacés et les fichiers supprimés sont purgés de l'index.
+        """
         # Dossier spécifique à la matière
-        matiere_dir = CORPUS_DIR / matiere
+        matiere_dir = self.corpus_dir / matiere
         if not matiere_dir.exists():
             print(f"📁 Dossier non trouvé: {matiere_dir}")
             return 0
         
-        print(f"📚 Chargement du corpus: {matiere} - {niveau}")
+        key = CorpusManifest.key(matiere, niveau)
         
-        documents = []
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""]
-        )
+        # Manifeste désynchronisé de l'index (index perdu ou recréé): on repart de zéro
+        if self.manifest.has(key):
+            chunk_ids = self.manifest.chunk_ids(key)
+            if len(self.store.labels_for_ids(chunk_ids)) < len(set(chunk_ids)):
+                print("⚠️ Manifeste désynchronisé de l'index, ré-ingestion complète")
+                self.manifest.drop(key)
+            elif self.manifest.invalidate_shared(key):
+                print("⚠️ Fichiers de même contenu indexés sous les mêmes IDs: ré-indexés")
         
-        # Charger les PDFs
-        pdf_files = list(matiere_dir.glob("**/*.pdf"))
-        for pdf_file in pdf_files:
-            try:
-                loader = PyPDFLoader(str(pdf_file))
-                docs = loader.load()
-                
-                for doc in docs:
-                    doc.metadata.update({
-                        "source": str(pdf_file),
-                        "matiere": matiere,
-                        "type": "officiel" if "programme" in pdf_file.stem.lower() else "complement",
-                        "niveau": niveau,
-                        "format": "pdf"
-                    })
-                
-                documents.extend(docs)
-                print(f"  ✅ PDF: {pdf_file.name} ({len(docs)} chunks)")
-                
-            except Exception as e:
-                print(f"  ❌ Erreur PDF {pdf_file.name}: {e}")
+        # Premier passage avec manifeste: purge des chunks indexés sans suivi
+        # (anciens IDs f"{matiere}_{niveau}_{i}" dupliqués à chaque appel)
+        legacy_labels = []
+        if not self.manifest.has(key):
+            for file_format in ('pdf', 'txt'):
+                legacy_labels.extend(self.store.labels_where(
+                    {'matiere': matiere, 'niveau': niveau, 'format': file_format}
+                ).tolist())
         
-        # Charger les fichiers texte
-        txt_files = list(matiere_dir.glob("**/*.txt"))
-        for txt_file in txt_files:
-            try:
-                loader = TextLoader(str(txt_file), encoding='utf-8')
-                docs = loader.load()
-                
-                for doc in docs:
-                    doc.metadata.update({
-                        "source": str(txt_file),
-                        "matiere": matiere,
-                        "type": "complement",
-                        "niveau": niveau,
-                        "format": "txt"
-                    })
-                
-                documents.extend(docs)
-                print(f"  ✅ TXT: {txt_file.name} ({len(docs)} chunks)")
-                
-            except Exception as e:
-                print(f"  ❌ Erreur TXT {txt_file.name}: {e}")
+        files = discover_corpus_files(matiere_dir)
+        to_index, removed, touched = self.manifest.plan(key, files)
         
-        if not documents:
-            print("📭 Aucun document trouvé")
-            return 0
+        if not to_index and not removed and not legacy_labels:
+            if touched:
+                self.manifest.save()
+            nb_chunks = len(self.manifest.chunk_ids(key))
+            self._corpus_checked[key] = (self._corpus_state(), nb_chunks)
+            print(f"✅ Corpus à jour: {matiere} - {niveau} ({nb_chunks} chunks)")
+            return nb_chunks
         
-        # Découper les documents
-        chunks = text_splitter.split_documents(documents)
-        print(f"📄 Total: {len(chunks)} chunks de texte")
+        print(f"📚 Chargement du corpus: {matiere} - {niveau} "
+              f"({len(to_index)} fichier(s) à indexer, {len(removed)} supprimé(s))")
         
-        # Préparer les données pour FAISS
-        texts = [chunk.page_content for chunk in chunks]
-        metadatas = [chunk.metadata for chunk in chunks]
+        # Retirer les chunks des fichiers supprimés ou modifiés
+        tracked = self.manifest.files(key)
+        stale_ids = []
+        for source in removed:
+            stale_ids.extend(tracked[source]['chunk_ids'])
+            self.manifest.forget(key, source)
+        for path, _ in to_index:
+            if str(path) in tracked:
+                stale_ids.extend(tracked[str(path)]['chunk_ids'])
+                # Réinscrit au manifeste seulement une fois sa nouvelle version indexée
+                self.manifest.forget(key, str(path))
+        stale_labels = sorted(set(legacy_labels) | set(self.store.labels_for_ids(set(stale_ids)).values()))
+        # Chunks inchangés d'un fichier modifié: vecteurs repris de l'index, sans ré-encodage
+        self._known_vectors = self._indexed_vectors(stale_labels)
+        self._delete_labels(stale_labels)
         
-        # Générer les IDs uniques
-        ids = [f"{matiere}_{niveau}_{i}" for i in range(len(texts))]
+        # Indexer les fichiers nouveaux ou modifiés, en flux: parsing et découpage
+        # en parallèle, puis embedding et ajout par lots de taille fixe
+        parsed = parse_corpus_files([path for path, _ in to_index], matiere, niveau, self.parse_workers)
+        try:
+            self._ingest_stream(key, parsed, dict(to_index), f"{matiere}_{niveau}")
+        finally:
+            # Même interrompue, l'ingestion garde les lots déjà ajoutés
+            self._known_vectors = {}
+            self._save_index()
+            self.manifest.save()
         
-        # Ajouter au vector store
-        self.add_documents(texts, metadatas, ids)
+        nb_chunks = len(self.manifest.chunk_ids(key))
+        print(f"📄 Total: {nb_chunks} chunks de texte pour {matiere} - {niveau}")
+        self._report_near_duplicates()
+        return nb_chunks
+    
+    def _indexed_vectors(self, labels: List[int]) -> Dict[str, np.ndarray]:
+        """Vecteurs de ces chunks lus dans l'index, par hash de texte (vide si l'index les a compressés)"""
+        if not labels or self._cache_chunks():
+            return {}
+        canonicals = self.store.canonicals()
+        chunks = [
+            (label, content) for label, _, content, _ in self.store.iter_chunks(labels) if label not in canonicals
+        ]
+        try:
+            vectors = index_factory.reconstruct(self.index, np.array([label for label, _ in chunks], dtype='int64'))
+        except RuntimeError:
+            # Étiquette absente de l'index (resynchronisé au prochain chargement): tout sera ré-encodé
+            return {}
+        return {self._get_text_hash(content): vector for (_, content), vector in zip(chunks, vectors)}
+    
+    def _report_near_duplicates(self):
+        """Affiche la réduction de l'index due à la fusion des quasi-doublons"""
+        merged = self.store.count_duplicates()
+        if not merged:
+            return
+        total = self.store.count()
+        print(f"🧬 Quasi-doublons: {merged} chunks fusionnés, index de {total - merged} vecteurs "
+              f"pour {total} chunks (-{merged / total:.0%})")
+    
+    def _ingest_stream(self, key: str, parsed, signatures: Dict[Path, Dict], id_prefix: str):
+        """
+        Encode et indexe les chunks produits par `parsed` par lots de
+        `ingest_batch_size` (appelé sous verrou)
         
-        # Sauvegarder l'index
-        self._save_index()
+        Seuls un lot et les fichiers en cours de lecture sont en mémoire. Un
+        fichier n'est inscrit au manifeste (sauvegardé aussitôt) qu'une fois
+        tous ses chunks ajoutés: après une interruption, la reprise ignore les
+        fichiers terminés et ré-ingère les autres (upsert par ID).
+        """
+        texts, metadatas, ids = [], [], []
+        added = 0
+        # Fichiers dont des chunks sont encore dans le lot: (position du dernier chunk, fichier, signature, IDs)
+        waiting = deque()
+        
+        def flush(size: int):
+            nonlocal added
+            self.upsert(texts[:size], metadatas[:size], ids[:size], deduplicate=True)
+            del texts[:size], metadatas[:size], ids[:size]
+            added += size
+            
+            completed = False
+            while waiting and waiting[0][0] <= added:
+                _, path, signature, file_ids = waiting.popleft()
+                self.manifest.record(key, str(path), signature, file_ids)
+                completed = True
+            if completed:
+                self.manifest.save()
+        
+        for path, result in parsed:
+            if result is None:
+                # Fichier illisible: oublié pour être retenté au prochain passage
+                self.manifest.forget(key, str(path))
+                continue
+            
+            file_texts, file_metadatas = result
+            signature = signatures[path]
+            
+            # IDs stables par chemin du fichier (upsert: écrase les restes d'une ingestion interrompue);
+            # le hash du contenu ne sert qu'à détecter les modifications
+            file_ids = [f"{id_prefix}_{source_id(path, self.corpus_dir)}_{i}" for i in range(len(file_texts))]
+            texts.extend(file_texts)
+            metadatas.extend(file_metadatas)
+            ids.extend(file_ids)
+            waiting.append((added + len(texts), path, signature, file_ids))
+            
+            while len(texts) >= self.ingest_batch_size:
+                flush(self.ingest_batch_size)
         
-        return len(texts)
+        flush(len(texts))
     
     def add_documents(self, texts: List[str], metadatas: List[Dict], ids: Optional[List[str]] = None):
         """
         Ajoute des documents au vector store
         
+        Un ID déjà présent remplace le document existant (voir upsert).
+        
         Args:
             texts: Liste des textes
             metadatas: Liste des métadonnées
@@ -279,24 +1020,202 @@ class VectorStoreManager:
         if not texts:
             return
         
+        with self._writing():
+            # Générer les IDs si non fournis
+            if ids is None:
+                ids = [f"doc_{self._next_label + i}" for i in range(len(texts))]
+            self.upsert(texts, metadatas, ids)
+        self._record_write(len(texts))
+    
+    def upsert(self, texts: List[str], metadatas: List[Dict], ids: List[str], deduplicate: bool = False):
+        """
+        Ajoute ou remplace des documents par ID
+        
+        Les anciens vecteurs des IDs déjà présents sont retirés de l'index avant
+        l'ajout: un ID n'a jamais qu'un seul vecteur.
+        
+        Args:
+            texts: Liste des textes
+            metadatas: Liste des métadonnées
+            ids: Liste des IDs de documents
+            deduplicate: Fusionner les quasi-doublons (MinHash) dans un chunk déjà
+                indexé ou du même lot: ils gardent leur ligne et leurs métadonnées,
+                sans vecteur ni embedding (voir NEAR_DUPLICATES)
+        """
+        if not texts:
+            return
+        # Appel direct (hors load_corpus, add_documents...): sauvegarde différée de l'index
+        direct = self._writer != threading.get_ident()
+        
+        # Un même ID répété dans le lot: la dernière occurrence l'emporte
+        last = {doc_id: position for position, doc_id in enumerate(ids)}
+        if len(last) < len(ids):
+            positions = sorted(last.values())
+            texts = [texts[p] for p in positions]
+            metadatas = [metadatas[p] for p in positions]
+            ids = [ids[p] for p in positions]
+        
+        self._check_writable()
         print(f"➕ Ajout de {len(texts)} documents")
         
-        # Générer les IDs si non fournis
-        if ids is None:
-            ids = [f"doc_{len(self.documents) + i}" for i in range(len(texts))]
+        with self._writing():
+            # Retirer les versions précédentes
+            self._delete(ids)
+            
+            labels = np.arange(self._next_label, self._next_label + len(texts), dtype='int64')
+            self._next_label += len(texts)
+            
+            # Quasi-doublons rattachés à un chunk représentant: pas de vecteur
+            canonicals = [None] * len(texts)
+            signatures = None
+            if deduplicate and self.near_duplicates_config['enabled']:
+                canonicals, signatures = self._find_near_duplicates(texts, labels)
+            kept = [position for position, canonical in enumerate(canonicals) if canonical is None]
+            
+            # Calculer les embeddings (les nouveaux sont écrits en un seul ajout)
+            embeddings = self._get_embeddings_batch([texts[p] for p in kept], cache=self._cache_chunks())
+            self.cache.flush()
+            
+            # Ajouter à l'index FAISS sous de nouvelles étiquettes
+            self._ensure_writable()
+            self.index.add_with_ids(embeddings, labels[kept])
+            
+            # Stocker les chunks et métadonnées (une transaction SQLite)
+            self.store.insert_many(labels.tolist(), ids, texts, metadatas, canonicals)
+            if signatures is not None:
+                self.store.set_signatures(
+                    labels[kept].tolist(),
+                    [signatures[p] for p in kept],
+                    [self.minhasher.band_keys(signatures[p]) for p in kept]
+                )
+            self._maybe_train()
+            
+            merged = len(texts) - len(kept)
+            if merged:
+                print(f"🧬 {merged} quasi-doublon(s) fusionné(s) sans nouveau vecteur")
+            print(f"✅ Documents ajoutés, total: {self.index.ntotal}")
+        if direct:
+            self._record_write(len(texts))
+    
+    def _find_near_duplicates(self, texts: List[str], labels: np.ndarray) -> Tuple[List[Optional[int]], List[np.ndarray]]:
+        """
+        Chunk représentant de chaque texte quasi-identique à un chunk indexé ou
+        à un texte précédent du lot (appelé sous verrou)
+        
+        Les candidats partagent au moins une bande LSH; la similarité de
+        Jaccard estimée par les signatures MinHash tranche.
         
-        # Calculer les embeddings
-        embeddings = self._get_embeddings_batch(texts)
+        Returns:
+            Tuple: (étiquette du représentant ou None pour chaque texte, signatures)
+        """
+        threshold = self.near_duplicates_config['threshold']
+        signatures = [self.minhasher.signature(text) for text in texts]
+        canonicals: List[Optional[int]] = []
+        # Représentants du lot en cours, par clé de bande
+        batch_buckets: Dict[Tuple[int, int], List[int]] = {}
         
-        # Ajouter à l'index FAISS
-        self.index.add(embeddings)
+        for position, signature in enumerate(signatures):
+            keys = self.minhasher.band_keys(signature)
+            candidates = self.store.lsh_candidates(keys)
+            for band, key in enumerate(keys):
+                for other in batch_buckets.get((band, key), []):
+                    candidates[int(labels[other])] = signatures[other]
+            
+            best, best_similarity = None, threshold
+            for label, candidate in candidates.items():
+                score = near_duplicates.similarity(signature, candidate)
+                if score >= best_similarity:
+                    best, best_similarity = label, score
+            canonicals.append(best)
+            
+            if best is None:
+                for band, key in enumerate(keys):
+                    batch_buckets.setdefault((band, key), []).append(position)
         
-        # Stocker les documents et métadonnées
-        self.documents.extend(texts)
-        self.metadatas.extend(metadatas)
-        self.document_ids.extend(ids)
+        return canonicals, signatures
+    
+    def delete(self, ids: List[str]) -> int:
+        """
+        Supprime des documents par ID
         
-        print(f"✅ Documents ajoutés, total: {len(self.documents)}")
+        Args:
+            ids: IDs des documents à supprimer (les IDs inconnus sont ignorés)
+            
+        Returns:
+            int: Nombre de documents supprimés
+        """
+        with self._writing():
+            deleted = self._delete(ids)
+        self._record_write(deleted)
+        return deleted
+    
+    def delete_where(self, filters: Dict) -> int:
+        """
+        Supprime tous les documents dont les métadonnées correspondent aux filtres
+        
+        Exemple: vs.delete_where({'type': 'fiche_validee', 'matiere': 'Informatique'})
+        
+        Args:
+            filters: Filtres d'égalité sur les métadonnées (au moins un)
+            
+        Returns:
+            int: Nombre de documents supprimés
+        """
+        with self._writing():
+            labels = self.store.labels_where(filters)
+            if labels is None:
+                raise ValueError("delete_where() requiert au moins un filtre (utiliser clear() pour tout vider)")
+            deleted = self._delete_labels(labels.tolist())
+        self._record_write(deleted)
+        return deleted
+    
+    def _record_write(self, count: int):
+        """
+        Signale des écritures à sauvegarder en arrière-plan (et au plus tard à
+        close()): l'instantané publié les rend visibles aux autres processus
+        """
+        if count and self.write_behind is not None:
+            self.write_behind.record(count)
+    
+    def _delete(self, ids: List[str]) -> int:
+        """Supprime des documents par ID (appelé sous verrou)"""
+        return self._delete_labels(list(self.store.labels_for_ids(set(ids)).values()))
+    
+    def _delete_labels(self, labels: List[int]) -> int:
+        """Retire ces étiquettes de l'index FAISS et de la base des chunks, en O(nombre supprimé)"""
+        if not labels:
+            return 0
+        
+        self._check_writable()
+        # Quasi-doublons dont le représentant est supprimé: l'un d'eux le remplace
+        orphaned = self.store.dependents(labels)
+        if index_factory.supports_remove(self.index):
+            self._ensure_writable()
+            self.index.remove_ids(np.array(labels, dtype='int64'))
+        self.store.delete_labels(labels)
+        if orphaned:
+            self._ensure_writable()
+            self._promote(orphaned)
+        
+        if not index_factory.supports_remove(self.index):
+            # HNSW ne sait pas retirer de vecteurs: reconstruction avec les documents restants
+            self._rebuild_all()
+        
+        print(f"➖ {len(labels)} documents retirés de l'index")
+        return len(labels)
+    
+    def _promote(self, groups: Dict[int, List[int]]):
+        """Indexe un nouveau représentant pour chaque groupe de quasi-doublons orphelins (appelé sous verrou)"""
+        self.store.promote(groups)
+        heads = [members[0] for members in groups.values()]
+        chunks = list(self.store.iter_chunks(heads))
+        texts = [content for _, _, content, _ in chunks]
+        embeddings = self._get_embeddings_batch(texts, cache=self._cache_chunks())
+        self.index.add_with_ids(embeddings, np.array([label for label, *_ in chunks], dtype='int64'))
+        signatures = [self.minhasher.signature(text) for text in texts]
+        self.store.set_signatures(
+            [label for label, *_ in chunks], signatures, [self.minhasher.band_keys(sig) for sig in signatures]
+        )
     
     def search_similar(
         self, 
@@ -304,64 +1223,216 @@ class VectorStoreManager:
         matiere: Optional[str] = None, 
         niveau: Optional[str] = None, 
         top_k: int = 5,
-        similarity_threshold: float = 0.7
+        similarity_threshold: float = 0.7,
+        filters: Optional[Dict] = None
     ) -> List[Tuple[str, float, Dict]]:
         """
         Recherche des documents similaires
         
+        Les filtres sont appliqués pendant la recherche FAISS (sélecteur d'IDs
+        issu d'une requête SQL sur les métadonnées): seuls les documents
+        correspondants sont comparés et le vrai top-k filtré est retourné.
+        Les résultats sont gardés en cache (LRU) jusqu'à la prochaine
+        modification de l'index. Aucun verrou: la recherche porte sur la
+        génération publiée au moment de l'appel.
+        
         Args:
             query: Requête de recherche
             matiere: Filtre par matière (optionnel)
             niveau: Filtre par niveau (optionnel)
             top_k: Nombre de résultats
             similarity_threshold: Seuil minimal de similarité
+            filters: Autres filtres d'égalité sur les métadonnées, ex. {'type': 'fiche_validee'}
             
         Returns:
             List[Tuple[str, float, Dict]]: (contenu, score, metadata)
         """
-        if len(self.documents) == 0:
-            print("📭 Vector store vide")
-            return []
+        filters = {**(filters or {}), 'matiere': matiere, 'niveau': niveau}
+        key = QueryCache.key(query, filters, top_k, similarity_threshold)
+        self._refresh()
+        state = self._state
+        results = self.query_cache.get(key, state.generation)
+        if results is not None:
+            print(f"🔍 Recherche: '{query[:50]}...' → {len(results)} résultats (cache)")
+            return results
         
-        # Embedding de la requête
-        query_embedding = self._get_embedding(query).reshape(1, -1)
+        results = self._search_similar(state, query, filters, top_k, similarity_threshold)
+        self.query_cache.put(key, state.generation, results)
+        return results
+    
+    def search_similar_many(
+        self,
+        queries: List[str],
+        matiere: Optional[str] = None,
+        niveau: Optional[str] = None,
+        top_k: int = 5,
+        similarity_threshold: float = 0.7,
+        filters: Optional[Dict] = None
+    ) -> List[List[Tuple[str, float, Dict]]]:
+        """
+        Recherche groupée: un seul appel au modèle et une seule recherche FAISS
+        matricielle pour toutes les requêtes
         
-        # Recherche dans FAISS
-        k = min(top_k * 2, len(self.documents))  # Cherche plus large pour filtrer après
-        distances, indices = self.index.search(query_embedding, k)
+        Mêmes filtres et même seuil que search_similar, appliqués à chaque requête.
         
-        results = []
-        for i, idx in enumerate(indices[0]):
-            if idx == -1:
-                continue
-            
-            # Convertir distance L2 en similarité cosinus (car embeddings normalisés)
-            # Pour des vecteurs normalisés: cosine_sim = 1 - (distance^2)/2
-            distance = distances[0][i]
-            similarity = 1.0 - (distance * distance) / 2.0
-            
-            # Filtrer par seuil
-            if similarity < similarity_threshold:
-                continue
-            
-            # Récupérer le document
-            document = self.documents[idx]
-            metadata = self.metadatas[idx]
+        Args:
+            queries: Requêtes de recherche
+            matiere: Filtre par matière (optionnel)
+            niveau: Filtre par niveau (optionnel)
+            top_k: Nombre de résultats par requête
+            similarity_threshold: Seuil minimal de similarité
+            filters: Autres filtres d'égalité sur les métadonnées
             
-            # Filtrer par matière et niveau si spécifiés
-            if matiere and metadata.get('matiere') != matiere:
-                continue
-            if niveau and metadata.get('niveau') != niveau:
-                continue
+        Returns:
+            List[List[Tuple[str, float, Dict]]]: Résultats (contenu, score, metadata) de chaque requête, dans l'ordre
+        """
+        if not queries:
+            return []
+        
+        filters = {**(filters or {}), 'matiere': matiere, 'niveau': niveau}
+        keys = [QueryCache.key(query, filters, top_k, similarity_threshold) for query in queries]
+        self._refresh()
+        state = self._state
+        results = [self.query_cache.get(key, state.generation) for key in keys]
+        
+        # Seules les requêtes absentes du cache sont encodées et cherchées
+        missing = [position for position, cached in enumerate(results) if cached is None]
+        if missing:
+            found = self._search_many(
+                state, [queries[p] for p in missing], filters, top_k, similarity_threshold
+            )
+            for position, query_results in zip(missing, found):
+                results[position] = query_results
+                self.query_cache.put(keys[position], state.generation, query_results)
+        
+        print(f"🔍 Recherche groupée: {len(queries)} requêtes → "
+              f"{sum(len(r) for r in results)} résultats")
+        return results
+    
+    def search_lexical(
+        self,
+        query: str,
+        matiere: Optional[str] = None,
+        niveau: Optional[str] = None,
+        top_k: int = 5,
+        filters: Optional[Dict] = None
+    ) -> List[Tuple[str, float, Dict]]:
+        """
+        Recherche lexicale BM25 dans l'index inversé des chunks (sans modèle d'embedding)
+        
+        Args:
+            query: Requête de recherche (mots vides ignorés, accents et casse indifférents)
+            matiere: Filtre par matière (optionnel)
+            niveau: Filtre par niveau (optionnel)
+            top_k: Nombre de résultats
+            filters: Autres filtres d'égalité sur les métadonnées
             
-            results.append((document, similarity, metadata))
+        Returns:
+            List[Tuple[str, float, Dict]]: (contenu, score BM25, metadata), score décroissant
+        """
+        filters = {**(filters or {}), 'matiere': matiere, 'niveau': niveau}
+        terms = lexical.query_terms(query)
+        if not terms:
+            return []
+        ranked = self.store.search_lexical(lexical.match_expression(terms), filters, top_k)
+        hits = self.store.get_many((label for label, _ in ranked), filters)
+        return [(hits[label][0], score, hits[label][1]) for label, score in ranked if label in hits]
+    
+    def search_hybrid(
+        self,
+        query: str,
+        matiere: Optional[str] = None,
+        niveau: Optional[str] = None,
+        top_k: int = 5,
+        similarity_threshold: float = 0.7,
+        filters: Optional[Dict] = None
+    ) -> List[Tuple[str, float, Dict]]:
+        """
+        Recherche hybride: index inversé BM25 d'abord, recherche dense si besoin
+        
+        Si le meilleur résultat BM25 contient une part suffisante des termes de
+        la requête (HYBRID_SEARCH['lexical_min_coverage']), les top_k résultats
+        BM25 sont retournés directement, sans encoder la requête. Sinon, les
+        candidats BM25 et les candidats denses (au-dessus du seuil de similarité)
+        sont fusionnés par Reciprocal Rank Fusion.
+        
+        Args:
+            query: Requête de recherche
+            matiere: Filtre par matière (optionnel)
+            niveau: Filtre par niveau (optionnel)
+            top_k: Nombre de résultats
+            similarity_threshold: Seuil minimal de similarité des candidats denses
+            filters: Autres filtres d'égalité sur les métadonnées
             
-            # Arrêter si on a assez de résultats
-            if len(results) >= top_k:
-                break
+        Returns:
+            List[Tuple[str, float, Dict]]: (contenu, score de fusion RRF, metadata), score décroissant
+        """
+        filters = {**(filters or {}), 'matiere': matiere, 'niveau': niveau}
+        key = QueryCache.key(query, filters, top_k, similarity_threshold)
+        key = None if key is None else ("hybrid", key)
+        self._refresh()
+        state = self._state
+        results = self.query_cache.get(key, state.generation)
+        if results is not None:
+            print(f"🔍 Recherche hybride: '{query[:50]}...' → {len(results)} résultats (cache)")
+            return results
+        
+        results = self._search_hybrid(state, query, filters, top_k, similarity_threshold)
+        self.query_cache.put(key, state.generation, results)
+        return results
+    
+    def _search_hybrid(
+        self,
+        state: IndexGeneration,
+        query: str,
+        filters: Dict,
+        top_k: int,
+        similarity_threshold: float
+    ) -> List[Tuple[str, float, Dict]]:
+        """Recherche hybride BM25 + dense dans la génération `state`"""
+        terms = lexical.query_terms(query)
+        candidates = max(top_k, self.hybrid_config['candidates'])
+        lexical_labels = []
+        if terms:
+            ranked = self.store.search_lexical(lexical.match_expression(terms), filters, candidates)
+            lexical_labels = [label for label, _ in ranked]
         
-        # Trier par similarité décroissante
-        results.sort(key=lambda x: x[1], reverse=True)
+        # Rappel lexical suffisant (le meilleur chunk BM25 couvre la requête): la requête n'est pas encodée
+        head = self.store.get_many(lexical_labels[:top_k], filters)
+        if lexical_labels and lexical.term_coverage(
+            terms, head[lexical_labels[0]][0]
+        ) >= self.hybrid_config['lexical_min_coverage']:
+            self.hybrid_stats['lexical'] += 1
+            scores = lexical.reciprocal_rank_fusion([lexical_labels[:top_k]], self.hybrid_config['rrf_k'])
+            print(f"🔍 Recherche hybride: '{query[:50]}...' → {len(head)} résultats (BM25)")
+            return [(head[label][0], scores[label], head[label][1]) for label in lexical_labels[:top_k]]
+        
+        # Sinon: fusion des classements BM25 et dense
+        self.hybrid_stats['fused'] += 1
+        dense_labels = []
+        found = self._search_labels(state, [query], filters, candidates)
+        if found is not None:
+            similarities, indices = found
+            kept = (indices[0] != -1) & (similarities[0] >= similarity_threshold)
+            dense_labels = indices[0][kept].tolist()
+        
+        scores = lexical.reciprocal_rank_fusion([lexical_labels, dense_labels], self.hybrid_config['rrf_k'])
+        best = sorted(scores, key=scores.get, reverse=True)[:top_k]
+        hits = self.store.get_many(best, filters)
+        print(f"🔍 Recherche hybride: '{query[:50]}...' → {len(hits)} résultats "
+              f"(BM25 + dense: {len(lexical_labels)} + {len(dense_labels)} candidats)")
+        return [(hits[label][0], scores[label], hits[label][1]) for label in best if label in hits]
+    
+    def _search_similar(
+        self,
+        state: IndexGeneration,
+        query: str,
+        filters: Dict,
+        top_k: int,
+        similarity_threshold: float
+    ) -> List[Tuple[str, float, Dict]]:
+        """Recherche des documents similaires dans la génération `state`"""
+        results = self._search_many(state, [query], filters, top_k, similarity_threshold)[0]
         
         if results:
             print(f"🔍 Recherche: '{query[:50]}...' → {len(results)} résultats (max: {results[0][1]:.3f})")
@@ -370,6 +1441,129 @@ class VectorStoreManager:
         
         return results
     
+    def _search_many(
+        self,
+        state: IndexGeneration,
+        queries: List[str],
+        filters: Dict,
+        top_k: int,
+        similarity_threshold: float
+    ) -> List[List[Tuple[str, float, Dict]]]:
+        """Recherche matricielle de plusieurs requêtes dans la génération `state`"""
+        found = self._search_labels(state, queries, filters, top_k)
+        if found is None:
+            return [[] for _ in queries]
+        similarities, indices = found
+        
+        # Texte et métadonnées lus en une requête, pour les seuls résultats retenus
+        kept = (indices != -1) & (similarities >= similarity_threshold)
+        hits = self.store.get_many(np.unique(indices[kept]), filters)
+        
+        results = []
+        for row in range(len(queries)):
+            query_results = [
+                (*hits[idx], similarity)
+                for idx, similarity in zip(indices[row][kept[row]], similarities[row][kept[row]])
+                if idx in hits
+            ]
+            # Trier par similarité décroissante
+            query_results.sort(key=lambda x: x[2], reverse=True)
+            results.append([(content, similarity, metadata) for content, metadata, similarity in query_results])
+        
+        return results
+    
+    def _search_labels(
+        self,
+        state: IndexGeneration,
+        queries: List[str],
+        filters: Dict,
+        top_k: int
+    ) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Recherche dense: similarités cosinus et étiquettes (-1 = aucune) des top_k
+        de chaque requête dans la génération `state`, ou None si aucun document ne correspond
+        """
+        nb_vectors = state.index.ntotal + (state.delta.ntotal if state.delta is not None else 0)
+        if nb_vectors == 0:
+            print("📭 Vector store vide")
+            return None
+        
+        # Lignes candidates selon les filtres (None = pas de filtre), quasi-doublons
+        # remplacés par leur représentant
+        selected = self.store.labels_where(filters, canonical=True)
+        nb_candidates = nb_vectors if selected is None else len(selected)
+        if nb_candidates == 0:
+            print("🔍 Aucun document pour ces filtres")
+            return None
+        
+        # Embeddings des requêtes (un seul appel au modèle pour les absentes du cache)
+        query_embeddings = self._get_embeddings_batch(queries)
+        
+        # Recherche dans FAISS restreinte aux lignes candidates
+        k = min(top_k, nb_candidates)
+        distances, indices = self._search_index(state.index, query_embeddings, selected, nb_candidates, k)
+        if state.delta is not None:
+            # Fiches pas encore fusionnées dans l'index: classements fusionnés par distance
+            delta_distances, delta_indices = self._search_index(
+                state.delta, query_embeddings, selected, nb_candidates, min(k, state.delta.ntotal)
+            )
+            distances = np.hstack([distances, delta_distances])
+            indices = np.hstack([indices, delta_indices])
+            best = np.argsort(distances, axis=1, kind='stable')[:, :k]
+            distances = np.take_along_axis(distances, best, axis=1)
+            indices = np.take_along_axis(indices, best, axis=1)
+        
+        # Convertir distance L2 en similarité cosinus (car embeddings normalisés)
+        return index_factory.to_similarity(distances), indices
+    
+    def _search_index(
+        self,
+        index: faiss.Index,
+        query_embeddings: np.ndarray,
+        selected: Optional[np.ndarray],
+        nb_candidates: int,
+        k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Distances L2 au carré et étiquettes (-1 = aucune) des k plus proches dans un index"""
+        if index.ntotal == 0:
+            return (np.full((len(query_embeddings), k), np.inf, dtype='float32'),
+                    np.full((len(query_embeddings), k), -1, dtype='int64'))
+        approximate = index_factory.index_kind(index) != "flat"
+        if selected is not None and approximate and nb_candidates <= self.index_config['exact_below']:
+            # Peu de candidats: un index approché risquerait de les manquer, calcul exact
+            return self._search_exact(index, query_embeddings, selected, k)
+        selector = faiss.IDSelectorBatch(selected) if selected is not None else None
+        params = index_factory.search_parameters(index, self.index_config, selector)
+        distances, indices = index.search(query_embeddings, k, params=params)
+        residuals = index_factory.projection_residuals(index, query_embeddings)
+        if residuals is not None:
+            # Index projeté: distance aux vecteurs stockés, comme _search_exact et l'index delta
+            distances += residuals[:, None]
+        return distances, indices
+    
+    def _search_exact(
+        self,
+        index: faiss.Index,
+        query_embeddings: np.ndarray,
+        labels: np.ndarray,
+        k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Recherche exacte (distance L2 au carré) parmi les étiquettes données, une ligne par requête"""
+        try:
+            vectors = index_factory.reconstruct(index, labels)
+        except RuntimeError:
+            # Chunks écrits dans SQLite après la publication de cette génération: pas encore indexés
+            labels = labels[np.isin(labels, index_factory.stored_labels(index))]
+            vectors = index_factory.reconstruct(index, labels)
+        distances = (
+            (query_embeddings ** 2).sum(axis=1, keepdims=True)
+            + (vectors ** 2).sum(axis=1)
+            - 2.0 * query_embeddings @ vectors.T
+        )
+        np.maximum(distances, 0.0, out=distances)
+        best = np.argsort(distances, axis=1)[:, :k]
+        return np.take_along_axis(distances, best, axis=1), labels[best]
+    
     def add_validated_fiche(
         self,
         fiche_id: str,
@@ -385,20 +1579,69 @@ class VectorStoreManager:
             metadata: Métadonnées de la fiche
         """
         print(f"💾 Sauvegarde de la fiche: {fiche_id}")
+        self.add_validated_fiches([(fiche_id, content, metadata)])
+    
+    def add_validated_fiches(self, fiches: List[Tuple[str, str, Dict]]):
+        """
+        Ajoute plusieurs fiches validées en un seul ajout
+        
+        Les fiches sont acquittées dès leur écriture dans la base des chunks
+        (journal WAL de SQLite) et leurs embeddings dans le cache: un coût
+        indépendant de la taille de l'index. Les nouvelles fiches sont
+        cherchables aussitôt dans un petit index delta; leur fusion dans
+        l'index et la sauvegarde de l'instantané sont faites en arrière-plan
+        (voir SNAPSHOT_WRITE_BEHIND). Après un arrêt brutal, les fiches
+        absentes du dernier instantané sont rejouées depuis la base au
+        chargement (_reconcile).
+        
+        Args:
+            fiches: (ID unique, contenu, métadonnées) de chaque fiche
+        """
+        if not fiches:
+            return
+        self._check_writable()
         
         # Préparer les métadonnées complètes
-        full_metadata = {
-            **metadata,
-            "type": "fiche_validee",
-            "fiche_id": fiche_id,
-            "timestamp": datetime.now().isoformat()
-        }
+        timestamp = datetime.now().isoformat()
+        full_metadatas = [
+            {**metadata, "type": "fiche_validee", "fiche_id": fiche_id, "timestamp": timestamp}
+            for fiche_id, _, metadata in fiches
+        ]
         
-        # Ajouter au vector store
-        self.add_documents([content], [full_metadata], [fiche_id])
+        texts = [content for _, content, _ in fiches]
+        ids = [fiche_id for fiche_id, _, _ in fiches]
+        with self._writing(keep_delta=True):
+            if len(set(ids)) < len(ids) or self.store.labels_for_ids(set(ids)):
+                # Nouvelle version d'une fiche: remplacement dans l'index (voir upsert)
+                self._fold_delta()
+                self.upsert(texts, full_metadatas, ids)
+            else:
+                self._append(texts, full_metadatas, ids)
+        self.write_behind.record(len(fiches))
+    
+    def _append(self, texts: List[str], metadatas: List[Dict], ids: List[str]):
+        """
+        Ajoute des documents d'IDs nouveaux à l'index delta, en O(taille du lot)
+        (appelé dans une écriture)
+        """
+        print(f"➕ Ajout de {len(texts)} documents (sauvegarde différée)")
+        labels = np.arange(self._next_label, self._next_label + len(texts), dtype='int64')
+        self._next_label += len(texts)
         
-        # Sauvegarder l'index
-        self._save_index()
+        # Embeddings dans le cache puis chunks dans SQLite: de quoi rejouer l'ajout après un arrêt
+        embeddings = self._get_embeddings_batch(texts)
+        self.cache.flush()
+        self._pending_hashes.extend(self._get_text_hash(text) for text in texts)
+        self.store.insert_many(labels.tolist(), ids, texts, metadatas)
+        
+        # Copie du petit index delta: la génération publiée reste intacte
+        if self._draft_delta is None:
+            delta = faiss.IndexIDMap2(faiss.IndexFlatL2(self.dimension))
+        else:
+            delta = faiss.clone_index(self._draft_delta)
+        delta.add_with_ids(embeddings, labels)
+        self._draft_delta = delta
+        print(f"✅ Documents acquittés, {delta.ntotal} en attente de fusion dans l'index")
     
     def get_stats(self) -> Dict:
         """
@@ -407,50 +1650,131 @@ class VectorStoreManager:
         Returns:
             Dict: Statistiques
         """
+        self._refresh()
+        state = self._state
         stats = {
-            'total_documents': len(self.documents),
-            'index_size': self.index.ntotal,
+            'total_documents': self.store.count(),
+            'index_size': state.index.ntotal + (state.delta.ntotal if state.delta is not None else 0),
+            'index_type': index_factory.index_kind(state.index),
             'dimension': self.dimension,
+            # Dimension des vecteurs indexés après projection PCA (0 = sans projection)
+            'pca_dim': index_factory.projected_dimension(state.index),
             'cache_size': len(self.cache),
-            'materials': {}
+            'cache_bytes': self.cache.nbytes,
+            # Taux de succès, évictions et taille du cache des embeddings
+            'embedding_cache': self.cache.stats(),
+            'query_cache': self.query_cache.stats(),
+            # Chunks fusionnés dans un représentant (sans vecteur propre)
+            'near_duplicates': self.store.count_duplicates(),
+            # Recherches hybrides servies par BM25 seul / par fusion BM25 + dense
+            'hybrid_search': dict(self.hybrid_stats),
+            # Compter par matière (GROUP BY sur la colonne indexée)
+            'materials': self.store.count_by('matiere'),
+            # Fiches acquittées en attente de sauvegarde, sauvegardes différées faites
+            'write_behind': self.write_behind.get_stats() if self.write_behind is not None else None
         }
         
-        # Compter par matière
-        for metadata in self.metadatas:
-            matiere = metadata.get('matiere', 'inconnu')
-            if matiere not in stats['materials']:
-                stats['materials'][matiere] = 0
-            stats['materials'][matiere] += 1
-        
         return stats
     
     def clear(self):
         """Vide complètement le vector store"""
+        self._check_writable()
         print("🗑️  Vidage du vector store")
         
-        self.index = faiss.IndexFlatL2(self.dimension)
-        self.documents = []
-        self.metadatas = []
-        self.document_ids = []
-        
-        # Supprimer les fichiers
-        if self.index_file.exists():
-            self.index_file.unlink()
-        if self.metadata_file.exists():
-            self.metadata_file.unlink()
+        with self._writing(keep_delta=True):
+            self._reset_state()
+            self.store.clear()
+            
+            # Supprimer les fichiers (génération vide vue par les autres processus)
+            with self.snapshots.lock:
+                self.snapshots.clear()
+                self._snapshot_signature, self._disk_generation = self.snapshots.state()
+            if self.index_file.exists():
+                self.index_file.unlink()
+            if self.metadata_file.exists():
+                self.metadata_file.unlink()
+            self.manifest.reset()
         
         print("✅ Vector store vidé")
 
 
-# Singleton pour faciliter l'utilisation
-_vectorstore_instance = None
+def open_prebuilt_vectorstore(releases_dir: Path = VECTORSTORE_RELEASES_DIR) -> VectorStoreManager:
+    """
+    Ouvre en lecture seule la version courante des artefacts prébuilt
+    (python vectorstore_cli.py build)
+    
+    Raises:
+        RuntimeError: Aucune version publiée
+    """
+    releases = ReleaseStore(releases_dir, RELEASE_RETENTION)
+    info = releases.current()
+    if info is None:
+        raise RuntimeError(
+            f"Aucun artefact prébuilt dans {releases_dir}: lancer `python vectorstore_cli.py build` "
+            f"avant de démarrer le serveur"
+        )
+    print(f"📦 Artefact prébuilt {info['version']}: {info['chunks']} chunks, index {info['index_type']}")
+    if info['embedding_model'] != EMBEDDING_MODEL:
+        print(f"⚠️ Artefact construit avec {info['embedding_model']}, modèle configuré {EMBEDDING_MODEL}: "
+              f"relancer `python vectorstore_cli.py build`")
+    return VectorStoreManager(
+        index_config=info['index'],
+        embedding_backend=info['embedding_backend'],
+        directory=releases.path(info['version']),
+        read_only=True
+    )
+
+
+# Instance partagée par tout le processus (agents, app Streamlit)
+_vectorstore_instance: Optional[VectorStoreManager] = None
+_vectorstore_lock = threading.Lock()
+
 
 def get_vectorstore() -> VectorStoreManager:
-    """Retourne l'instance singleton du VectorStoreManager"""
+    """
+    Retourne l'instance partagée du VectorStoreManager (création thread-safe)
+    
+    Avec VECTORSTORE_SERVICE, retourne un client du service local (même interface).
+    """
+    global _vectorstore_instance
+    instance = _vectorstore_instance
+    if instance is None:
+        with _vectorstore_lock:
+            if _vectorstore_instance is None:
+                if VECTORSTORE_SERVICE:
+                    from utils.vectorstore_service import VectorStoreClient
+                    _vectorstore_instance = VectorStoreClient(VECTORSTORE_SERVICE)
+                elif VECTORSTORE_PREBUILT:
+                    _vectorstore_instance = open_prebuilt_vectorstore()
+                else:
+                    _vectorstore_instance = VectorStoreManager()
+                atexit.register(shutdown_vectorstore)
+            instance = _vectorstore_instance
+    return instance
+
+
+def warmup_vectorstore() -> VectorStoreManager:
+    """Crée l'instance partagée et précharge le modèle (à appeler au démarrage)"""
+    vs = get_vectorstore()
+    vs.warmup()
+    return vs
+
+
+def reload_vectorstore() -> VectorStoreManager:
+    """Recharge l'index de l'instance partagée depuis le disque"""
+    vs = get_vectorstore()
+    vs.reload()
+    return vs
+
+
+def shutdown_vectorstore():
+    """Libère l'instance partagée; la prochaine demande en recrée une"""
     global _vectorstore_instance
-    if _vectorstore_instance is None:
-        _vectorstore_instance = VectorStoreManager()
-    return _vectorstore_instance
+    with _vectorstore_lock:
+        instance = _vectorstore_instance
+        _vectorstore_instance = None
+    if instance is not None:
+        instance.close()
 
 
 if __name__ == "__main__":
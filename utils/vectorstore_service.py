@@ -0,0 +1,440 @@
+"""
+Vector store servi par un processus local (socket Unix, tube nommé ou localhost)
+
+Le serveur possède le modèle d'embedding et l'index: les processus de l'app
+(workers Streamlit) n'en gardent pas de copie. Les search_similar et
+add_validated_fiche reçus en même temps sont regroupés en micro-lots: un seul
+encodage et une seule recherche matricielle par lot de requêtes, un seul ajout
+par lot de fiches (index sauvegardé en arrière-plan).
+
+Les messages sont échangés en JSON (jamais de pickle: un message reçu ne peut
+pas exécuter de code), après authentification par une clé partagée propre à
+l'installation; la socket Unix n'est accessible qu'à l'utilisateur du serveur.
+
+    serveur: python vectorstore_cli.py serve
+    app:     VECTORSTORE_SERVICE=<adresse> (get_vectorstore() retourne un VectorStoreClient)
+"""
+import builtins
+import inspect
+import json
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import Client, Listener
+from typing import Callable, Dict, List, Tuple, Union
+
+import numpy as np
+
+from config import (
+    VECTORSTORE_SERVICE_AUTHKEY, VECTORSTORE_SERVICE_KEY_FILE, VECTORSTORE_BATCH_WINDOW_MS, VECTORSTORE_BATCH_MAX
+)
+from utils.vectorstore import VectorStoreManager
+
+
+# Méthodes du VectorStoreManager accessibles aux clients
+SERVICE_METHODS = frozenset({
+    "search_similar", "search_similar_many", "search_lexical", "search_hybrid",
+    "load_corpus", "add_documents", "upsert", "delete", "delete_where",
+    "add_validated_fiche", "add_validated_fiches", "get_stats", "reload", "rebuild_index", "warmup", "clear",
+    "flush"
+})
+
+
+def parse_address(address: str) -> Union[str, Tuple[str, int]]:
+    """Adresse de multiprocessing.connection: "hôte:port" (TCP), sinon chemin de socket Unix ou tube nommé"""
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit() and not address.startswith(("/", "\\\\")):
+        return host, int(port)
+    return address
+
+
+def service_authkey(create: bool = False) -> bytes:
+    """
+    Clé d'authentification du service: VECTORSTORE_SERVICE_AUTHKEY, sinon la clé
+    aléatoire de l'installation (VECTORSTORE_SERVICE_KEY_FILE)
+
+    Args:
+        create: Créer la clé si elle n'existe pas encore (serveur)
+    """
+    if VECTORSTORE_SERVICE_AUTHKEY:
+        return VECTORSTORE_SERVICE_AUTHKEY
+    path = VECTORSTORE_SERVICE_KEY_FILE
+    if create and not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Écrite à côté puis liée: jamais lue à moitié, et un seul serveur la crée
+        tmp = path.with_name(f".{path.name}.{os.getpid()}")
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(secrets.token_hex(32))
+            os.link(tmp, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.unlink(tmp)
+    try:
+        if os.name == "posix" and path.stat().st_mode & 0o077:
+            raise PermissionError(f"Clé du service lisible par d'autres utilisateurs: chmod 600 {path}")
+        key = path.read_text(encoding='utf-8').strip()
+    except FileNotFoundError:
+        key = ""
+    if not key:
+        raise ConnectionError(f"Clé du service absente ({path}): lancer `python vectorstore_cli.py serve`")
+    return key.encode()
+
+
+def _json_default(value):
+    """Valeurs hors JSON des résultats (scalaires et tableaux numpy, ensembles...)"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    return str(value)
+
+
+def send_message(conn, message):
+    """Envoie un message JSON (les tuples deviennent des listes)"""
+    conn.send_bytes(json.dumps(message, ensure_ascii=False, default=_json_default).encode('utf-8'))
+
+
+def recv_message(conn):
+    """Reçoit un message JSON"""
+    return json.loads(conn.recv_bytes().decode('utf-8'))
+
+
+def remote_error(name: str, message: str) -> Exception:
+    """Exception d'un appel distant: même type si natif, sinon RuntimeError"""
+    error_type = getattr(builtins, name, None)
+    if isinstance(error_type, type) and issubclass(error_type, Exception):
+        return error_type(message)
+    return RuntimeError(f"{name}: {message}")
+
+
+def _check_search(request: Dict):
+    """Refuse une recherche invalide avant son micro-lot (elle y ferait échouer les autres)"""
+    if not isinstance(request['query'], str):
+        raise TypeError("query doit être une chaîne")
+    for name in ('matiere', 'niveau'):
+        if request[name] is not None and not isinstance(request[name], str):
+            raise TypeError(f"{name} doit être une chaîne")
+    top_k = request['top_k']
+    if isinstance(top_k, bool) or not isinstance(top_k, int) or top_k < 1:
+        raise ValueError(f"top_k doit être un entier positif (reçu: {top_k!r})")
+    threshold = request['similarity_threshold']
+    if isinstance(threshold, bool) or not isinstance(threshold, (int, float)) or threshold != threshold:
+        raise ValueError(f"similarity_threshold doit être un nombre (reçu: {threshold!r})")
+    filters = request['filters']
+    if filters is not None and not isinstance(filters, dict):
+        raise TypeError("filters doit être un dictionnaire")
+
+
+def _check_fiche(fiche_id, content, metadata):
+    """Refuse une fiche invalide avant son micro-lot"""
+    if not isinstance(fiche_id, str) or not isinstance(content, str):
+        raise TypeError("fiche_id et content doivent être des chaînes")
+    if not isinstance(metadata, dict):
+        raise TypeError("metadata doit être un dictionnaire")
+
+
+class MicroBatcher:
+    """
+    File de requêtes traitées par lots dans un thread dédié
+
+    Un lot part dès qu'il atteint `max_batch` requêtes ou que `window` secondes
+    se sont écoulées depuis la première; les requêtes arrivées pendant le
+    traitement d'un lot forment le suivant.
+    """
+
+    def __init__(self, handler: Callable[[List], List], window: float, max_batch: int, name: str):
+        """
+        Args:
+            handler: Traite une liste de requêtes, retourne un résultat par requête
+                (une exception retournée n'échoue que sa requête)
+            window: Attente maximale (secondes) d'autres requêtes avant de traiter un lot
+            max_batch: Taille maximale d'un lot
+            name: Nom du thread
+        """
+        self.handler = handler
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self.stats = {'requests': 0, 'batches': 0, 'largest_batch': 0}
+        self._queue: List[Tuple[object, Future]] = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item) -> Future:
+        """Ajoute une requête au prochain lot"""
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Service du vector store arrêté")
+            self._queue.append((item, future))
+            self._cond.notify()
+        return future
+
+    def _next_batch(self) -> List[Tuple[object, Future]]:
+        """Attend la première requête puis la fin de la fenêtre (lot vide: file fermée)"""
+        with self._cond:
+            while not self._queue and not self._closed:
+                self._cond.wait()
+            deadline = time.monotonic() + self.window
+            while len(self._queue) < self.max_batch and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._queue[:self.max_batch]
+            del self._queue[:self.max_batch]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            self.stats['requests'] += len(batch)
+            self.stats['batches'] += 1
+            self.stats['largest_batch'] = max(self.stats['largest_batch'], len(batch))
+            try:
+                results = self.handler([item for item, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def close(self):
+        """Traite les requêtes en attente puis arrête le thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+
+class VectorStoreServer:
+    """Sert un VectorStoreManager aux VectorStoreClient (un thread par connexion)"""
+
+    def __init__(
+        self,
+        vs: VectorStoreManager,
+        address: str,
+        window_ms: float = VECTORSTORE_BATCH_WINDOW_MS,
+        max_batch: int = VECTORSTORE_BATCH_MAX
+    ):
+        """
+        Args:
+            vs: Vector store servi
+            address: "hôte:port", chemin de socket Unix ou tube nommé
+            window_ms: Fenêtre de regroupement des requêtes (millisecondes)
+            max_batch: Taille maximale d'un micro-lot
+        """
+        self.vs = vs
+        self.address = address
+        parsed = parse_address(address)
+        unix_socket = isinstance(parsed, str) and os.name == "posix"
+        if unix_socket and os.path.exists(parsed):
+            # Socket d'un serveur précédent arrêté brutalement
+            os.unlink(parsed)
+        # Socket Unix créée accessible au seul utilisateur du serveur
+        umask = os.umask(0o177) if unix_socket else None
+        try:
+            self.listener = Listener(parsed, authkey=service_authkey(create=True))
+        finally:
+            if umask is not None:
+                os.umask(umask)
+        self.searches = MicroBatcher(self._search_batch, window_ms / 1000, max_batch, "vectorstore-search")
+        self.fiches = MicroBatcher(self._fiche_batch, window_ms / 1000, max_batch, "vectorstore-fiches")
+        self._search_signature = inspect.signature(VectorStoreManager.search_similar)
+        self._fiche_signature = inspect.signature(VectorStoreManager.add_validated_fiche)
+        self._closed = False
+
+    def serve_forever(self):
+        """Accepte les connexions jusqu'à close() (ou Ctrl+C)"""
+        print(f"🛰️  Vector store servi sur {self.address} "
+              f"(micro-lots: {self.searches.window * 1000:g} ms, {self.searches.max_batch} requêtes max)")
+        try:
+            while not self._closed:
+                try:
+                    conn = self.listener.accept()
+                except OSError:
+                    if self._closed:
+                        break
+                    continue
+                except Exception as e:
+                    # Client refusé (clé d'authentification incorrecte...)
+                    print(f"⚠️ Connexion refusée: {e}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def _handle(self, conn):
+        """Traite les requêtes d'un client jusqu'à sa déconnexion"""
+        with conn:
+            while True:
+                try:
+                    request = recv_message(conn)
+                except (EOFError, OSError):
+                    return
+                try:
+                    method, args, kwargs = request
+                    response = ['ok', self._dispatch(method, args, kwargs)]
+                except Exception as e:
+                    response = ['error', [type(e).__name__, str(e)]]
+                try:
+                    send_message(conn, response)
+                except (OSError, EOFError):
+                    return
+                except Exception as e:
+                    # Résultat non sérialisable
+                    send_message(conn, ['error', [type(e).__name__, str(e)]])
+
+    def _dispatch(self, method: str, args: tuple, kwargs: Dict):
+        """Exécute une méthode du vector store (regroupée en micro-lot si possible)"""
+        if method not in SERVICE_METHODS:
+            raise AttributeError(f"Méthode non servie: {method}")
+        if method == "search_similar":
+            bound = self._search_signature.bind(self.vs, *args, **kwargs)
+            bound.apply_defaults()
+            request = dict(list(bound.arguments.items())[1:])
+            _check_search(request)
+            return self.searches.submit(request).result()
+        if method == "add_validated_fiche":
+            bound = self._fiche_signature.bind(self.vs, *args, **kwargs)
+            fiche = tuple(bound.arguments.values())[1:]
+            _check_fiche(*fiche)
+            return self.fiches.submit(fiche).result()
+        if method == "get_stats":
+            stats = self.vs.get_stats()
+            stats['service'] = {'search': dict(self.searches.stats), 'fiches': dict(self.fiches.stats)}
+            return stats
+        return getattr(self.vs, method)(*args, **kwargs)
+
+    def _search_batch(self, requests: List[Dict]) -> List:
+        """Un search_similar_many par groupe de requêtes de mêmes paramètres"""
+        groups: Dict[str, List[int]] = {}
+        for position, request in enumerate(requests):
+            params = {name: value for name, value in request.items() if name != 'query'}
+            groups.setdefault(json.dumps(params, sort_keys=True, default=str), []).append(position)
+
+        results = [None] * len(requests)
+        for positions in groups.values():
+            params = {name: value for name, value in requests[positions[0]].items() if name != 'query'}
+            try:
+                found = self.vs.search_similar_many([requests[p]['query'] for p in positions], **params)
+            except Exception as e:
+                # Seules les requêtes de ce groupe échouent
+                found = [e] * len(positions)
+            for position, query_results in zip(positions, found):
+                results[position] = query_results
+        return results
+
+    def _fiche_batch(self, fiches: List[Tuple[str, str, Dict]]) -> List:
+        """Toutes les fiches du lot en un seul ajout (une par une si le lot échoue)"""
+        try:
+            self.vs.add_validated_fiches(fiches)
+            return [None] * len(fiches)
+        except Exception:
+            if len(fiches) == 1:
+                raise
+        # Seules les fiches fautives échouent (une fiche déjà écrite est remplacée à l'identique)
+        results = []
+        for fiche in fiches:
+            try:
+                self.vs.add_validated_fiches([fiche])
+                results.append(None)
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def close(self):
+        """Arrête le serveur: requêtes en attente traitées, vector store libéré"""
+        if self._closed:
+            return
+        self._closed = True
+        self.listener.close()
+        self.searches.close()
+        self.fiches.close()
+        self.vs.close()
+        print("🛑 Service du vector store arrêté")
+
+
+class VectorStoreClient:
+    """
+    Client du VectorStoreServer, même interface que VectorStoreManager
+
+    Une connexion par thread: les requêtes simultanées des sessions arrivent
+    ensemble au serveur, qui les regroupe.
+    """
+
+    def __init__(self, address: str):
+        self.address = address
+        self._parsed = parse_address(address)
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+    def _connection(self):
+        """Connexion du thread courant (ouverte au premier appel)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            try:
+                conn = Client(self._parsed, authkey=service_authkey())
+            except OSError as e:
+                raise ConnectionError(
+                    f"Service du vector store injoignable sur {self.address} ({e}): "
+                    f"lancer `python vectorstore_cli.py serve`"
+                ) from e
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _call(self, method: str, *args, **kwargs):
+        """Appel distant; une connexion coupée (serveur redémarré) est rouverte une fois"""
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                send_message(conn, [method, args, kwargs])
+                status, result = recv_message(conn)
+                break
+            except (EOFError, OSError):
+                self._drop_connection()
+                if attempt:
+                    raise ConnectionError(f"Connexion au service du vector store perdue ({self.address})")
+        if status == 'error':
+            raise remote_error(*result)
+        return result
+
+    def _drop_connection(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            with self._connections_lock:
+                if conn in self._connections:
+                    self._connections.remove(conn)
+            conn.close()
+
+    def __getattr__(self, name: str):
+        if name not in SERVICE_METHODS:
+            raise AttributeError(f"{type(self).__name__} n'expose pas '{name}'")
+        return lambda *args, **kwargs: self._call(name, *args, **kwargs)
+
+    def close(self):
+        """Ferme les connexions de ce processus (le serveur continue)"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
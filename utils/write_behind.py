@@ -0,0 +1,115 @@
+"""
+Sauvegarde différée de l'index: les écritures sont acquittées aussitôt, la
+sauvegarde (coûteuse, proportionnelle à la taille de l'index) est faite en
+arrière-plan, une fois pour plusieurs écritures
+"""
+import threading
+import time
+from typing import Callable, Dict
+
+
+class WriteBehind:
+    """
+    Déclenche `save` dans un thread dédié après `max_pending` écritures, ou
+    `interval` secondes après la première écriture en attente
+    """
+
+    def __init__(self, save: Callable[[], None], max_pending: int, interval: float, name: str):
+        """
+        Args:
+            save: Sauvegarde des écritures en attente
+            max_pending: Écritures en attente déclenchant une sauvegarde immédiate
+            interval: Attente maximale (secondes) d'une écriture avant sa sauvegarde
+            name: Nom du thread
+        """
+        self.save = save
+        self.max_pending = max(1, max_pending)
+        self.interval = interval
+        self.stats = {'writes': 0, 'flushes': 0, 'largest_flush': 0}
+        self._pending = 0
+        self._since = 0.0
+        self._cond = threading.Condition()
+        # Une sauvegarde à la fois (thread dédié ou flush())
+        self._saving = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    @property
+    def pending(self) -> int:
+        """Écritures acquittées pas encore sauvegardées"""
+        return self._pending
+
+    def record(self, count: int = 1):
+        """Signale `count` écritures acquittées à sauvegarder"""
+        with self._cond:
+            if not self._pending:
+                self._since = time.monotonic()
+            self._pending += count
+            self.stats['writes'] += count
+            self._cond.notify()
+
+    def requeue(self, count: int = 1):
+        """Remet `count` écritures en attente, sans les recompter (sauvegarde à retenter)"""
+        with self._cond:
+            if not self._pending:
+                self._since = time.monotonic()
+            self._pending += count
+            self._cond.notify()
+
+    def _next_flush(self) -> int:
+        """Attend le prochain déclenchement; retourne les écritures à sauvegarder (0: arrêt)"""
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            while self._pending < self.max_pending and not self._closed:
+                remaining = self._since + self.interval - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            if self._closed:
+                return 0
+            pending, self._pending = self._pending, 0
+            return pending
+
+    def _run(self):
+        while True:
+            pending = self._next_flush()
+            if not pending:
+                return
+            self._save(pending)
+
+    def _save(self, pending: int):
+        try:
+            with self._saving:
+                self.save()
+        except Exception as e:
+            # Écritures toujours dans la base des chunks: retentées au prochain déclenchement
+            print(f"⚠️ Sauvegarde différée échouée: {e}")
+            self.requeue(pending)
+            return
+        self.stats['flushes'] += 1
+        self.stats['largest_flush'] = max(self.stats['largest_flush'], pending)
+
+    def flush(self):
+        """Sauvegarde sans attendre les écritures en attente (dans le thread appelant)"""
+        with self._cond:
+            pending, self._pending = self._pending, 0
+        if pending:
+            self._save(pending)
+        else:
+            # Attend la fin d'une sauvegarde déjà en cours dans le thread dédié
+            with self._saving:
+                pass
+
+    def close(self):
+        """Arrête le thread puis sauvegarde les écritures encore en attente"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self.flush()
+
+    def get_stats(self) -> Dict:
+        """Compteurs des sauvegardes différées"""
+        return {**self.stats, 'pending': self._pending}
@@ -0,0 +1,73 @@
+"""
+Administration du vector store en ligne de commande
+Usage:
+    python vectorstore_cli.py build [--subjects MATIÈRE ...] [--workers N]
+    python vectorstore_cli.py compact [--dir DOSSIER]
+    python vectorstore_cli.py serve [--address ADRESSE] [--window-ms MS] [--max-batch N]
+"""
+import sys
+import argparse
+from pathlib import Path
+
+# Ajouter le répertoire au path
+sys.path.append(str(Path(__file__).parent))
+
+from config import (
+    VECTORSTORE_DIR, SUPPORTED_SUBJECTS, VECTORSTORE_SERVICE, VECTORSTORE_SERVICE_DEFAULT,
+    VECTORSTORE_BATCH_WINDOW_MS, VECTORSTORE_BATCH_MAX
+)
+
+
+def cmd_build(args):
+    """Ingère tout le corpus et publie une nouvelle version des artefacts prébuilt"""
+    from utils.corpus_build import build_corpus
+
+    build_corpus(subjects=args.subjects, workers=args.workers)
+
+
+def cmd_compact(args):
+    """Compacte l'index, la base et le cache (hors ligne, sans modèle d'embedding)"""
+    from utils.compaction import compact_vectorstore, print_report
+
+    report = compact_vectorstore(Path(args.dir))
+    print_report(report)
+
+
+def cmd_serve(args):
+    """Sert le vector store aux processus de l'app (modèle et index chargés une seule fois)"""
+    from config import VECTORSTORE_PREBUILT
+    from utils.vectorstore import VectorStoreManager, open_prebuilt_vectorstore
+    from utils.vectorstore_service import VectorStoreServer
+
+    vs = open_prebuilt_vectorstore() if VECTORSTORE_PREBUILT else VectorStoreManager()
+    vs.warmup()
+    VectorStoreServer(vs, args.address, args.window_ms, args.max_batch).serve_forever()
+
+
+COMMANDS = {
+    "build": cmd_build,
+    "compact": cmd_compact,
+    "serve": cmd_serve,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Administration du vector store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Construit et publie les artefacts chargés par les serveurs")
+    build.add_argument("--subjects", nargs="+", choices=SUPPORTED_SUBJECTS, help="Matières à (ré)ingérer")
+    build.add_argument("--workers", type=int, help="Matières ingérées en parallèle (défaut: une par matière)")
+
+    compact = subparsers.add_parser("compact", help="Compacte le vector store (ne doit pas être en cours d'utilisation)")
+    compact.add_argument("--dir", default=str(VECTORSTORE_DIR), help="Dossier du vector store")
+
+    serve = subparsers.add_parser("serve", help="Sert le vector store aux processus de l'app (VECTORSTORE_SERVICE)")
+    serve.add_argument("--address", default=VECTORSTORE_SERVICE or VECTORSTORE_SERVICE_DEFAULT,
+                       help="\"hôte:port\", chemin de socket Unix ou tube nommé")
+    serve.add_argument("--window-ms", type=float, default=VECTORSTORE_BATCH_WINDOW_MS,
+                       help="Fenêtre de regroupement des requêtes en micro-lots")
+    serve.add_argument("--max-batch", type=int, default=VECTORSTORE_BATCH_MAX, help="Taille maximale d'un micro-lot")
+
+    args = parser.parse_args()
+    COMMANDS[args.command](args)